@@ -1,9 +1,21 @@
 __all__ = [
+    "metrics",
     "palette",
+    "dither",
+    "framebuffer",
+    "frame_cache",
+    "frame_file",
+    "drivers",
+    "transport",
+    "simulation",
     "image_utils",
     "text_utils",
     "display",
+    "worker",
+    "daemon",
     "server",
+    "bench",
+    "watch",
 ]
 
 
@@ -0,0 +1,391 @@
+"""Benchmarks for the image/text pipelines and ``WaveshareDisplay.show_image``.
+
+Every case runs against a synthetic, seeded corpus so results are comparable
+across machines and commits. Timing passes run without tracing; one extra
+pass per case runs under ``tracemalloc`` to attribute allocations and RSS
+growth to pipeline stages (see ``metrics.timed``). ``tracemalloc`` sees
+Python and NumPy allocations but not Pillow's internal image memory; the RSS
+figures cover the latter. Peak RSS is the kernel's high-water mark, reset
+before each case and stage through ``/proc/self/clear_refs`` (Linux); it is
+reported as null where that is not possible.
+
+Cases are built lazily: a source image is synthesized only when a case that
+uses it runs, so ``--filter`` keeps memory to what the selected cases need.
+"""
+from __future__ import annotations
+
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .dither import DITHER_MODES
+from .metrics import collect_stages, probe_stages
+
+logger = logging.getLogger(__name__)
+
+
+BENCH_VERSION = 1
+
+# Relative slowdown of a case's median before it counts as a regression
+DEFAULT_THRESHOLD = 0.10
+# Ignore differences smaller than this many seconds (timer noise on tiny cases)
+MIN_DELTA = 0.001
+
+SHORT_TEXT = "Hello, e-Paper!"
+LONG_TEXT = " ".join(
+    [
+        "The quick brown fox jumps over the lazy dog while the seven-color panel",
+        "slowly refreshes; meanwhile the kettle boils, the calendar updates and",
+        "a long line of status text wraps across several lines of the display.",
+    ]
+    * 8
+)
+
+
+class ImageSource(NamedTuple):
+    name: str
+    size: Tuple[int, int]
+    mode: str
+    format: str
+
+
+QUICK_SOURCES = (
+    ImageSource("0.3mp-4x3-rgb-jpeg", (640, 480), "RGB", "JPEG"),
+    ImageSource("2mp-16x9-rgb-jpeg", (1920, 1080), "RGB", "JPEG"),
+    ImageSource("2mp-1x1-rgba-png", (1414, 1414), "RGBA", "PNG"),
+    ImageSource("12mp-3x4-l-jpeg", (3000, 4000), "L", "JPEG"),
+)
+FULL_SOURCES = QUICK_SOURCES + (
+    ImageSource("2mp-4x3-p-png", (1600, 1200), "P", "PNG"),
+    ImageSource("24mp-3x2-rgb-jpeg", (6000, 4000), "RGB", "JPEG"),
+)
+
+
+class Case(NamedTuple):
+    id: str
+    kind: str
+    # Builds the inputs and returns the callable to time; only called for cases that run
+    setup: Callable[[], Callable[[], Any]]
+
+
+def synthetic_photo(size: Tuple[int, int], mode: str = "RGB", seed: int = 0) -> Image.Image:
+    """Smooth gradients, low-frequency structure and sensor-like noise."""
+    width, height = size
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+    channels = []
+    for c in range(3):
+        fx, fy, phase = rng.uniform(1.0, 6.0), rng.uniform(1.0, 6.0), rng.uniform(0, np.pi)
+        wave = 0.5 + 0.25 * np.sin(2 * np.pi * fx * x + phase) * np.cos(2 * np.pi * fy * y)
+        channels.append(wave + 0.25 * (x if c % 2 else y))
+    rgb = np.stack(channels, axis=-1) * 255.0
+    rgb += rng.normal(0.0, 6.0, size=(height, width, 1)).astype(np.float32)
+    np.clip(rgb, 0, 255, out=rgb)
+    image = Image.fromarray(rgb.astype(np.uint8), "RGB")
+    if mode == "P":
+        return image.quantize(64)
+    return image.convert(mode) if mode != "RGB" else image
+
+
+def encode_source(source: ImageSource, seed: int = 0) -> bytes:
+    out = io.BytesIO()
+    synthetic_photo(source.size, source.mode, seed).save(out, format=source.format, quality=90)
+    return out.getvalue()
+
+
+# Cases of one source are consecutive; keep only the current source's bytes alive
+_encoded_source = lru_cache(maxsize=1)(encode_source)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's RSS high-water mark (VmHWM); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> Optional[int]:
+    """RSS high-water mark since the last ``_reset_peak_rss``."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class MemoryProbe:
+    """Per-stage tracemalloc peak, RSS growth and peak RSS, fed by ``metrics.timed``.
+
+    ``tracemalloc.reset_peak`` and the RSS high-water mark are process-wide,
+    so a stage nested in another stage resets its parent's peaks; pipeline
+    stages do not nest. ``peak_rss`` keeps the highest mark seen across
+    resets, for the case as a whole.
+    """
+
+    def __init__(self, *, track_peak_rss: bool = False) -> None:
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.track_peak_rss = track_peak_rss
+        self.peak_rss: Optional[int] = None
+        self._open: List[Tuple[str, int, int]] = []
+
+    def sample_peak_rss(self) -> Optional[int]:
+        if not self.track_peak_rss:
+            return None
+        peak = _peak_rss_bytes()
+        if peak is not None:
+            self.peak_rss = max(self.peak_rss or 0, peak)
+        return peak
+
+    def begin(self, stage: str) -> None:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        if self.track_peak_rss:
+            self.sample_peak_rss()
+            _reset_peak_rss()
+        self._open.append((stage, current, _rss_bytes()))
+
+    def end(self, stage: str) -> None:
+        if not self._open:
+            return
+        name, base, rss = self._open.pop()
+        _, peak = tracemalloc.get_traced_memory()
+        peak_rss = self.sample_peak_rss()
+        entry = self.stages.setdefault(name, {"alloc_peak_bytes": 0, "rss_delta_bytes": 0, "peak_rss_bytes": None})
+        entry["alloc_peak_bytes"] = max(entry["alloc_peak_bytes"], peak - base)
+        entry["rss_delta_bytes"] = max(entry["rss_delta_bytes"], _rss_bytes() - rss)
+        if peak_rss is not None:
+            entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"] or 0, peak_rss)
+
+
+def build_cases(
+    *,
+    quick: bool = True,
+    width: int = 600,
+    height: int = 448,
+    show: bool = False,
+    state_dir: Optional[Path] = None,
+) -> List[Case]:
+    """Every case id with a deferred setup; nothing is synthesized or opened here."""
+    cases: List[Case] = []
+    sources = QUICK_SOURCES if quick else FULL_SOURCES
+    fit_modes = ("fit", "fill") if quick else ("fit", "fill", "stretch")
+    dithers = ("none", "floyd-steinberg") if quick else DITHER_MODES
+    rotations = (0, 90)
+
+    def image_case(source: ImageSource, seed: int, mode: str, dither: str, rotate: int) -> Callable[[], Any]:
+        from .image_utils import prepare_5in65_buffer_from_bytes
+
+        raw = _encoded_source(source, seed)
+        return lambda: prepare_5in65_buffer_from_bytes(raw, width, height, mode=mode, dither=dither, rotate=rotate)
+
+    for seed, source in enumerate(sources):
+        for mode in fit_modes:
+            for dither in dithers:
+                for rotate in rotations:
+                    cases.append(
+                        Case(
+                            f"image/{source.name}/{mode}/{dither}/r{rotate}",
+                            "image",
+                            lambda s=source, seed=seed, m=mode, d=dither, r=rotate: image_case(s, seed, m, d, r),
+                        )
+                    )
+
+    def text_case(text: str, size: Any, antialias: bool) -> Callable[[], Any]:
+        from .text_utils import render_text_to_buffer
+
+        return lambda: render_text_to_buffer(text, width, height, font_size=size, antialias=antialias)
+
+    for label, text in (("short", SHORT_TEXT), ("long", LONG_TEXT)):
+        for size in (28, "auto"):
+            for antialias in (False, True):
+                cases.append(
+                    Case(
+                        f"text/{label}/{size}/{'aa' if antialias else 'mono'}",
+                        "text",
+                        lambda t=text, s=size, a=antialias: text_case(t, s, a),
+                    )
+                )
+
+    # Public RGB-returning entry points kept for callers outside the server
+    api_source = (QUICK_SOURCES[1], 1)
+
+    def prepare_image_case() -> Callable[[], Any]:
+        from .image_utils import open_image_from_bytes, prepare_5in65_image
+
+        raw = _encoded_source(*api_source)
+        return lambda: prepare_5in65_image(open_image_from_bytes(raw), width, height)
+
+    def quantize_case() -> Callable[[], Any]:
+        from .image_utils import open_image_from_bytes
+        from .palette import quantize_to_five65f
+
+        rgb = open_image_from_bytes(_encoded_source(*api_source)).convert("RGB").resize((width, height))
+        return lambda: quantize_to_five65f(rgb)
+
+    def render_text_case() -> Callable[[], Any]:
+        from .text_utils import render_text_to_image
+
+        return lambda: render_text_to_image(LONG_TEXT, width, height)
+
+    cases.append(Case("api/prepare_5in65_image", "api", prepare_image_case))
+    cases.append(Case("api/quantize_to_five65f", "api", quantize_case))
+    cases.append(Case("api/render_text_to_image", "api", render_text_case))
+
+    if show:
+
+        def show_case() -> Callable[[], Any]:
+            from .display import WaveshareDisplay
+            from .image_utils import prepare_5in65_buffer_from_bytes
+
+            disp = WaveshareDisplay(state_dir=state_dir, skip_threshold=-1)
+            disp.initialize()
+            frame, _ = prepare_5in65_buffer_from_bytes(_encoded_source(*api_source), disp.width, disp.height)
+            return lambda: disp.show_image(frame, force=True)
+
+        cases.append(Case("display/show_image", "display", show_case))
+    return cases
+
+
+def run_case(case: Case, *, repeats: int = 3, warmup: int = 1) -> Dict[str, Any]:
+    run = case.setup()
+    for _ in range(warmup):
+        run()
+    walls: List[float] = []
+    stage_runs: Dict[str, List[float]] = {}
+    for _ in range(max(1, repeats)):
+        with collect_stages() as stages:
+            start = time.perf_counter()
+            run()
+            walls.append(time.perf_counter() - start)
+        for name, seconds in stages.items():
+            stage_runs.setdefault(name, []).append(seconds)
+
+    # Separate traced pass: tracemalloc overhead must not skew the timings.
+    # The high-water mark is reset first so setup and earlier cases do not count.
+    probe = MemoryProbe(track_peak_rss=_reset_peak_rss())
+    tracemalloc.start()
+    try:
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        rss_before = _rss_bytes()
+        with probe_stages(probe), collect_stages():
+            run()
+        _, peak = tracemalloc.get_traced_memory()
+        rss_after = _rss_bytes()
+        probe.sample_peak_rss()
+    finally:
+        tracemalloc.stop()
+
+    stage_report: Dict[str, Dict[str, Any]] = {}
+    for name, runs in stage_runs.items():
+        stage_report[name] = {"median_s": statistics.median(runs), **probe.stages.get(name, {})}
+    return {
+        "kind": case.kind,
+        "wall_s": {"median": statistics.median(walls), "min": min(walls), "max": max(walls), "runs": len(walls)},
+        "stages": stage_report,
+        "alloc_peak_bytes": max([peak - base] + [s["alloc_peak_bytes"] for s in probe.stages.values()]),
+        "rss_delta_bytes": rss_after - rss_before,
+        "peak_rss_bytes": probe.peak_rss,
+    }
+
+
+def _environment() -> Dict[str, Any]:
+    import PIL
+
+    return {
+        "bench_version": BENCH_VERSION,
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "created": time.time(),
+    }
+
+
+def run_benchmarks(
+    *,
+    quick: bool = True,
+    repeats: int = 3,
+    match: Optional[str] = None,
+    show: bool = False,
+    progress: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="epaper-bench-") as state_dir:
+        cases = build_cases(quick=quick, show=show, state_dir=Path(state_dir))
+        results: Dict[str, Any] = {}
+        try:
+            for case in cases:
+                if match and match not in case.id:
+                    continue
+                results[case.id] = run_case(case, repeats=repeats)
+                if progress is not None:
+                    progress(case.id, results[case.id])
+        finally:
+            _encoded_source.cache_clear()
+    return {"environment": {**_environment(), "quick": quick, "repeats": repeats}, "cases": results}
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    *,
+    threshold: float = DEFAULT_THRESHOLD,
+    min_delta: float = MIN_DELTA,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Classify cases present in both reports by change in median wall time."""
+    out: Dict[str, List[Dict[str, Any]]] = {"regressions": [], "improvements": [], "unchanged": []}
+    base_cases = baseline.get("cases", {})
+    for case_id, result in current.get("cases", {}).items():
+        base = base_cases.get(case_id)
+        if base is None:
+            continue
+        now, before = result["wall_s"]["median"], base["wall_s"]["median"]
+        entry = {"case": case_id, "median_s": now, "baseline_s": before, "ratio": now / before if before else None}
+        if now - before > min_delta and now > before * (1 + threshold):
+            out["regressions"].append(entry)
+        elif before - now > min_delta and now < before * (1 - threshold):
+            out["improvements"].append(entry)
+        else:
+            out["unchanged"].append(entry)
+    return out
+
+
+def format_result(case_id: str, result: Dict[str, Any]) -> str:
+    stages = " ".join(f"{name}={s['median_s'] * 1000:.1f}" for name, s in result["stages"].items())
+    return (
+        f"{case_id:<52} {result['wall_s']['median'] * 1000:9.1f} ms"
+        f"  alloc {result['alloc_peak_bytes'] / 1024:8.0f} KiB  [{stages}]"
+    )
+
+
+def load_report(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
@@ -1,88 +1,601 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import hashlib
+import json
+import mmap
+import os
 import sys
+import time
 from pathlib import Path
+from typing import IO, TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 
-from PIL import Image
+from . import daemon
 
-from .display import WaveshareDisplay
-from .image_utils import prepare_5in65_image
-from .text_utils import render_text_to_image
+if TYPE_CHECKING:
+    from .display import WaveshareDisplay
+    from .drivers import DisplayConfig, PanelModel
+    from .frame_cache import FrameCache
 
+# Pipeline modules (Pillow, numpy, drivers) are imported inside the commands:
+# a command forwarded to the daemon must not pay for them.
+
+
+def _dither_arg(value: str) -> str:
+    from .dither import normalize_dither
+
+    try:
+        return normalize_dither(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc)) from exc
+
+
+def _font_size_arg(value: str) -> int | str:
+    if value.strip().lower() == "auto":
+        return "auto"
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid font size: {value!r}") from exc
+
+
+def _display_config(args: argparse.Namespace) -> DisplayConfig:
+    from .drivers import load_display_configs
+
+    configs = load_display_configs()
+    if args.display is None:
+        return configs[0]
+    matches = [c for c in configs if c.name == args.display]
+    if not matches:
+        raise SystemExit(f"unknown display: {args.display} (configured: {', '.join(c.name for c in configs)})")
+    return matches[0]
+
+
+def _make_display(args: argparse.Namespace) -> WaveshareDisplay:
+    from .display import WaveshareDisplay
+
+    config = _display_config(args)
+    return WaveshareDisplay(model=config.model, orientation=config.orientation, name=config.name, pins=config.pins)
+
+
+def _write_preview(args: argparse.Namespace, disp: WaveshareDisplay, out: IO[str] = sys.stdout) -> None:
+    if args.preview and disp.simulator.save(Path(args.preview)):
+        out.write(f"preview written to {args.preview}\n")
+
+
+def apply_command(
+    args: argparse.Namespace,
+    disp: WaveshareDisplay,
+    data: Union[bytes, mmap.mmap] = b"",
+    *,
+    cache: Optional[FrameCache] = None,
+    out: IO[str] = sys.stdout,
+    err: IO[str] = sys.stderr,
+) -> int:
+    """Run an image/text/clear/show command against ``disp``; returns the exit code.
+
+    ``data`` holds the image bytes for ``image`` and the frame file for
+    ``show``. Shared by the local commands and the daemon.
+    """
+    from .drivers import content_rotation
+
+    if args.cmd == "image":
+        from .image_utils import prepare_5in65_buffer_from_bytes
+
+        prepped, _ = prepare_5in65_buffer_from_bytes(
+            data,  # type: ignore[arg-type]
+            disp.width,
+            disp.height,
+            mode=args.mode,
+            dither=args.dither,
+            # Same rotation as the HTTP API, so both share frames and cache keys
+            rotate=content_rotation(disp.orientation, args.rotate),
+            mirror=bool(args.mirror),
+            cache=cache,
+            palette=disp.spec.palette,
+        )
+        disp.show_image(prepped, force=bool(args.force))
+    elif args.cmd == "text":
+        from .text_utils import render_text_to_buffer, resolve_font
+
+        try:
+            resolve_font(args.font)
+        except ValueError as exc:
+            err.write(f"{exc}\n")
+            return 2
+        prepped, _ = render_text_to_buffer(
+            args.text,
+            disp.width,
+            disp.height,
+            font_path=args.font,
+            font_size=args.font_size,
+            min_font_size=args.min_font_size,
+            max_font_size=args.max_font_size,
+            align=args.align,
+            valign=args.valign,
+            wrap=bool(args.wrap),
+            antialias=bool(args.antialias),
+            rotate=content_rotation(disp.orientation),
+            palette=disp.spec.palette,
+        )
+        disp.show_image(prepped, force=bool(args.force))
+    elif args.cmd == "clear":
+        disp.clear()
+    elif args.cmd == "show":
+        from .frame_file import check_compatible, parse_frame
+
+        try:
+            frame = parse_frame(data)
+            check_compatible(frame, disp.spec)
+        except ValueError as exc:
+            err.write(f"{args.path}: {exc}\n")
+            return 2
+        disp.show_image(frame.buffer, force=bool(args.force))
+    else:
+        raise ValueError(f"not a display command: {args.cmd}")
+    _write_preview(args, disp, out)
+    return 0
+
+
+def cmd_display(args: argparse.Namespace) -> int:
+    """image/text/clear/show when no daemon owns the panel."""
+    from .display import DisplayError
+    from .frame_cache import FrameCache
+
+    data: Union[bytes, mmap.mmap] = b""
+    cache = None
+    if args.cmd == "image":
+        path = Path(args.path)
+        if not path.exists():
+            sys.stderr.write(f"image not found: {path}\n")
+            return 2
+        data = path.read_bytes()
+        cache = FrameCache.from_env()
+    elif args.cmd == "show":
+        from .frame_file import map_frame_file
+
+        try:
+            # Mapped, not read: the pixels go to the panel straight from the page cache
+            data = map_frame_file(Path(args.path))
+        except FileNotFoundError:
+            sys.stderr.write(f"frame file not found: {args.path}\n")
+            return 2
+        except ValueError as exc:
+            sys.stderr.write(f"{exc}\n")
+            return 2
+    elif args.cmd == "text":
+        from .text_utils import load_font_registry_from_env
+
+        load_font_registry_from_env()
+    disp = _make_display(args)
+    # Controller reset runs in the background while the frame is prepared;
+    # show_image joins it just before the buffer is sent
+    disp.begin_initialize()
+    try:
+        return apply_command(args, disp, data, cache=cache)
+    except DisplayError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 1
+    finally:
+        # One-shot invocation: do not leave the controller powered between runs.
+        # A skipped frame returns before show_image joins the init thread; let
+        # the reset sequence finish so sleep() sees a ready controller.
+        disp.wait_ready()
+        disp.sleep()
+
+
+def _target(args: argparse.Namespace) -> Tuple[PanelModel, int]:
+    """Panel model and total rotation for offline prep (compile/batch)."""
+    from .drivers import content_rotation, get_model
+
+    config = _display_config(args)
+    spec = get_model(args.model or config.model)
+    # Frames are stored in the panel's native geometry
+    return spec, content_rotation(args.orientation or config.orientation, args.rotate)
+
+
+def cmd_compile(args: argparse.Namespace) -> int:
+    from .frame_file import EPF_SUFFIX, write_frame_file
+    from .image_utils import prepare_5in65_buffer_from_bytes
 
-def cmd_image(args: argparse.Namespace) -> int:
     path = Path(args.path)
     if not path.exists():
         sys.stderr.write(f"image not found: {path}\n")
         return 2
-    image = Image.open(str(path))
-    disp = WaveshareDisplay()
-    disp.initialize()
-    prepped = prepare_5in65_image(
-        image,
-        disp.width,
-        disp.height,
+    spec, rotate = _target(args)
+    raw = path.read_bytes()
+    buf, _ = prepare_5in65_buffer_from_bytes(
+        raw,
+        spec.width,
+        spec.height,
         mode=args.mode,
-        dither=bool(args.dither),
-        rotate=int(args.rotate),
+        dither=args.dither,
+        rotate=rotate,
         mirror=bool(args.mirror),
+        palette=spec.palette,
+    )
+    out = Path(args.output) if args.output else path.with_suffix(EPF_SUFFIX)
+    size = write_frame_file(
+        out,
+        buf,
+        model=spec.name,
+        source_sha256=hashlib.sha256(raw).hexdigest(),
+        params={"mode": args.mode, "dither": args.dither, "rotate": rotate, "mirror": bool(args.mirror)},
     )
-    disp.show_image(prepped)
+    sys.stdout.write(f"{out}: {spec.name} {spec.width}x{spec.height}, {size} bytes\n")
     return 0
 
 
-def cmd_text(args: argparse.Namespace) -> int:
-    disp = WaveshareDisplay()
-    disp.initialize()
-    text_img = render_text_to_image(
-        args.text,
-        disp.width,
-        disp.height,
-        font_path=args.font,
-        font_size=int(args.font_size),
-        align=args.align,
-        valign=args.valign,
-        wrap=bool(args.wrap),
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff"}
+_PLAYLIST_SUFFIXES = {".txt", ".m3u", ".m3u8"}
+
+
+def _batch_sources(sources: List[str]) -> List[Path]:
+    """Expand directories, glob patterns and playlists (one path per line) into image files."""
+    paths: List[Path] = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in _IMAGE_SUFFIXES))
+        elif path.suffix.lower() in _PLAYLIST_SUFFIXES and path.is_file():
+            for line in path.read_text(encoding="utf-8").splitlines():
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    paths.append(path.parent / line)
+        elif path.exists():
+            paths.append(path)
+        else:
+            paths.extend(Path(p) for p in sorted(glob.glob(source, recursive=True)))
+    return paths
+
+
+def _batch_targets(paths: List[Path], out_dir: Path, suffix: str) -> Tuple[Dict[Path, Path], List[str]]:
+    """Map each source to a frame file under ``out_dir``, mirroring the source tree.
+
+    Paths are taken relative to the deepest directory containing every
+    source. Returns the mapping and a description of each clash (e.g.
+    ``x.jpg`` next to ``x.png``).
+    """
+    parents = [str(p.resolve().parent) for p in paths]
+    base = Path(os.path.commonpath(parents))
+    targets: Dict[Path, Path] = {}
+    owners: Dict[Path, Path] = {}
+    clashes: List[str] = []
+    for path in paths:
+        target = out_dir / path.resolve().relative_to(base).with_suffix(suffix)
+        other = owners.setdefault(target, path)
+        if other != path:
+            clashes.append(f"{other} and {path} both map to {target}")
+        targets[path] = target
+    return targets, clashes
+
+
+def cmd_batch(args: argparse.Namespace) -> int:
+    from .frame_cache import FrameCache
+    from .frame_file import EPF_SUFFIX, write_frame_file
+    from .image_utils import prepare_many
+
+    # The same file named twice (say, by a directory and a glob) is prepared once
+    paths: List[Path] = []
+    seen = set()
+    for path in _batch_sources(args.sources):
+        if path.resolve() not in seen:
+            seen.add(path.resolve())
+            paths.append(path)
+    if not paths:
+        sys.stderr.write("no images matched\n")
+        return 2
+    out_dir = Path(args.output_dir) if args.output_dir else None
+    cache: Optional[FrameCache] = None
+    targets: Dict[Path, Path] = {}
+    if out_dir is not None:
+        targets, clashes = _batch_targets(paths, out_dir, EPF_SUFFIX)
+        if clashes:
+            sys.stderr.write("".join(f"output clash: {clash}\n" for clash in clashes))
+            return 2
+        out_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        cache = FrameCache.from_env()
+        if cache.directory is None:
+            sys.stderr.write("frame cache disk tier is disabled (EPAPER_CACHE_DIR); use --output-dir\n")
+            return 2
+    spec, rotate = _target(args)
+    params = {"mode": args.mode, "dither": args.dither, "rotate": rotate, "mirror": bool(args.mirror)}
+    failed = cached = 0
+    start = time.perf_counter()
+    for result in prepare_many(
+        paths,
+        spec.width,
+        spec.height,
+        cache=cache,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        palette=spec.palette,
+        **params,
+    ):
+        if result.error is not None:
+            failed += 1
+            sys.stdout.write(f"{result.path}: failed: {result.error}\n")
+            continue
+        cached += result.cached
+        if out_dir is not None and result.buffer is not None:
+            target = targets[Path(result.path)]
+            target.parent.mkdir(parents=True, exist_ok=True)
+            write_frame_file(
+                target,
+                result.buffer,
+                model=spec.name,
+                source_sha256=result.source_sha256,
+                params=params,
+            )
+        stages = " ".join(f"{name}={seconds * 1000:.1f}" for name, seconds in result.stages.items())
+        note = "cached" if result.cached else f"{result.seconds * 1000:8.1f} ms  [{stages}]"
+        sys.stdout.write(f"{result.path}: {note}\n")
+    elapsed = time.perf_counter() - start
+    done = len(paths) - failed
+    sys.stdout.write(
+        f"{done} of {len(paths)} images ({cached} cached, {failed} failed) in {elapsed:.2f}s, "
+        f"{done / elapsed if elapsed else 0.0:.1f} images/s\n"
+    )
+    return 1 if failed else 0
+
+
+def cmd_bench(args: argparse.Namespace) -> int:
+    from . import bench
+
+    def progress(case_id: str, result: dict) -> None:
+        sys.stdout.write(bench.format_result(case_id, result) + "\n")
+        sys.stdout.flush()
+
+    report = bench.run_benchmarks(
+        quick=not args.full,
+        repeats=args.repeat,
+        match=args.filter,
+        show=bool(args.show),
+        progress=progress,
     )
-    prepped = prepare_5in65_image(text_img, disp.width, disp.height)
-    disp.show_image(prepped)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        sys.stdout.write(f"results written to {args.output}\n")
+    if not args.baseline:
+        return 0
+    diff = bench.compare(report, bench.load_report(Path(args.baseline)), threshold=args.threshold)
+    for label in ("regressions", "improvements"):
+        for entry in diff[label]:
+            # No ratio when the baseline median was 0 (below timer resolution)
+            ratio = f" ({entry['ratio']:.2f}x)" if entry["ratio"] is not None else ""
+            sys.stdout.write(
+                f"{label[:-1]}: {entry['case']} {entry['baseline_s'] * 1000:.1f} -> {entry['median_s'] * 1000:.1f} ms"
+                f"{ratio}\n"
+            )
+    sys.stdout.write(
+        f"{len(diff['regressions'])} regressed, {len(diff['improvements'])} improved, "
+        f"{len(diff['unchanged'])} unchanged against {args.baseline}\n"
+    )
+    return 1 if diff["regressions"] else 0
+
+
+def cmd_watch(args: argparse.Namespace) -> int:
+    from .frame_file import EPF_SUFFIX
+    from .watch import ContentTracker, FileWatcher
+
+    target = Path(args.path)
+    if not target.exists():
+        sys.stderr.write(f"not found: {target}\n")
+        return 2
+    watcher = FileWatcher(target, debounce=args.debounce, interval=args.interval, poll=bool(args.poll))
+    tracker = ContentTracker()
+    via_daemon = not args.local and daemon.ping()
+
+    def command_for(path: Path) -> str:
+        return "show" if path.suffix.lower() == EPF_SUFFIX else "image"
+
+    if via_daemon:
+
+        def push(path: Path, data: bytes) -> int:
+            argv = []
+            if args.display:
+                argv += ["--display", args.display]
+            if args.preview:
+                argv += ["--preview", args.preview]
+            argv += [command_for(path), str(path.resolve()), "--force", str(args.force)]
+            if command_for(path) == "image":
+                argv += ["--mode", args.mode, "--dither", args.dither, "--rotate", str(args.rotate), "--mirror", str(args.mirror)]
+            code = daemon.forward(argv)
+            return 1 if code is None else code
+
+    else:
+        from .frame_cache import FrameCache
+        from .worker import start_workers
+
+        # Display, driver and caches stay loaded between updates; the worker's
+        # idle timer puts the panel to sleep between infrequent changes
+        config = _display_config(args)
+        worker = start_workers([config])[config.name]
+        cache = FrameCache.from_env()
+
+        def push(path: Path, data: bytes) -> int:
+            command = argparse.Namespace(**vars(args))
+            command.cmd = command_for(path)
+            command.path = str(path)
+            job = worker.submit("watch", lambda job, disp: {"exit": apply_command(command, disp, data, cache=cache)})
+            job.wait()
+            if job.status != "done":
+                sys.stderr.write(f"{path}: {job.error}\n")
+                return 1
+            return int(job.result.get("exit", 0))
+
+    def update(candidates: List[Path]) -> None:
+        # The panel shows one frame: push the newest file whose content changed
+        for path in candidates:
+            try:
+                data = path.read_bytes()
+            except OSError:
+                continue
+            if not tracker.changed(path, data):
+                continue
+            start = time.perf_counter()
+            code = push(path, data)
+            if code != 0:
+                # Try again on the next write
+                tracker.forget(path)
+            status = "pushed" if code == 0 else "failed"
+            sys.stdout.write(f"{path}: {status} in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+            sys.stdout.flush()
+            return
+
+    sys.stdout.write(f"watching {target} ({watcher.backend}{', via daemon' if via_daemon else ''})\n")
+    sys.stdout.flush()
+    try:
+        update(watcher.files())
+        for batch in watcher.changes():
+            update(batch)
+    except KeyboardInterrupt:
+        pass
+    except FileNotFoundError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 1
+    finally:
+        watcher.close()
     return 0
 
 
-def cmd_clear(_: argparse.Namespace) -> int:
-    disp = WaveshareDisplay()
-    disp.initialize()
-    disp.clear()
+def cmd_daemon(args: argparse.Namespace) -> int:
+    import logging
+    import signal
+
+    from .frame_cache import FrameCache
+    from .text_utils import load_font_registry_from_env, preload_fonts
+    from .worker import start_workers
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    path = Path(args.socket) if args.socket else daemon.default_socket_path()
+    if path is None:
+        sys.stderr.write("no socket path: EPAPER_SOCKET is empty and --socket was not given\n")
+        return 2
+    load_font_registry_from_env()
+    preload_fonts()
+    server = daemon.DisplayDaemon(start_workers(), FrameCache.from_env(), path)
+    try:
+        server.bind()
+    except RuntimeError as exc:
+        sys.stderr.write(f"{exc}\n")
+        return 1
+    # SIGTERM (systemd stop) unwinds like Ctrl-C so the socket file is removed
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
     return 0
 
 
-def main(argv: list[str] | None = None) -> int:
-    argv = argv if argv is not None else sys.argv[1:]
-    parser = argparse.ArgumentParser(prog="epaperctl", description="Waveshare 5.65\" uploader")
+def build_parser(parser_class: type = argparse.ArgumentParser) -> argparse.ArgumentParser:
+    from .dither import DITHER_MODES
+    from .text_utils import DEFAULT_MAX_FONT_SIZE, DEFAULT_MIN_FONT_SIZE
+
+    parser = parser_class(prog="epaperctl", description="Waveshare 5.65\" uploader")
+    parser.add_argument("--display", default=None, help="panel name from EPAPER_DISPLAYS (default: first configured)")
+    parser.add_argument("--preview", default=None, help="write the displayed frame as PNG to this path")
+    parser.add_argument("--local", action="store_true", help="drive the panel from this process even if a daemon is running")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p_img = sub.add_parser("image", help="display an image")
     p_img.add_argument("path", help="path to image file")
     p_img.add_argument("--mode", choices=["fit", "fill", "stretch"], default="fit")
-    p_img.add_argument("--dither", type=int, default=1)
+    p_img.add_argument(
+        "--dither",
+        type=_dither_arg,
+        default="floyd-steinberg",
+        help=f"dither mode ({', '.join(DITHER_MODES)}); 1/0 are accepted for floyd-steinberg/none",
+    )
     p_img.add_argument("--rotate", type=int, default=0)
     p_img.add_argument("--mirror", type=int, default=0)
-    p_img.set_defaults(func=cmd_image)
+    p_img.add_argument("--force", type=int, default=0, help="refresh even if the frame is unchanged")
+    p_img.set_defaults(func=cmd_display)
 
     p_txt = sub.add_parser("text", help="display text")
     p_txt.add_argument("text", help="text to render")
-    p_txt.add_argument("--font", help="path to .ttf font", default=None)
-    p_txt.add_argument("--font_size", type=int, default=28)
+    p_txt.add_argument("--font", help="registered font name or path to .ttf font", default=None)
+    p_txt.add_argument("--font_size", type=_font_size_arg, default=28, help="point size or 'auto' to fit the panel")
+    p_txt.add_argument("--min_font_size", type=int, default=DEFAULT_MIN_FONT_SIZE)
+    p_txt.add_argument("--max_font_size", type=int, default=DEFAULT_MAX_FONT_SIZE)
     p_txt.add_argument("--align", choices=["left", "center", "right"], default="left")
     p_txt.add_argument("--valign", choices=["top", "middle", "bottom"], default="top")
     p_txt.add_argument("--wrap", type=int, default=1)
-    p_txt.set_defaults(func=cmd_text)
+    p_txt.add_argument("--antialias", type=int, default=0, help="dither glyph edges instead of thresholding")
+    p_txt.add_argument("--force", type=int, default=0, help="refresh even if the frame is unchanged")
+    p_txt.set_defaults(func=cmd_display)
 
     p_clear = sub.add_parser("clear", help="clear display")
-    p_clear.set_defaults(func=cmd_clear)
+    p_clear.set_defaults(func=cmd_display)
+
+    p_compile = sub.add_parser("compile", help="prepare an image into a .epf frame file")
+    p_compile.add_argument("path", help="path to image file")
+    p_compile.add_argument("-o", "--output", default=None, help="output path (default: image path with .epf)")
+    p_compile.add_argument("--model", default=None, help="panel model (default: the selected display's)")
+    p_compile.add_argument("--orientation", choices=["landscape", "portrait"], default=None)
+    p_compile.add_argument("--mode", choices=["fit", "fill", "stretch"], default="fit")
+    p_compile.add_argument("--dither", type=_dither_arg, default="floyd-steinberg")
+    p_compile.add_argument("--rotate", type=int, default=0)
+    p_compile.add_argument("--mirror", type=int, default=0)
+    p_compile.set_defaults(func=cmd_compile)
 
-    args = parser.parse_args(argv)
+    p_show = sub.add_parser("show", help="display a .epf frame file")
+    p_show.add_argument("path", help="path to .epf file")
+    p_show.add_argument("--force", type=int, default=0, help="refresh even if the frame is unchanged")
+    p_show.set_defaults(func=cmd_display)
+
+    p_batch = sub.add_parser("batch", help="prepare many images into the frame cache or .epf files")
+    p_batch.add_argument("sources", nargs="+", help="image files, directories, glob patterns or playlist files")
+    p_batch.add_argument("--output-dir", default=None, help="write .epf frame files here instead of the frame cache")
+    p_batch.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    p_batch.add_argument("--chunksize", type=int, default=None, help="images handed to a worker at a time")
+    p_batch.add_argument("--model", default=None, help="panel model (default: the selected display's)")
+    p_batch.add_argument("--orientation", choices=["landscape", "portrait"], default=None)
+    p_batch.add_argument("--mode", choices=["fit", "fill", "stretch"], default="fit")
+    p_batch.add_argument("--dither", type=_dither_arg, default="floyd-steinberg")
+    p_batch.add_argument("--rotate", type=int, default=0)
+    p_batch.add_argument("--mirror", type=int, default=0)
+    p_batch.set_defaults(func=cmd_batch)
+
+    p_bench = sub.add_parser("bench", help="benchmark the image/text pipelines")
+    p_bench.add_argument("--full", action="store_true", help="larger corpus and every dither mode")
+    p_bench.add_argument("--repeat", type=int, default=3, help="timed runs per case (median is reported)")
+    p_bench.add_argument("--filter", default=None, help="only run cases whose id contains this substring")
+    p_bench.add_argument("--output", default=None, help="write the JSON report to this path")
+    p_bench.add_argument("--baseline", default=None, help="JSON report to compare against; exit 1 on regressions")
+    p_bench.add_argument("--threshold", type=float, default=0.10, help="relative slowdown counted as a regression")
+    p_bench.add_argument("--show", type=int, default=0, help="also time show_image on the configured driver")
+    p_bench.set_defaults(func=cmd_bench)
+
+    p_watch = sub.add_parser("watch", help="push an image file or the newest image in a directory whenever it changes")
+    p_watch.add_argument("path", help="image/.epf file or directory to watch")
+    p_watch.add_argument("--debounce", type=float, default=0.5, help="seconds without writes before pushing")
+    p_watch.add_argument("--poll", type=int, default=0, help="poll mtime/size instead of using inotify")
+    p_watch.add_argument("--interval", type=float, default=1.0, help="polling interval in seconds")
+    p_watch.add_argument("--mode", choices=["fit", "fill", "stretch"], default="fit")
+    p_watch.add_argument("--dither", type=_dither_arg, default="floyd-steinberg")
+    p_watch.add_argument("--rotate", type=int, default=0)
+    p_watch.add_argument("--mirror", type=int, default=0)
+    p_watch.add_argument("--force", type=int, default=0, help="refresh even if the frame is unchanged")
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_daemon = sub.add_parser("daemon", help="own the displays and serve epaperctl commands on a Unix socket")
+    p_daemon.add_argument("--socket", default=None, help="socket path (default: EPAPER_SOCKET or $XDG_RUNTIME_DIR/epaper-<uid>.sock)")
+    p_daemon.set_defaults(func=cmd_daemon)
+
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = argv if argv is not None else sys.argv[1:]
+    # A running daemon owns the panel; hand image/text/clear/show to it
+    forwarded = daemon.forward(argv)
+    if forwarded is not None:
+        return forwarded
+    args = build_parser().parse_args(argv)
     return int(args.func(args))
 
 
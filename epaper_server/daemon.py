@@ -0,0 +1,424 @@
+"""Long-lived display owner on a Unix socket, and the thin client ``epaperctl`` uses.
+
+The daemon (``epaperctl daemon``, or the web server with ``EPAPER_SOCKET``
+set) keeps the drivers, panels, fonts and frame cache loaded. ``cli.main``
+calls ``forward`` first. When a daemon answers, ``image``/``text``/``clear``/
+``show`` run there, on the same display worker as any other job, and the CLI
+process never imports Pillow or touches the SPI bus.
+
+Wire format: each message is a 4-byte big-endian length followed by that
+many bytes of JSON. A message may announce ``size``; that many raw bytes
+follow it. One exchange per connection:
+
+    client  {"op": "cli", "argv": [...], "cwd": "..."}
+    daemon  {"read": "<path>"}                 (image/show only)
+    client  {"size": n} + n bytes | {"error": "..."}
+    daemon  {"exit": code, "stdout": "...", "stderr": "..."}
+
+The daemon parses ``argv`` with the CLI's own parser, so both sides always
+agree on options, defaults and error messages. Only this module and the
+standard library are imported on the client side.
+
+The client only talks to a socket owned by its own user with mode 0600
+(and, where the platform reports it, a peer running as that user), and only
+ever streams the file named in its own ``argv``: the default path may sit in
+a shared temp directory that other users can write to.
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import io
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from .frame_cache import FrameCache
+    from .worker import DisplayWorker
+
+logger = logging.getLogger(__name__)
+
+
+FORWARDED_COMMANDS = ("image", "text", "clear", "show")
+# Global CLI options that take a value; needed to find the command in argv
+_GLOBAL_VALUE_OPTIONS = ("--display", "--preview")
+# Commands that stream a file from the client
+_FILE_COMMANDS = ("image", "show")
+
+_LENGTH = struct.Struct(">I")
+_MAX_MESSAGE = 1 << 20
+
+
+def default_socket_path() -> Optional[Path]:
+    env_path = os.environ.get("EPAPER_SOCKET")
+    if env_path is not None:
+        # Explicit empty value disables the daemon and forwarding
+        return Path(env_path) if env_path else None
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"epaper-{os.getuid()}.sock"
+
+
+# --- framing
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            raise ConnectionError("connection closed mid-message")
+        got += n
+    return bytes(buf)
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    blob = json.dumps(message).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(blob)) + blob)
+
+
+def recv_message(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    if length > _MAX_MESSAGE:
+        raise ValueError(f"message of {length} bytes exceeds the {_MAX_MESSAGE} byte limit")
+    message = json.loads(_recv_exact(sock, length))
+    if not isinstance(message, dict):
+        raise ValueError("message is not a JSON object")
+    return message
+
+
+def _field(message: Dict[str, Any], key: str, kind: type, default: Any = None) -> Any:
+    """``message[key]`` if it is a ``kind``; a protocol error (ValueError) otherwise."""
+    value = message.get(key, default)
+    # bool is an int subclass but never a valid size or exit code
+    if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+        raise ValueError(f"malformed message: {key!r} is missing or not {kind.__name__}")
+    return value
+
+
+# --- client
+def forwarded_command(argv: Sequence[str]) -> Optional[str]:
+    """The subcommand in ``argv`` if it should go to a daemon, else None."""
+    args = iter(argv)
+    for token in args:
+        if token == "--local" or token in ("-h", "--help"):
+            return None
+        if token in _GLOBAL_VALUE_OPTIONS:
+            next(args, None)
+            continue
+        if token.startswith("-"):
+            continue
+        return token if token in FORWARDED_COMMANDS else None
+    return None
+
+
+def file_argument(argv: Sequence[str]) -> Optional[str]:
+    """The path an ``image``/``show`` command in ``argv`` reads, else None.
+
+    Every option of those commands takes a value, so the first token after
+    the command that is neither an option nor an option's value is the path.
+    """
+    args = iter(argv)
+    command = None
+    for token in args:
+        if command is None:
+            if token in _GLOBAL_VALUE_OPTIONS:
+                next(args, None)
+            elif not token.startswith("-"):
+                if token not in _FILE_COMMANDS:
+                    return None
+                command = token
+            continue
+        if token == "--":
+            return next(args, None)
+        if token.startswith("-") and len(token) > 1:
+            if "=" not in token:
+                next(args, None)
+            continue
+        return token
+    return None
+
+
+def check_socket(path: Path) -> None:
+    """Raise PermissionError unless ``path`` is a socket only this user can reach."""
+    st = os.lstat(path)
+    if not stat.S_ISSOCK(st.st_mode):
+        raise PermissionError(f"{path} is not a socket")
+    if st.st_uid != os.getuid():
+        raise PermissionError(f"{path} is owned by uid {st.st_uid}, not {os.getuid()}")
+    if st.st_mode & 0o077:
+        raise PermissionError(f"{path} is accessible to other users (mode {stat.S_IMODE(st.st_mode):o})")
+
+
+def _check_peer(sock: socket.socket) -> None:
+    peercred = getattr(socket, "SO_PEERCRED", None)
+    if peercred is None:
+        # Not reported here (e.g. macOS); the socket file check stands alone
+        return
+    _pid, uid, _gid = struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, peercred, struct.calcsize("3i")))
+    if uid != os.getuid():
+        raise PermissionError(f"daemon runs as uid {uid}, not {os.getuid()}")
+
+
+def _connect(path: Optional[Path]) -> Optional[socket.socket]:
+    """A connection to a trusted daemon on ``path``, or None to run locally."""
+    if path is None:
+        return None
+    try:
+        check_socket(path)
+    except FileNotFoundError:
+        return None
+    except PermissionError as exc:
+        logger.warning("Ignoring epaper daemon socket: %s", exc)
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+        _check_peer(sock)
+    except PermissionError as exc:
+        logger.warning("Ignoring epaper daemon socket %s: %s", path, exc)
+        sock.close()
+        return None
+    except OSError:
+        # Stale socket file from a daemon that is gone
+        sock.close()
+        return None
+    return sock
+
+
+def _send_file(sock: socket.socket, path: str) -> None:
+    try:
+        fh = open(path, "rb")
+    except OSError as exc:
+        send_message(sock, {"error": exc.strerror or str(exc)})
+        return
+    with fh:
+        size = os.fstat(fh.fileno()).st_size
+        send_message(sock, {"size": size})
+        # Kernel-side copy where supported (os.sendfile), chunked reads otherwise
+        sock.sendfile(fh, 0, size)
+
+
+def ping(path: Optional[Path] = None) -> bool:
+    """Whether a daemon is answering on ``path`` (default: ``default_socket_path()``)."""
+    sock = _connect(path if path is not None else default_socket_path())
+    if sock is None:
+        return False
+    try:
+        with sock:
+            sock.settimeout(2.0)
+            send_message(sock, {"op": "ping"})
+            return bool(recv_message(sock).get("ok"))
+    except (OSError, ValueError):
+        return False
+
+
+def forward(argv: Sequence[str], path: Optional[Path] = None) -> Optional[int]:
+    """Run a CLI command in a running daemon; None means "run it locally".
+
+    Falls back (returns None) when the command is not forwarded, no socket is
+    configured, the socket is not this user's or nothing is listening. Once the daemon has accepted the
+    command its result is final, including errors.
+    """
+    if forwarded_command(argv) is None:
+        return None
+    path = path if path is not None else default_socket_path()
+    sock = _connect(path)
+    if sock is None:
+        return None
+    with sock:
+        try:
+            return converse(sock, argv)
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"epaper daemon at {path} failed: {exc}\n")
+            return 1
+
+
+def converse(sock: socket.socket, argv: Sequence[str]) -> int:
+    """Client side of one exchange on a connected socket; returns the exit code."""
+    expected = file_argument(argv)
+    send_message(sock, {"op": "cli", "argv": list(argv), "cwd": os.getcwd()})
+    while True:
+        reply = recv_message(sock)
+        if "read" in reply:
+            requested = _field(reply, "read", str)
+            # Never hand over anything but the file this command names
+            if expected is None or requested != expected:
+                raise ValueError(f"daemon asked for {requested!r}, which this command does not read")
+            _send_file(sock, expected)
+            continue
+        # Validate the whole reply before printing any of it
+        code = _field(reply, "exit", int)
+        stdout = _field(reply, "stdout", str, "")
+        stderr = _field(reply, "stderr", str, "")
+        sys.stdout.write(stdout)
+        sys.stderr.write(stderr)
+        return code
+
+
+# --- daemon
+class _ParserExit(Exception):
+    def __init__(self, status: int, message: str = "", stdout: str = "") -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.stdout = stdout
+
+
+class _CapturingParser(argparse.ArgumentParser):
+    """ArgumentParser that raises instead of printing and exiting the daemon."""
+
+    def print_help(self, file: Any = None) -> None:
+        raise _ParserExit(0, stdout=self.format_help())
+
+    def print_usage(self, file: Any = None) -> None:
+        raise _ParserExit(0, stdout=self.format_usage())
+
+    def exit(self, status: int = 0, message: Optional[str] = None) -> None:  # type: ignore[override]
+        raise _ParserExit(status, message or "")
+
+    def error(self, message: str) -> None:  # type: ignore[override]
+        raise _ParserExit(2, f"{self.format_usage()}{self.prog}: error: {message}\n")
+
+
+class DisplayDaemon:
+    """Serve forwarded CLI commands on ``path`` using already running display workers."""
+
+    def __init__(self, workers: Dict[str, "DisplayWorker"], cache: "FrameCache", path: Path) -> None:
+        self.workers = workers
+        self.cache = cache
+        self.path = path
+        self.default_name = next(iter(workers))
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # --- lifecycle
+    def bind(self) -> None:
+        if self.path.exists():
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(str(self.path))
+            except OSError:
+                try:
+                    self.path.unlink()
+                except OSError as exc:
+                    # e.g. planted by another user in a shared temp directory
+                    raise RuntimeError(f"cannot replace stale socket {self.path}: {exc}") from exc
+            else:
+                raise RuntimeError(f"an epaper daemon is already listening on {self.path}")
+            finally:
+                probe.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self) -> None:
+                daemon._handle(self.request)
+
+        old_umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(str(self.path), Handler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon_threads = True
+        logger.info("epaper daemon listening on %s", self.path)
+
+    def serve_forever(self) -> None:
+        if self._server is None:
+            self.bind()
+        assert self._server is not None
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def start(self) -> "DisplayDaemon":
+        """Serve on a background thread (used by the web server)."""
+        self.bind()
+        # The host process may exit without stopping us; do not leave a stale socket file
+        atexit.register(self.close)
+        self._thread = threading.Thread(target=self.serve_forever, name="epaper-daemon", daemon=True)
+        self._thread.start()
+        return self
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+    # --- requests
+    def _handle(self, sock: socket.socket) -> None:
+        try:
+            request = recv_message(sock)
+            if request.get("op") == "ping":
+                send_message(sock, {"ok": True, "displays": list(self.workers)})
+                return
+            if request.get("op") != "cli":
+                send_message(sock, {"exit": 2, "stderr": f"unknown request: {request.get('op')!r}\n"})
+                return
+            argv = _field(request, "argv", list)
+            if not all(isinstance(arg, str) for arg in argv):
+                raise ValueError("malformed message: 'argv' is not a list of strings")
+            cwd = _field(request, "cwd", str, os.getcwd())
+            send_message(sock, self._run_cli(sock, argv, cwd or os.getcwd()))
+        except (OSError, ValueError) as exc:
+            logger.warning("epaper daemon: dropped request: %s", exc)
+
+    def _run_cli(self, sock: socket.socket, argv: List[str], cwd: str) -> Dict[str, Any]:
+        from . import cli
+        from .worker import QueueFull
+
+        try:
+            args = cli.build_parser(parser_class=_CapturingParser).parse_args(argv)
+        except _ParserExit as exc:
+            return {"exit": exc.status, "stdout": exc.stdout, "stderr": exc.message}
+        if args.cmd not in FORWARDED_COMMANDS:
+            return {"exit": 2, "stderr": f"{args.cmd} is not handled by the daemon; use --local\n"}
+        name = args.display or self.default_name
+        worker = self.workers.get(name)
+        if worker is None:
+            return {"exit": 2, "stderr": f"unknown display: {name} (configured: {', '.join(self.workers)})\n"}
+        if args.preview:
+            args.preview = str(Path(cwd, args.preview))
+
+        raw = b""
+        if args.cmd in _FILE_COMMANDS:
+            send_message(sock, {"read": args.path})
+            reply = recv_message(sock)
+            if "error" in reply:
+                label = "image" if args.cmd == "image" else "frame file"
+                return {"exit": 2, "stderr": f"{label} not found: {args.path} ({reply['error']})\n"}
+            raw = _recv_exact(sock, _field(reply, "size", int))
+
+        out, err = io.StringIO(), io.StringIO()
+        try:
+            job = worker.submit(
+                f"cli-{args.cmd}",
+                lambda job, disp: {"exit": cli.apply_command(args, disp, raw, cache=self.cache, out=out, err=err)},
+                # Every forwarded command runs, as it would when invoked locally
+                coalesce=False,
+            )
+        except QueueFull as exc:
+            return {"exit": 1, "stderr": f"{exc}\n"}
+        job.wait()
+        if job.status != "done":
+            err.write(f"{args.cmd} failed: {job.error}\n")
+            return {"exit": 1, "stdout": out.getvalue(), "stderr": err.getvalue()}
+        return {"exit": job.result.get("exit", 0), "stdout": out.getvalue(), "stderr": err.getvalue()}
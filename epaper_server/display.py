@@ -1,29 +1,246 @@
 from __future__ import annotations
 
+import hashlib
 import os
 import sys
 import logging
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Optional
+from typing import Any, Deque, Dict, Optional, Union
 
+import numpy as np
 from PIL import Image
 
+from .drivers import get_model
+from .framebuffer import PanelBuffer
+from .metrics import FRAMES, timed
+from .simulation import SimulatedPanel
+from .transport import SharedBus, SpiTransport, shared_bus
+
 logger = logging.getLogger(__name__)
 
 
+class DisplayError(RuntimeError):
+    """The driver failed while pushing a frame; panel content is unknown."""
+
+
+def _default_state_dir() -> Optional[Path]:
+    env_dir = os.environ.get("EPAPER_STATE_DIR")
+    if env_dir is not None:
+        # Explicit empty value disables persistence
+        return Path(env_dir) if env_dir else None
+    base = os.environ.get("XDG_STATE_HOME") or str(Path.home() / ".local" / "state")
+    return Path(base) / "epaper"
+
+
+def frame_difference(a: bytes | bytearray | memoryview, b: bytes | bytearray | memoryview) -> float:
+    """Fraction of pixels that differ between two packed 4-bit buffers."""
+    if len(a) != len(b):
+        return 1.0
+    left = np.frombuffer(a, dtype=np.uint8)
+    right = np.frombuffer(b, dtype=np.uint8)
+    changed = left ^ right
+    differing = np.count_nonzero(changed & 0xF0) + np.count_nonzero(changed & 0x0F)
+    return differing / (2 * len(a)) if len(a) else 0.0
+
+
+# Config pin names -> EPD instance attributes read by the Waveshare drivers
+_PIN_ATTRS = {
+    "rst": "reset_pin",
+    "dc": "dc_pin",
+    "cs": "cs_pin",
+    "busy": "busy_pin",
+    "pwr": "pwr_pin",
+}
+
+
 class WaveshareDisplay:
     def __init__(
         self,
         *,
         model: str = "5in65f",
         orientation: str = "landscape",
+        name: Optional[str] = None,
+        pins: Optional[Dict[str, int]] = None,
+        state_dir: Optional[Path] = None,
+        skip_threshold: Optional[float] = None,
     ) -> None:
         self.model = model.lower()
+        self.spec = get_model(self.model)
+        if self.spec.packing != "4bpp":
+            raise RuntimeError(f"Unsupported buffer packing for {self.model}: {self.spec.packing}")
+        self.name = name or "default"
         self.orientation = orientation
+        self.pins = dict(pins or {})
         self.epd = None  # type: ignore[assignment]
-        self.width: int = 600
-        self.height: int = 448
+        # Bulk SPI path for frame uploads; None falls back to EPD.display()
+        self.transport: Optional[SpiTransport] = None
+        # Lock and init/exit refcount of the driver's epdconfig, shared with
+        # every other panel driven through it; set once the driver is imported
+        self.bus: SharedBus = shared_bus(None)
+        # Frame history; the whole backend in simulation mode
+        self.simulator = SimulatedPanel.from_env(model_refresh=self.spec.refresh_seconds, output_name=self._preview_name())
+        self.width: int = self.spec.width
+        self.height: int = self.spec.height
         self._module = None
+        # Fraction of changed pixels at or below which a frame is not pushed;
+        # 0 skips only byte-identical frames, a negative value disables skipping
+        if skip_threshold is None:
+            skip_threshold = float(os.environ.get("EPAPER_SKIP_THRESHOLD", "0"))
+        self.skip_threshold = skip_threshold
+        self.state_dir = state_dir if state_dir is not None else _default_state_dir()
+        self.last_digest: Optional[str] = None
+        self.refreshes = 0
+        self.skipped = 0
+        # Why the latest show_image did not refresh; None when it did
+        self.last_skip_reason: Optional[str] = None
+        self._last_frame: Optional[bytes] = None
+        self._load_last_frame()
+        # Power lifecycle: off -> initializing -> ready <-> asleep, with "waking"
+        # while a sleeping controller is re-initialized
+        self.power_state = "off"
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=32)
+        self._power_lock = threading.RLock()
+        self._power_thread: Optional[threading.Thread] = None
+
+    # --- power lifecycle
+    def _set_power_state(self, state: str) -> None:
+        if state == self.power_state:
+            return
+        logger.debug("Display power: %s -> %s", self.power_state, state)
+        self.transitions.append({"from": self.power_state, "to": state, "at": time.time()})
+        self.power_state = state
+
+    def power_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.power_state,
+            "transitions": list(self.transitions),
+        }
+
+    def wake(self) -> None:
+        """Re-run the controller init sequence if the panel was put to sleep."""
+        with self._power_lock:
+            if self.power_state != "asleep":
+                return
+            self._set_power_state("waking")
+            self._reinit()
+
+    def _reinit(self) -> None:
+        # Caller holds _power_lock and has moved the state to "waking"
+        if self.epd is not None:
+            try:
+                logger.debug("EPD.init() (wake)")
+                with self.bus.lock:
+                    self.epd.init()
+            except Exception as exc:
+                logger.error("Wake failed: %s", exc)
+                self._set_power_state("asleep")
+                raise
+        self._set_power_state("ready")
+
+    def begin_wake(self) -> None:
+        """Start waking the panel in the background so init overlaps frame prep."""
+        with self._power_lock:
+            if self.power_state != "asleep" or self._power_thread is not None:
+                return
+            # Set before the thread runs so the worker sees a panel that is coming up
+            self._set_power_state("waking")
+            self._start_power_thread(self._wake_quietly, f"epd-wake-{self.name}")
+
+    def _wake_quietly(self) -> None:
+        with self._power_lock:
+            if self.power_state != "waking":
+                return
+            try:
+                self._reinit()
+            except Exception:
+                pass
+
+    def _start_power_thread(self, target: Any, name: str, *args: Any) -> None:
+        """Run an init/wake in the background; the caller holds ``_power_lock``."""
+
+        def run() -> None:
+            try:
+                target(*args)
+            finally:
+                # Cleared here too, so a job that never calls wait_ready (a skipped
+                # frame) does not leave later begin_wake calls as no-ops
+                with self._power_lock:
+                    if self._power_thread is threading.current_thread():
+                        self._power_thread = None
+
+        self._power_thread = threading.Thread(target=run, name=name, daemon=True)
+        self._power_thread.start()
+
+    def wait_ready(self) -> None:
+        """Block until any background init/wake has finished."""
+        with self._power_lock:
+            thread = self._power_thread
+        if thread is not None:
+            thread.join()
+            with self._power_lock:
+                if self._power_thread is thread:
+                    self._power_thread = None
+        # Covers a failed background wake and callers that never called begin_wake
+        self.wake()
+
+    # --- last-frame tracking
+    def _state_path(self) -> Optional[Path]:
+        if self.state_dir is None:
+            return None
+        # Named panels of the same model must not share a last frame
+        suffix = self.model if self.name == "default" else f"{self.name}_{self.model}"
+        return self.state_dir / f"last_frame_{suffix}.bin"
+
+    def _load_last_frame(self) -> None:
+        path = self._state_path()
+        if path is None:
+            return
+        try:
+            self._last_frame = path.read_bytes()
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            logger.warning("Could not read last frame state %s: %s", path, exc)
+            return
+        self.last_digest = hashlib.sha256(self._last_frame).hexdigest()
+        logger.debug("Loaded last frame digest %s from %s", self.last_digest[:12], path)
+
+    def _remember_frame(self, data: Optional[bytes]) -> None:
+        self._last_frame = data
+        self.last_digest = hashlib.sha256(data).hexdigest() if data is not None else None
+        path = self._state_path()
+        if path is None:
+            return
+        try:
+            if data is None:
+                path.unlink(missing_ok=True)
+                return
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(".tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("Could not persist last frame state %s: %s", path, exc)
+
+    def should_skip(self, buf: PanelBuffer) -> bool:
+        return self.skip_reason(buf) is not None
+
+    def skip_reason(self, buf: PanelBuffer) -> Optional[str]:
+        """Why ``buf`` need not be pushed ("unchanged", "below_threshold"), or None."""
+        if self.skip_threshold < 0 or self._last_frame is None:
+            return None
+        if len(self._last_frame) != len(buf.data):
+            return None
+        if hashlib.sha256(buf.data).hexdigest() == self.last_digest:
+            return "unchanged"
+        if self.skip_threshold == 0:
+            return None
+        if frame_difference(self._last_frame, buf.data) <= self.skip_threshold:
+            return "below_threshold"
+        return None
 
     # --- driver loading
     def _ensure_lib_on_path(self) -> None:
@@ -44,13 +261,36 @@ class WaveshareDisplay:
                 logger.debug("Added vendor lib to sys.path: %s", path_str)
 
     def _module_name_for_model(self) -> Optional[str]:
-        mapping_primary = {
-            "5in65f": "waveshare_epd.epd5in65f",
-        }
         # Prefer packaged layout (waveshare_epd.*); some older vendor layouts expose top-level modules
-        return mapping_primary.get(self.model)
+        return self.spec.module
+
+    def _apply_pins(self, epd: Any) -> None:
+        """Point the driver instance at this panel's GPIO lines.
+
+        Only drivers whose ``epdconfig`` addresses pins by number honour the
+        override. The stock Waveshare ``epdconfig`` drives its own fixed pins
+        and ignores these attributes, so several panels on it share (and are
+        serialized on) one set of lines.
+        """
+        for key, pin in self.pins.items():
+            attr = _PIN_ATTRS.get(key)
+            if attr is None:
+                logger.warning("Ignoring unknown pin %r for display %s", key, self.name)
+                continue
+            setattr(epd, attr, pin)
+            logger.debug("Display %s: %s=%s", self.name, attr, pin)
 
     def initialize(self) -> None:
+        self.begin_initialize()
+        self.wait_ready()
+
+    def begin_initialize(self) -> None:
+        """Load the driver and start the controller init sequence in the background.
+
+        Import and ``EPD()`` construction run inline so ``width``/``height``
+        and simulation mode are settled on return; the slow ``EPD.init()``
+        (GPIO/SPI setup and reset) runs on a thread that ``wait_ready`` joins.
+        """
         self._ensure_lib_on_path()
         module_name = self._module_name_for_model()
         if module_name is None:
@@ -71,18 +311,41 @@ class WaveshareDisplay:
                 # Enforce orientation even in simulation
                 if self.orientation == "portrait" and self.width > self.height:
                     self.width, self.height = self.height, self.width
+                self._set_power_state("ready")
                 return
 
         # If we get here, module import succeeded; try to init hardware
+        self.bus = shared_bus(self._epdconfig())
         try:
-            self.epd = self._module.EPD()
-            self.epd.init()
-            epd_w = getattr(self.epd, "width", None)
-            epd_h = getattr(self.epd, "height", None)
-            if isinstance(epd_w, int) and isinstance(epd_h, int):
-                self.width, self.height = epd_w, epd_h
+            epd = self._module.EPD()
+        except Exception as exc:
+            self.epd = None
+            logger.warning("Using simulation mode (init failed): %s", exc)
+            self._set_power_state("ready")
+            return
+        epd_w = getattr(epd, "width", None)
+        epd_h = getattr(epd, "height", None)
+        if isinstance(epd_w, int) and isinstance(epd_h, int):
+            self.width, self.height = epd_w, epd_h
+        self._apply_pins(epd)
+        # Keep hardware-native dimensions; rotation handled at image-prep time
+        with self._power_lock:
+            self._set_power_state("initializing")
+            self._start_power_thread(self._init_hardware, f"epd-init-{self.name}", epd)
+
+    def _epdconfig(self) -> Any:
+        # Packaged layout: waveshare_epd.epdconfig; legacy layout: top-level epdconfig
+        return getattr(self._module, "epdconfig", None) or sys.modules.get("epdconfig")
+
+    def _init_hardware(self, epd: Any) -> None:
+        try:
+            with self.bus.lock:
+                epd.init()
+            self.epd = epd
+            self._attach_transport(epd)
             logger.info(
-                "EPD initialized: size=%sx%s orientation=%s",
+                "EPD initialized: display=%s size=%sx%s orientation=%s",
+                self.name,
                 self.width,
                 self.height,
                 self.orientation,
@@ -91,62 +354,117 @@ class WaveshareDisplay:
             # Hardware not available or driver missing dependencies; fall back to simulation
             self.epd = None
             logger.warning("Using simulation mode (init failed): %s", exc)
+        self._set_power_state("ready")
 
-        # Keep hardware-native dimensions; rotation handled at image-prep time
+    def _attach_transport(self, epd: Any) -> None:
+        if not self.spec.bulk_upload or os.environ.get("EPAPER_SPI_BULK", "1") == "0":
+            return
+        chunk = int(os.environ.get("EPAPER_SPI_CHUNK", "0")) or None
+        self.transport = SpiTransport.from_driver(epd, self._module, chunk_size=chunk, lock=self.bus.lock)
+        if self.transport is None:
+            logger.debug("Driver epdconfig lacks SPI/GPIO hooks; using EPD.display()")
+        else:
+            logger.debug("Bulk SPI transport enabled (chunk=%d)", self.transport.chunk_size)
 
     # --- operations
-    def show_image(self, image: Image.Image) -> None:
-        out_dir = Path("out")
-        out_dir.mkdir(parents=True, exist_ok=True)
+    def show_image(self, image: Union[Image.Image, PanelBuffer], *, force: bool = False) -> bool:
+        """Push a frame to the panel; returns False when the refresh was skipped.
+
+        Packed buffers identical to (or, with ``skip_threshold``, nearly
+        identical to) the last frame sent are not pushed unless ``force``;
+        ``last_skip_reason`` says why. A driver failure raises DisplayError.
+        """
+        reason = self.skip_reason(image) if isinstance(image, PanelBuffer) and not force else None
+        self.last_skip_reason = reason
+        if reason is not None:
+            self.skipped += 1
+            FRAMES.inc(self.name, "skipped")
+            logger.info(
+                "Skipping refresh (%s): frame matches last displayed frame (%s)",
+                reason,
+                self.last_digest[:12] if self.last_digest else "-",
+            )
+            return False
+        self.wait_ready()
         if self.epd is None:
-            # simulation; save image
-            (out_dir / "last_output.png").write_bytes(self._png_bytes(image))
-            logger.debug("Simulation: wrote %s", out_dir / "last_output.png")
-            return
-        # real hardware
-        try:
-            if hasattr(self.epd, "getbuffer"):
-                buf = self.epd.getbuffer(image)
-                logger.debug("EPD.display(getbuffer(image)) size=%s", image.size)
-                self.epd.display(buf)
-            else:
-                # Some drivers accept PIL image directly
-                logger.debug("EPD.display(image) size=%s", image.size)
-                self.epd.display(image)
-        except Exception as exc:
-            logger.error("Display failed: %s", exc)
-            (out_dir / "last_output.png").write_bytes(self._png_bytes(image))
+            # simulation: keep the frame in memory; PNG is only encoded when requested
+            with timed("refresh"):
+                frame = self.simulator.refresh("image", image)
+            logger.debug("Simulation: frame %d size=%s", frame.seq, frame.size)
+        else:
+            # real hardware
+            try:
+                if isinstance(image, PanelBuffer) and self.transport is not None:
+                    # Already packed; one DC/CS phase and chunked transfers instead of a write per byte
+                    self.transport.upload_frame(self.spec, image.data)
+                elif isinstance(image, PanelBuffer):
+                    # Already packed in controller order; skip the driver's per-pixel getbuffer
+                    logger.debug("EPD.display(PanelBuffer) size=%s bytes=%d", image.size, len(image.data))
+                    # The vendor call does transfer and refresh in one; timed as a single stage
+                    with timed("display"), self.bus.lock:
+                        self.epd.display(image.data)
+                elif hasattr(self.epd, "getbuffer"):
+                    # Packing is CPU only; other panels may use the bus meanwhile
+                    with timed("pack"):
+                        buf = self.epd.getbuffer(image)
+                    logger.debug("EPD.display(getbuffer(image)) size=%s", image.size)
+                    with timed("display"), self.bus.lock:
+                        self.epd.display(buf)
+                else:
+                    # Some drivers accept PIL image directly
+                    logger.debug("EPD.display(image) size=%s", image.size)
+                    with timed("display"), self.bus.lock:
+                        self.epd.display(image)
+                self.simulator.record("image", image)
+            except Exception as exc:
+                logger.error("Display failed: %s", exc)
+                # Keep the intended frame inspectable, but never as the current frame
+                self.simulator.record("image", image, shown=False)
+                FRAMES.inc(self.name, "failed")
+                # Panel content is now unknown
+                self._remember_frame(None)
+                raise DisplayError(f"display failed: {exc}") from exc
+        self.refreshes += 1
+        FRAMES.inc(self.name, "refreshed")
+        # Unpacked images are not tracked; the next buffer is always pushed
+        self._remember_frame(bytes(image.data) if isinstance(image, PanelBuffer) else None)
+        return True
 
     def clear(self) -> None:
+        self.wait_ready()
+        white = self._white_frame()
         if self.epd is None:
-            # simulation: clear preview
-            out_dir = Path("out")
-            out_dir.mkdir(parents=True, exist_ok=True)
-            blank = Image.new("RGB", (self.width, self.height), (255, 255, 255))
-            (out_dir / "last_output.png").write_bytes(self._png_bytes(blank))
-            logger.debug("Simulation: cleared preview at %s", out_dir / "last_output.png")
+            self.simulator.refresh("clear", PanelBuffer(self.width, self.height, bytearray(white)))
+            logger.debug("Simulation: cleared")
+            self._remember_frame(white)
             return
         try:
             logger.debug("EPD.Clear()")
-            self.epd.Clear()
+            with self.bus.lock:
+                self.epd.Clear()
+            self.simulator.record("clear", PanelBuffer(self.width, self.height, bytearray(white)))
+            self._remember_frame(white)
         except Exception as exc:
             logger.error("Clear failed: %s", exc)
+            self._remember_frame(None)
 
-    def sleep(self) -> None:
-        if self.epd is None:
-            return
-        try:
-            logger.debug("EPD.sleep()")
-            self.epd.sleep()
-        except Exception:
-            pass
-
-    @staticmethod
-    def _png_bytes(image: Image.Image) -> bytes:
-        from io import BytesIO
-
-        buf = BytesIO()
-        image.save(buf, format="PNG")
-        return buf.getvalue()
+    def _preview_name(self) -> str:
+        return "last_output.png" if self.name == "default" else f"last_output_{self.name}.png"
 
+    def _white_frame(self) -> bytes:
+        # Index 1 (white) in both nibbles
+        return b"\x11" * ((self.width + (self.width % 2)) * self.height // 2)
 
+    def sleep(self) -> None:
+        with self._power_lock:
+            if self.power_state != "ready":
+                return
+            if self.epd is not None:
+                try:
+                    logger.debug("EPD.sleep()")
+                    # module_exit inside only closes the bus once no other panel holds it
+                    with self.bus.lock:
+                        self.epd.sleep()
+                except Exception:
+                    pass
+            self._set_power_state("asleep")
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Literal, Sequence, Tuple, Union
+import logging
+
+import numpy as np
+
+from .palette import FIVE65F_PALETTE, LUT_BITS, build_palette_lut, map_to_palette_indices
+
+logger = logging.getLogger(__name__)
+
+
+DitherMode = Literal["none", "floyd-steinberg", "atkinson", "bayer", "blue-noise"]
+
+DITHER_MODES: Tuple[str, ...] = ("none", "floyd-steinberg", "atkinson", "bayer", "blue-noise")
+
+_ALIASES = {
+    "0": "none",
+    "false": "none",
+    "off": "none",
+    "no": "none",
+    "1": "floyd-steinberg",
+    "true": "floyd-steinberg",
+    "on": "floyd-steinberg",
+    "yes": "floyd-steinberg",
+    "fs": "floyd-steinberg",
+    "floyd_steinberg": "floyd-steinberg",
+    "floydsteinberg": "floyd-steinberg",
+    "ordered": "bayer",
+    "blue_noise": "blue-noise",
+    "bluenoise": "blue-noise",
+}
+
+# Amplitude of the threshold offset added before palette lookup. The panel
+# primaries sit at 0/255 per channel, so a full step spreads a mid-tone evenly
+# between its two neighbours.
+ORDERED_SPREAD = 255.0
+
+BLUE_NOISE_SIZE = 64
+
+
+def normalize_dither(value: Union[str, bool, int, None]) -> DitherMode:
+    """Accept legacy booleans/flags as well as mode names."""
+    if value is None:
+        return "floyd-steinberg"
+    if isinstance(value, bool):
+        return "floyd-steinberg" if value else "none"
+    key = str(value).strip().lower()
+    key = _ALIASES.get(key, key)
+    if key not in DITHER_MODES:
+        raise ValueError(f"unknown dither mode: {value!r} (expected one of {', '.join(DITHER_MODES)})")
+    return key  # type: ignore[return-value]
+
+
+@lru_cache(maxsize=4)
+def bayer_matrix(size: int = 8) -> np.ndarray:
+    """Normalized Bayer threshold matrix in [0, 1) for a power-of-two ``size``."""
+    if size < 2 or size & (size - 1):
+        raise ValueError("Bayer matrix size must be a power of two >= 2")
+    m = np.array([[0, 2], [3, 1]], dtype=np.float32)
+    while m.shape[0] < size:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    m = (m + 0.5) / m.size
+    m.flags.writeable = False
+    return m
+
+
+@lru_cache(maxsize=2)
+def blue_noise_matrix(size: int = BLUE_NOISE_SIZE, sigma: float = 1.5) -> np.ndarray:
+    """Blue-noise threshold matrix in [0, 1) built with void-and-cluster.
+
+    Generated once per process; the energy field is updated incrementally with
+    a toroidal Gaussian so each step is a single array add.
+    """
+    n = size * size
+    coords = np.arange(size)
+    d = np.minimum(coords, size - coords).astype(np.float32)
+    kernel = np.exp(-(d[:, None] ** 2 + d[None, :] ** 2) / (2 * sigma * sigma))
+
+    def splat(energy: np.ndarray, y: int, x: int, sign: float) -> None:
+        energy += sign * np.roll(np.roll(kernel, y, axis=0), x, axis=1)
+
+    rng = np.random.default_rng(0x5EED)
+    pattern = np.zeros((size, size), dtype=bool)
+    energy = np.zeros((size, size), dtype=np.float32)
+    initial = n // 10
+    for flat in rng.choice(n, size=initial, replace=False):
+        y, x = divmod(int(flat), size)
+        pattern[y, x] = True
+        splat(energy, y, x, 1.0)
+
+    # Spread the initial pattern: move tightest cluster into the largest void until stable
+    while True:
+        y, x = np.unravel_index(np.argmax(np.where(pattern, energy, -np.inf)), pattern.shape)
+        pattern[y, x] = False
+        splat(energy, y, x, -1.0)
+        vy, vx = np.unravel_index(np.argmin(np.where(pattern, np.inf, energy)), pattern.shape)
+        if (vy, vx) == (y, x):
+            pattern[y, x] = True
+            splat(energy, y, x, 1.0)
+            break
+        pattern[vy, vx] = True
+        splat(energy, vy, vx, 1.0)
+
+    ranks = np.zeros((size, size), dtype=np.int32)
+    prototype = pattern.copy()
+    proto_energy = energy.copy()
+    # Phase 1: remove clusters from the prototype, ranking downwards
+    for rank in range(initial - 1, -1, -1):
+        y, x = np.unravel_index(np.argmax(np.where(pattern, energy, -np.inf)), pattern.shape)
+        pattern[y, x] = False
+        splat(energy, y, x, -1.0)
+        ranks[y, x] = rank
+    # Phase 2/3: fill voids from the prototype, ranking upwards
+    pattern, energy = prototype, proto_energy
+    for rank in range(initial, n):
+        y, x = np.unravel_index(np.argmin(np.where(pattern, np.inf, energy)), pattern.shape)
+        pattern[y, x] = True
+        splat(energy, y, x, 1.0)
+        ranks[y, x] = rank
+
+    m = ((ranks + 0.5) / n).astype(np.float32)
+    m.flags.writeable = False
+    logger.debug("blue_noise_matrix: generated %dx%d", size, size)
+    return m
+
+
+def tile_threshold(matrix: np.ndarray, height: int, width: int) -> np.ndarray:
+    """Repeat a threshold matrix to cover a ``height`` x ``width`` frame."""
+    mh, mw = matrix.shape
+    reps = (-(-height // mh), -(-width // mw))
+    return np.tile(matrix, reps)[:height, :width]
+
+
+def ordered_dither_indices(
+    rgb: np.ndarray,
+    matrix: np.ndarray,
+    colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+    spread: float = ORDERED_SPREAD,
+) -> np.ndarray:
+    """Threshold-matrix dithering as whole-array operations, then LUT lookup."""
+    height, width = rgb.shape[:2]
+    offsets = (tile_threshold(matrix, height, width) - 0.5) * spread
+    adjusted = rgb.astype(np.float32) + offsets[..., None]
+    np.clip(adjusted, 0, 255, out=adjusted)
+    return map_to_palette_indices(adjusted.astype(np.uint8), colors)
+
+
+def atkinson_indices(
+    rgb: np.ndarray, colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE
+) -> np.ndarray:
+    """Atkinson error diffusion (6/8 of the error propagated).
+
+    Pixel (y, x) only depends on pixels with a smaller ``x + 2y``, so each
+    such wavefront is quantized as one array step. The image is skewed so a
+    wavefront is a contiguous slice, and the error for the next four
+    wavefronts is kept in a ring of five rows.
+    """
+    height, width = rgb.shape[:2]
+    lut = build_palette_lut(colors)
+    shift = 8 - LUT_BITS
+    pal = np.asarray(colors, dtype=np.float64)
+    steps = width + 2 * (height - 1)
+    # Skewed layout: pixel (y, x) lives at [x + 2y, y]
+    src = np.zeros((steps, height, 3), dtype=np.uint8)
+    for y in range(height):
+        src[2 * y : 2 * y + width, y] = rgb[y]
+    skewed = np.zeros((steps, height), dtype=np.uint8)
+    # err[t % 5] holds the error diffused into wavefront t, padded by 2 rows
+    err = np.zeros((5, height + 2, 3), dtype=np.float64)
+    for t in range(steps):
+        y0 = max(0, -(-(t - width + 1) // 2))
+        y1 = min(height - 1, t // 2) + 1
+        val = src[t, y0:y1] + err[t % 5, y0:y1]
+        q = np.clip(val, 0, 255).astype(np.intp) >> shift
+        idx = lut[(q[:, 0] << LUT_BITS | q[:, 1]) << LUT_BITS | q[:, 2]]
+        skewed[t, y0:y1] = idx
+        e = (val - pal[idx]) * 0.125
+        # (y, x+1), (y, x+2), (y+1, x-1), (y+1, x), (y+1, x+1), (y+2, x)
+        err[(t + 1) % 5, y0:y1] += e
+        err[(t + 2) % 5, y0:y1] += e
+        err[(t + 1) % 5, y0 + 1 : y1 + 1] += e
+        err[(t + 2) % 5, y0 + 1 : y1 + 1] += e
+        err[(t + 3) % 5, y0 + 1 : y1 + 1] += e
+        err[(t + 4) % 5, y0 + 2 : y1 + 2] += e
+        err[t % 5] = 0.0
+    out = np.empty((height, width), dtype=np.uint8)
+    for y in range(height):
+        out[y] = skewed[2 * y : 2 * y + width, y]
+    return out
+
+
+def dither_to_indices(
+    rgb: np.ndarray,
+    mode: DitherMode,
+    colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> np.ndarray:
+    """Array-based strategies; Floyd-Steinberg is handled by Pillow."""
+    if mode == "none":
+        return map_to_palette_indices(rgb, colors)
+    if mode == "bayer":
+        return ordered_dither_indices(rgb, bayer_matrix(8), colors)
+    if mode == "blue-noise":
+        return ordered_dither_indices(rgb, blue_noise_matrix(), colors)
+    if mode == "atkinson":
+        return atkinson_indices(rgb, colors)
+    raise ValueError(f"dither mode {mode!r} is not array-based")
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from .palette import FIVE65F_PALETTE
+
+logger = logging.getLogger(__name__)
+
+
+class PanelModel(NamedTuple):
+    """Static description of a supported Waveshare panel."""
+
+    name: str
+    # Driver module in the packaged layout (waveshare_epd.*)
+    module: str
+    width: int
+    height: int
+    palette: Tuple[Tuple[int, int, int], ...]
+    # Framebuffer layout expected by EPD.display(); only "4bpp" (two palette
+    # indices per byte, left pixel in the high nibble) is implemented
+    packing: str
+    # Approximate full-refresh duration, used for scheduling and simulation
+    refresh_seconds: float
+    # Command that opens the frame RAM write (data transmission start)
+    frame_command: int = 0x10
+    # Controller follows the resolution/frame/power-on/refresh/power-off
+    # sequence that transport.SpiTransport.upload_frame drives directly
+    bulk_upload: bool = False
+
+
+MODELS: Dict[str, PanelModel] = {}
+
+
+def register_model(model: PanelModel) -> None:
+    MODELS[model.name.lower()] = model
+    logger.debug("Registered panel model %s (%sx%s %s)", model.name, model.width, model.height, model.packing)
+
+
+def get_model(name: str) -> PanelModel:
+    try:
+        return MODELS[name.lower()]
+    except KeyError:
+        raise RuntimeError(f"Unsupported display model: {name}") from None
+
+
+# The ACeP 7-color panels share palette order and nibble packing
+_ACEP_PALETTE = tuple(FIVE65F_PALETTE)
+
+register_model(PanelModel("5in65f", "waveshare_epd.epd5in65f", 600, 448, _ACEP_PALETTE, "4bpp", 12.0, bulk_upload=True))
+register_model(PanelModel("4in01f", "waveshare_epd.epd4in01f", 640, 400, _ACEP_PALETTE, "4bpp", 12.0, bulk_upload=True))
+register_model(PanelModel("7in3f", "waveshare_epd.epd7in3f", 800, 480, _ACEP_PALETTE, "4bpp", 20.0))
+
+
+class DisplayConfig(NamedTuple):
+    """One named panel attached to this host."""
+
+    name: str
+    model: str = "5in65f"
+    orientation: str = "landscape"
+    # Overrides for the EPD instance pin attributes (rst, dc, cs, busy, pwr);
+    # ignored by the stock epdconfig, which drives fixed pins
+    pins: Dict[str, int] = {}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DisplayConfig":
+        if "name" not in data:
+            raise ValueError("display config needs a name")
+        return cls(
+            name=str(data["name"]),
+            model=str(data.get("model", "5in65f")).lower(),
+            orientation=str(data.get("orientation", "landscape")),
+            pins={str(k): int(v) for k, v in (data.get("pins") or {}).items()},
+        )
+
+
+def content_rotation(orientation: str, rotate: int = 0) -> int:
+    """Total rotation for a frame drawn in the panel's native geometry.
+
+    Portrait panels rotate content by 90 degrees on top of ``rotate``; every
+    path that prepares frames (HTTP, daemon, offline compile) goes through
+    here so identical requests give identical frames and cache keys.
+    """
+    return (int(rotate) + (90 if orientation == "portrait" else 0)) % 360
+
+
+def load_display_configs() -> List[DisplayConfig]:
+    """Read panel definitions from ``EPAPER_DISPLAYS`` (JSON list or path to a JSON file).
+
+    Without it a single display named "default" is built from
+    ``WAVESHARE_DISPLAY_MODEL`` and ``EPAPER_ORIENTATION``.
+    """
+    spec = os.environ.get("EPAPER_DISPLAYS", "").strip()
+    if not spec:
+        return [
+            DisplayConfig(
+                name="default",
+                model=os.environ.get("WAVESHARE_DISPLAY_MODEL", "5in65f").lower(),
+                orientation=os.environ.get("EPAPER_ORIENTATION", "landscape"),
+            )
+        ]
+    if not spec.startswith("["):
+        spec = Path(spec).read_text(encoding="utf-8")
+    configs = [DisplayConfig.from_dict(item) for item in json.loads(spec)]
+    names = [c.name for c in configs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"duplicate display names in EPAPER_DISPLAYS: {names}")
+    for config in configs:
+        get_model(config.model)
+    return configs
@@ -0,0 +1,5 @@
+"""Hardware-free stand-ins for the Waveshare driver package.
+
+Point ``WAVESHARE_LIB_PATH`` at this directory to load ``waveshare_epd``
+from here instead of the vendored library.
+"""
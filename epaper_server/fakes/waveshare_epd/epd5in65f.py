@@ -0,0 +1,161 @@
+"""Fake 5.65" 7-color driver mirroring the vendor ``epd5in65f`` module.
+
+Command sequences, per-byte ``send_data`` loops and BUSY polling follow the
+vendor code so host-side cost is realistic; panel timing comes from
+``epdconfig.FakeController``.
+"""
+from __future__ import annotations
+
+import logging
+
+from PIL import Image
+
+from . import epdconfig
+
+logger = logging.getLogger(__name__)
+
+EPD_WIDTH = 600
+EPD_HEIGHT = 448
+
+
+class EPD:
+    def __init__(self) -> None:
+        self.reset_pin = epdconfig.RST_PIN
+        self.dc_pin = epdconfig.DC_PIN
+        self.busy_pin = epdconfig.BUSY_PIN
+        self.cs_pin = epdconfig.CS_PIN
+        self.width = EPD_WIDTH
+        self.height = EPD_HEIGHT
+        self.BLACK = 0x000000
+        self.WHITE = 0xFFFFFF
+        self.GREEN = 0x00FF00
+        self.BLUE = 0x0000FF
+        self.RED = 0xFF0000
+        self.YELLOW = 0xFFFF00
+        self.ORANGE = 0xFFA500
+
+    @property
+    def controller(self) -> epdconfig.FakeController:
+        return epdconfig.controller
+
+    # --- low level, as in the vendor driver
+    def reset(self) -> None:
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(600)
+        epdconfig.digital_write(self.reset_pin, 0)
+        epdconfig.delay_ms(2)
+        epdconfig.digital_write(self.reset_pin, 1)
+        epdconfig.delay_ms(200)
+
+    def send_command(self, command: int) -> None:
+        epdconfig.digital_write(self.dc_pin, 0)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte([command])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def send_data(self, data: int) -> None:
+        epdconfig.digital_write(self.dc_pin, 1)
+        epdconfig.digital_write(self.cs_pin, 0)
+        epdconfig.spi_writebyte([data])
+        epdconfig.digital_write(self.cs_pin, 1)
+
+    def ReadBusyHigh(self) -> None:
+        logger.debug("e-Paper busy")
+        while epdconfig.digital_read(self.busy_pin) == 0:
+            epdconfig.delay_ms(100)
+        logger.debug("e-Paper busy release")
+
+    def ReadBusyLow(self) -> None:
+        logger.debug("e-Paper busy")
+        while epdconfig.digital_read(self.busy_pin) == 1:
+            epdconfig.delay_ms(100)
+        logger.debug("e-Paper busy release")
+
+    def _set_resolution(self) -> None:
+        self.send_command(0x61)
+        self.send_data(self.width >> 8)
+        self.send_data(self.width & 0xFF)
+        self.send_data(self.height >> 8)
+        self.send_data(self.height & 0xFF)
+
+    def _refresh(self) -> None:
+        self.send_command(0x04)
+        self.ReadBusyHigh()
+        self.send_command(0x12)
+        self.ReadBusyHigh()
+        self.send_command(0x02)
+        self.ReadBusyLow()
+        epdconfig.delay_ms(500)
+
+    # --- public API
+    def init(self) -> int:
+        if epdconfig.module_init() != 0:
+            return -1
+        self.reset()
+        self.ReadBusyHigh()
+        for command, data in (
+            (0x00, (0xEF, 0x08)),
+            (0x01, (0x37, 0x00, 0x23, 0x23)),
+            (0x03, (0x00,)),
+            (0x06, (0xC7, 0xC7, 0x1D)),
+            (0x30, (0x3C,)),
+            (0x41, (0x00,)),
+            (0x50, (0x37,)),
+            (0x60, (0x22,)),
+        ):
+            self.send_command(command)
+            for value in data:
+                self.send_data(value)
+        self._set_resolution()
+        self.send_command(0xE3)
+        self.send_data(0xAA)
+        epdconfig.delay_ms(100)
+        self.send_command(0x50)
+        self.send_data(0x37)
+        return 0
+
+    def getbuffer(self, image: Image.Image) -> list:
+        pal_image = Image.new("P", (1, 1))
+        pal_image.putpalette((0, 0, 0, 255, 255, 255, 0, 255, 0, 0, 0, 255, 255, 0, 0, 255, 255, 0, 255, 128, 0) + (0, 0, 0) * 249)
+        imwidth, imheight = image.size
+        if imwidth == self.width and imheight == self.height:
+            image_temp = image
+        elif imwidth == self.height and imheight == self.width:
+            image_temp = image.rotate(90, expand=True)
+        else:
+            logger.warning(
+                "Invalid image dimensions: %d x %d, expected %d x %d", imwidth, imheight, self.width, self.height
+            )
+            image_temp = image.resize((self.width, self.height))
+        image_7color = image_temp.convert("RGB").quantize(palette=pal_image)
+        buf_7color = bytearray(image_7color.tobytes("raw"))
+        buf = [0x00] * (self.width * self.height // 2)
+        idx = 0
+        for i in range(0, len(buf_7color), 2):
+            buf[idx] = (buf_7color[i] << 4) + buf_7color[i + 1]
+            idx += 1
+        return buf
+
+    def display(self, image) -> None:
+        self._set_resolution()
+        self.send_command(0x10)
+        for i in range(0, self.height):
+            for j in range(0, self.width // 2):
+                self.send_data(image[j + (self.width // 2 * i)])
+        self._refresh()
+
+    def Clear(self, color: int = 0x1) -> None:
+        self._set_resolution()
+        self.send_command(0x10)
+        fill = (color << 4) | color
+        for _ in range(0, self.height * self.width // 2):
+            self.send_data(fill)
+        self._refresh()
+
+    def sleep(self) -> None:
+        epdconfig.delay_ms(100)
+        self.send_command(0x07)
+        self.send_data(0xA5)
+        epdconfig.delay_ms(100)
+        epdconfig.digital_write(self.reset_pin, 0)
+        epdconfig.module_exit()
@@ -0,0 +1,178 @@
+"""Fake ``epdconfig``: same module-level API as the vendor file, no GPIO or SPI.
+
+A ``FakeController`` sits behind the pins and the SPI bus. It decodes
+command/data bytes using the DC line, records every command, charges wire
+time for each transfer and drives the BUSY line from a timing model.
+
+``EPAPER_FAKE_TIME_SCALE`` multiplies every delay (``0`` runs instantly,
+``0.01`` makes a 12 s refresh take 120 ms). ``EPAPER_FAKE_SPI_HZ`` sets the
+emulated bus clock.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from epaper_server.transport import FakeSpiDevice
+
+logger = logging.getLogger(__name__)
+
+
+# Pin numbers of the vendor Raspberry Pi config
+RST_PIN = 17
+DC_PIN = 25
+CS_PIN = 8
+BUSY_PIN = 24
+PWR_PIN = 18
+
+TIME_SCALE = float(os.environ.get("EPAPER_FAKE_TIME_SCALE", "1"))
+SPI_HZ = int(os.environ.get("EPAPER_FAKE_SPI_HZ", "4000000"))
+
+# Host-side cost of one spidev ioctl; the per-byte vendor path pays it per byte
+CALL_OVERHEAD = 20e-6
+
+# command -> (BUSY level while running, seconds, level afterwards)
+# Power-off releases BUSY by pulling the line low, hence the inverted levels.
+COMMAND_TIMING: Dict[int, Tuple[int, float, int]] = {
+    0x04: (0, 0.2, 1),   # power on
+    0x12: (0, 12.0, 1),  # display refresh
+    0x02: (1, 0.2, 0),   # power off
+}
+RESET_SECONDS = 0.2
+
+
+class FakeController:
+    """Controller state behind the fake pins and bus."""
+
+    def __init__(self, *, history: int = 4096) -> None:
+        self.levels: Dict[int, int] = {}
+        self.commands: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.counts: Dict[int, int] = {}
+        self.frame_bytes = 0
+        self.bytes_received = 0
+        self.transfers = 0
+        self.busy_time = 0.0
+        self._current: Optional[Dict[str, Any]] = None
+        self._busy: Tuple[int, float, int] = (1, 0.0, 1)
+        self._debt = 0.0
+        self._lock = threading.Lock()
+
+    # --- timing
+    def charge(self, seconds: float) -> None:
+        """Sleep for emulated time, batching sub-millisecond costs."""
+        self._debt += seconds * TIME_SCALE
+        if self._debt >= 0.001:
+            time.sleep(self._debt)
+            self._debt = 0.0
+
+    def _hold_busy(self, during: int, seconds: float, after: int) -> None:
+        self.busy_time += seconds
+        self._busy = (during, time.monotonic() + seconds * TIME_SCALE, after)
+
+    # --- pins
+    def write_pin(self, pin: int, value: int) -> None:
+        previous = self.levels.get(pin)
+        self.levels[pin] = value
+        if pin == RST_PIN and previous == 0 and value == 1:
+            with self._lock:
+                self.commands.append({"at": time.time(), "cmd": "reset", "data": 0})
+            self._hold_busy(0, RESET_SECONDS, 1)
+
+    def read_pin(self, pin: int) -> int:
+        if pin != BUSY_PIN:
+            return self.levels.get(pin, 0)
+        during, until, after = self._busy
+        return during if time.monotonic() < until else after
+
+    # --- bus
+    def feed(self, data: bytes) -> None:
+        self.transfers += 1
+        self.bytes_received += len(data)
+        self.charge(CALL_OVERHEAD + len(data) * 8 / SPI_HZ)
+        if self.levels.get(DC_PIN, 0) == 0:
+            for cmd in data:
+                self._command(cmd)
+        elif self._current is not None:
+            self._current["data"] += len(data)
+            if self._current["cmd"] == 0x10:
+                self.frame_bytes += len(data)
+
+    def _command(self, cmd: int) -> None:
+        entry = {"at": time.time(), "cmd": cmd, "data": 0}
+        with self._lock:
+            self.commands.append(entry)
+            self.counts[cmd] = self.counts.get(cmd, 0) + 1
+        self._current = entry
+        timing = COMMAND_TIMING.get(cmd)
+        if timing is not None:
+            during, seconds, after = timing
+            self._hold_busy(during, seconds, after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "commands": {f"0x{cmd:02x}": n for cmd, n in sorted(self.counts.items())},
+                "transfers": self.transfers,
+                "bytes": self.bytes_received,
+                "frame_bytes": self.frame_bytes,
+                "emulated_busy_seconds": round(self.busy_time, 3),
+                "time_scale": TIME_SCALE,
+            }
+
+
+controller = FakeController()
+
+
+class _FakeBus(FakeSpiDevice):
+    def __init__(self) -> None:
+        super().__init__(max_speed_hz=SPI_HZ)
+        self.mode = 0
+
+    def _transfer(self, data) -> None:
+        # Only count here; the controller keeps the bytes it needs
+        self.calls += 1
+        self.bytes_written += len(data)
+        controller.feed(bytes(data))
+
+    def close(self) -> None:
+        pass
+
+
+SPI = _FakeBus()
+
+
+def digital_write(pin: int, value: int) -> None:
+    controller.write_pin(pin, value)
+
+
+def digital_read(pin: int) -> int:
+    return controller.read_pin(pin)
+
+
+def delay_ms(delaytime: float) -> None:
+    time.sleep(delaytime / 1000.0 * TIME_SCALE)
+
+
+def spi_writebyte(data: List[int]) -> None:
+    SPI.writebytes(data)
+
+
+def spi_writebyte2(data) -> None:
+    SPI.writebytes2(data)
+
+
+def module_init(cleanup: bool = False) -> int:
+    logger.debug("fake epdconfig: module_init")
+    controller.write_pin(PWR_PIN, 1)
+    return 0
+
+
+def module_exit(cleanup: bool = False) -> None:
+    logger.debug("fake epdconfig: module_exit")
+    controller.write_pin(RST_PIN, 0)
+    controller.write_pin(DC_PIN, 0)
+    controller.write_pin(PWR_PIN, 0)
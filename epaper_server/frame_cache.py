@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .framebuffer import PanelBuffer
+from .metrics import FRAME_CACHE
+from .palette import FIVE65F_PALETTE
+
+logger = logging.getLogger(__name__)
+
+
+# Bump when the prep pipeline changes output for identical inputs
+CACHE_VERSION = 1
+
+_DISK_MAGIC = b"EPC2"
+# magic, width, height, length of the JSON metadata that precedes the pixels
+_DISK_HEADER = struct.Struct("<4sHHI")
+# Metadata key holding a buffer's palette when it is not the 5.65" one
+_PALETTE_META = "_palette"
+
+Entry = Tuple[PanelBuffer, Dict[str, Any]]
+
+
+def _default_cache_dir() -> Optional[Path]:
+    env_dir = os.environ.get("EPAPER_CACHE_DIR")
+    if env_dir is not None:
+        # Explicit empty value disables the disk tier
+        return Path(env_dir) if env_dir else None
+    base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "epaper" / "frames"
+
+
+def make_cache_key(raw: bytes, **params: Any) -> str:
+    """Content-addressed key: source bytes plus every parameter that affects the output."""
+    digest = hashlib.sha256()
+    digest.update(raw)
+    digest.update(json.dumps({"v": CACHE_VERSION, **params}, sort_keys=True, default=list).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class FrameCache:
+    """Two-tier cache of prepared panel buffers.
+
+    The memory tier is an LRU of ``max_entries`` buffers. The optional disk
+    tier keeps one file per key and evicts least recently used files once
+    the directory exceeds ``max_disk_bytes``. Entries may carry a small JSON
+    metadata dict (e.g. the font size an auto-fit text render settled on).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 32,
+        directory: Optional[Path] = None,
+        max_disk_bytes: int = 64 * 1024 * 1024,
+    ) -> None:
+        self.max_entries = max_entries
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._disk_bytes = sum(p.stat().st_size for p in self.directory.glob("*.bin"))
+            except OSError as exc:
+                logger.warning("Frame cache disk tier disabled (%s): %s", self.directory, exc)
+                self.directory = None
+
+    @classmethod
+    def from_env(cls) -> "FrameCache":
+        max_entries = int(os.environ.get("EPAPER_CACHE_ENTRIES", "32"))
+        max_disk_mb = float(os.environ.get("EPAPER_CACHE_MAX_MB", "64"))
+        return cls(
+            max_entries=max_entries,
+            directory=_default_cache_dir(),
+            max_disk_bytes=int(max_disk_mb * 1024 * 1024),
+        )
+
+    # --- lookups
+    def get(self, key: str) -> Optional[PanelBuffer]:
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                FRAME_CACHE.inc("memory_hit")
+                logger.debug("FrameCache: memory hit %s", key[:12])
+                return entry
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                FRAME_CACHE.inc("miss")
+                logger.debug("FrameCache: miss %s", key[:12])
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            FRAME_CACHE.inc("disk_hit")
+            self._remember(key, entry)
+        logger.debug("FrameCache: disk hit %s", key[:12])
+        return entry
+
+    def put(self, key: str, buf: PanelBuffer, meta: Optional[Dict[str, Any]] = None) -> None:
+        entry = (buf, dict(meta or {}))
+        with self._lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_dir": str(self.directory) if self.directory is not None else None,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
+
+    # --- internals
+    def _remember(self, key: str, entry: Entry) -> None:
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _path_for(self, key: str) -> Path:
+        assert self.directory is not None
+        return self.directory / f"{key}.bin"
+
+    def _read_disk(self, key: str) -> Optional[Entry]:
+        if self.directory is None:
+            return None
+        path = self._path_for(key)
+        try:
+            blob = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("FrameCache: read failed %s: %s", path, exc)
+            return None
+        try:
+            magic, width, height, meta_len = _DISK_HEADER.unpack_from(blob)
+            if magic != _DISK_MAGIC:
+                raise ValueError("bad magic")
+            start = _DISK_HEADER.size + meta_len
+            meta = json.loads(blob[_DISK_HEADER.size:start]) if meta_len else {}
+            palette = tuple(tuple(c) for c in meta.pop(_PALETTE_META, ())) or FIVE65F_PALETTE
+            entry: Entry = (PanelBuffer(width, height, bytearray(blob[start:]), palette), meta)
+        except (struct.error, ValueError) as exc:
+            logger.warning("FrameCache: discarding corrupt entry %s: %s", path, exc)
+            self._unlink(path)
+            return None
+        try:
+            # Touch so disk eviction is least-recently-used rather than oldest-written
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _write_disk(self, key: str, entry: Entry) -> None:
+        if self.directory is None:
+            return
+        buf, meta = entry
+        path = self._path_for(key)
+        # Per writer: another thread or process may be storing the same key
+        tmp = path.with_name(f".{path.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if tuple(buf.palette) != tuple(FIVE65F_PALETTE):
+            meta = {**meta, _PALETTE_META: [list(c) for c in buf.palette]}
+        meta_blob = json.dumps(meta, sort_keys=True).encode("utf-8") if meta else b""
+        blob = _DISK_HEADER.pack(_DISK_MAGIC, buf.width, buf.height, len(meta_blob)) + meta_blob + bytes(buf.data)
+        try:
+            existed = path.exists()
+            tmp.write_bytes(blob)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("FrameCache: write failed %s: %s", path, exc)
+            self._unlink(tmp)
+            return
+        with self._lock:
+            if not existed:
+                self._disk_bytes += len(blob)
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        assert self.directory is not None
+        entries = []
+        for p in self.directory.glob("*.bin"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in entries:
+            if total <= self.max_disk_bytes:
+                break
+            if self._unlink(p):
+                total -= size
+                with self._lock:
+                    self.evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+        logger.debug("FrameCache: disk usage after eviction %d bytes", total)
+
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,126 @@
+"""Precompiled frame files (``.epf``).
+
+A frame file holds one prepared, packed 4bpp panel buffer plus the JSON
+metadata needed to check it against a panel (model, geometry, palette) and
+to trace where it came from (source hash, prep parameters). Layout::
+
+    header  <4sHHHIII  magic, format version, width, height,
+                       metadata length, data offset, data length
+    JSON metadata (UTF-8)
+    zero padding up to ``data offset`` (a multiple of 64)
+    packed pixels, two per byte, high nibble first
+
+Files are read through ``mmap`` and the pixel region is handed to the
+display as a ``memoryview`` of the mapping, so nothing is decoded or copied.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional, Union
+
+from .drivers import PanelModel
+from .framebuffer import PanelBuffer
+from .palette import FIVE65F_PALETTE
+
+EPF_MAGIC = b"EPF1"
+EPF_VERSION = 1
+EPF_SUFFIX = ".epf"
+
+_HEADER = struct.Struct("<4sHHHIII")
+_ALIGN = 64
+
+
+class FrameFile(NamedTuple):
+    buffer: PanelBuffer
+    meta: Dict[str, Any]
+
+    @property
+    def model(self) -> Optional[str]:
+        return self.meta.get("model")
+
+
+def pack_frame(
+    buf: PanelBuffer,
+    *,
+    model: str,
+    source_sha256: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> bytes:
+    meta = {
+        "model": model,
+        "width": buf.width,
+        "height": buf.height,
+        "palette": [list(c) for c in buf.palette],
+        "source_sha256": source_sha256,
+        "params": dict(params or {}),
+        "created": time.time(),
+    }
+    meta_blob = json.dumps(meta, sort_keys=True).encode("utf-8")
+    offset = -(-(_HEADER.size + len(meta_blob)) // _ALIGN) * _ALIGN
+    header = _HEADER.pack(EPF_MAGIC, EPF_VERSION, buf.width, buf.height, len(meta_blob), offset, len(buf.data))
+    padding = bytes(offset - _HEADER.size - len(meta_blob))
+    return header + meta_blob + padding + bytes(buf.data)
+
+
+def write_frame_file(path: Path, buf: PanelBuffer, **kwargs: Any) -> int:
+    """Atomically write ``buf`` to ``path``; returns the file size."""
+    blob = pack_frame(buf, **kwargs)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def parse_frame(data: Union[bytes, bytearray, memoryview, mmap.mmap]) -> FrameFile:
+    """Parse a frame file held in memory; the pixels stay a view into ``data``.
+
+    Raises ValueError for anything that is not a complete frame file.
+    """
+    view = memoryview(data)
+    try:
+        magic, version, width, height, meta_len, offset, length = _HEADER.unpack_from(view)
+    except struct.error as exc:
+        raise ValueError("not a frame file (truncated header)") from exc
+    if magic != EPF_MAGIC:
+        raise ValueError("not a frame file (bad magic)")
+    if version != EPF_VERSION:
+        raise ValueError(f"unsupported frame file version {version}")
+    if offset < _HEADER.size + meta_len or offset + length > len(view):
+        raise ValueError("frame file is truncated")
+    meta = json.loads(bytes(view[_HEADER.size:_HEADER.size + meta_len]))
+    palette = tuple(tuple(c) for c in meta.get("palette", ())) or FIVE65F_PALETTE
+    return FrameFile(PanelBuffer(width, height, view[offset:offset + length], palette), meta)
+
+
+def map_frame_file(path: Path) -> mmap.mmap:
+    """Read-only mapping of ``path``, to be handed to ``parse_frame``."""
+    with open(path, "rb") as fh:
+        try:
+            return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:  # empty file
+            raise ValueError(f"not a frame file: {path}") from exc
+
+
+def open_frame_file(path: Path) -> FrameFile:
+    """Memory-map ``path`` and parse it.
+
+    The mapping lives as long as the returned buffer is referenced.
+    """
+    return parse_frame(map_frame_file(path))
+
+
+def check_compatible(frame: FrameFile, spec: PanelModel) -> None:
+    """Raise ValueError unless ``frame`` was compiled for panels like ``spec``."""
+    if frame.model is not None and frame.model != spec.name:
+        raise ValueError(f"frame was compiled for {frame.model}, display is {spec.name}")
+    if frame.buffer.size != (spec.width, spec.height):
+        raise ValueError(
+            f"frame is {frame.buffer.width}x{frame.buffer.height}, {spec.name} expects {spec.width}x{spec.height}"
+        )
+    if tuple(frame.buffer.palette) != tuple(spec.palette):
+        raise ValueError(f"frame palette does not match the {spec.name} palette")
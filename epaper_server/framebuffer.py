@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import logging
+from typing import Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .metrics import timed
+from .palette import FIVE65F_PALETTE, indices_to_image
+
+logger = logging.getLogger(__name__)
+
+
+def pack_4bpp(indices: np.ndarray) -> bytearray:
+    """Pack an ``(H, W)`` array of palette indices two pixels per byte.
+
+    The left pixel goes in the high nibble, matching the 5in65f controller's
+    data transmission order. Odd widths are padded with index 1 (white).
+    """
+    if indices.ndim != 2:
+        raise ValueError(f"expected a 2D index array, got shape {indices.shape}")
+    rows = np.asarray(indices, dtype=np.uint8)
+    if rows.shape[1] % 2:
+        rows = np.pad(rows, ((0, 0), (0, 1)), constant_values=1)
+    pairs = rows.reshape(-1, 2)
+    packed = (pairs[:, 0] << 4) | (pairs[:, 1] & 0x0F)
+    return bytearray(packed.tobytes())
+
+
+def unpack_4bpp(data: bytes | bytearray | memoryview, width: int, height: int) -> np.ndarray:
+    padded_width = width + (width % 2)
+    packed = np.frombuffer(data, dtype=np.uint8, count=padded_width * height // 2)
+    indices = np.empty(packed.size * 2, dtype=np.uint8)
+    indices[0::2] = packed >> 4
+    indices[1::2] = packed & 0x0F
+    return indices.reshape(height, padded_width)[:, :width]
+
+
+class PanelBuffer:
+    """Packed 4-bit framebuffer ready to be sent to the panel controller."""
+
+    __slots__ = ("width", "height", "data", "palette")
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        data: bytearray | memoryview,
+        palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+    ) -> None:
+        expected = (width + (width % 2)) * height // 2
+        if len(data) != expected:
+            raise ValueError(f"buffer is {len(data)} bytes, expected {expected} for {width}x{height}")
+        self.width = width
+        self.height = height
+        self.data = data
+        self.palette = palette
+
+    @classmethod
+    def from_indices(
+        cls, indices: np.ndarray, palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE
+    ) -> "PanelBuffer":
+        height, width = indices.shape
+        return cls(width, height, pack_4bpp(indices), palette)
+
+    @classmethod
+    def from_image(
+        cls,
+        image: Image.Image,
+        width: int,
+        height: int,
+        palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+    ) -> "PanelBuffer":
+        """Build a buffer from a palette-indexed ("P") image.
+
+        Images in the transposed geometry are rotated by 90 degrees, as the
+        Waveshare ``getbuffer`` does.
+        """
+        if image.mode != "P":
+            raise ValueError(f"expected a palette-indexed image, got mode {image.mode}")
+        with timed("pack"):
+            if image.size == (height, width) and width != height:
+                image = image.transpose(Image.Transpose.ROTATE_90)
+            elif image.size != (width, height):
+                raise ValueError(f"image size {image.size} does not match panel {width}x{height}")
+            buf = cls.from_indices(np.asarray(image), palette)
+        logger.debug("PanelBuffer.from_image: %sx%s -> %d bytes", width, height, len(buf.data))
+        return buf
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+    def to_indices(self) -> np.ndarray:
+        return unpack_4bpp(self.data, self.width, self.height)
+
+    def to_image(self) -> Image.Image:
+        return indices_to_image(self.to_indices(), self.palette).convert("RGB")
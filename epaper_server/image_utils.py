@@ -1,25 +1,186 @@
 from __future__ import annotations
 
+import hashlib
 import io
-from typing import Literal, Tuple
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Literal, NamedTuple, Optional, Sequence, Tuple, Union
 import logging
 
 from PIL import Image, ImageOps
 
-from .palette import quantize_to_five65f
+from .dither import DitherMode, normalize_dither
+from .frame_cache import FrameCache, make_cache_key
+from .framebuffer import PanelBuffer
+from .metrics import collect_stages, timed
+from .palette import FIVE65F_PALETTE, quantize_to_indices
 
 logger = logging.getLogger(__name__)
 
 
 FitMode = Literal["fit", "fill", "stretch"]
 
+# Let Pillow box-reduce by integer factors until within this multiple of the
+# target size, then resample once with LANCZOS (see Image.resize reducing_gap).
+REDUCING_GAP = 3.0
 
-def open_image_from_bytes(data: bytes) -> Image.Image:
-    img = Image.open(io.BytesIO(data))
+# Modes the resamplers handle directly; anything else is converted first
+_RESAMPLE_MODES = ("RGB", "RGBA", "L")
+
+
+def draft_to_target(image: Image.Image, target_width: int, target_height: int) -> Image.Image:
+    """Ask the decoder for a reduced-resolution decode that still covers the target.
+
+    Only effective before the image is loaded; for JPEG this selects DCT
+    scaling (1/2, 1/4, 1/8) so oversized sources are never decoded in full.
+    """
+    src_size = image.size
+    try:
+        image.draft(image.mode, (target_width, target_height))
+    except Exception as exc:
+        logger.debug("draft_to_target: draft unsupported: %s", exc)
+        return image
+    if image.size != src_size:
+        logger.debug("draft_to_target: %s -> %s for target %sx%s", src_size, image.size, target_width, target_height)
+    return image
+
+
+def open_image_from_bytes(data: bytes, target_size: Optional[Tuple[int, int]] = None) -> Image.Image:
+    # Header parse only; pixels are decoded (and timed as "decode") on load
+    with timed("open"):
+        img = Image.open(io.BytesIO(data))
     logger.debug("Opened image from bytes: mode=%s size=%s format=%s", img.mode, img.size, getattr(img, 'format', None))
+    if target_size is not None:
+        draft_to_target(img, *target_size)
     return img
 
 
+# Single transpose equivalent to rotate(angle, expand=True) followed by an
+# optional left-right mirror, keyed by (angle, mirror)
+_TRANSPOSES = {
+    (0, True): Image.Transpose.FLIP_LEFT_RIGHT,
+    (90, False): Image.Transpose.ROTATE_90,
+    (90, True): Image.Transpose.TRANSVERSE,
+    (180, False): Image.Transpose.ROTATE_180,
+    (180, True): Image.Transpose.FLIP_TOP_BOTTOM,
+    (270, False): Image.Transpose.ROTATE_270,
+    (270, True): Image.Transpose.TRANSPOSE,
+}
+
+
+class GeometryPlan(NamedTuple):
+    """Everything needed to map a source image onto the panel in one resample.
+
+    ``crop`` is the source region (in source pixels) scaled to ``scaled_size``
+    and pasted at ``offset`` on a ``canvas_size`` canvas; the canvas is then
+    turned lossless via ``transpose``. ``residual_angle`` is non-zero only for
+    rotations that are not multiples of 90 degrees.
+    """
+
+    canvas_size: Tuple[int, int]
+    crop: Tuple[float, float, float, float]
+    scaled_size: Tuple[int, int]
+    offset: Tuple[int, int]
+    transpose: Optional[Image.Transpose]
+    residual_angle: int
+    mirror: bool
+
+
+def plan_geometry(
+    src_size: Tuple[int, int],
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    rotate: int = 0,
+    mirror: bool = False,
+) -> GeometryPlan:
+    angle = rotate % 360
+    quarter = angle % 90 == 0
+    # Lay out in the pre-rotation frame so the transposed result is width x height
+    if quarter and angle % 180 == 90:
+        box_w, box_h = height, width
+    else:
+        box_w, box_h = width, height
+
+    src_w, src_h = src_size
+    crop = (0.0, 0.0, float(src_w), float(src_h))
+    offset = (0, 0)
+    src_ratio = src_w / src_h
+    dst_ratio = box_w / box_h
+    if mode == "stretch":
+        scaled = (box_w, box_h)
+    elif mode == "fit":
+        if src_ratio > dst_ratio:
+            scaled = (box_w, max(1, int(box_w / src_ratio)))
+        else:
+            scaled = (max(1, int(box_h * src_ratio)), box_h)
+        offset = ((box_w - scaled[0]) // 2, (box_h - scaled[1]) // 2)
+    else:
+        # fill: crop the source to the target aspect, then scale the crop
+        if src_ratio > dst_ratio:
+            crop_w = src_h * dst_ratio
+            left = (src_w - crop_w) / 2
+            crop = (left, 0.0, left + crop_w, float(src_h))
+        else:
+            crop_h = src_w / dst_ratio
+            top = (src_h - crop_h) / 2
+            crop = (0.0, top, float(src_w), top + crop_h)
+        scaled = (box_w, box_h)
+
+    if quarter:
+        transpose = _TRANSPOSES.get((angle, bool(mirror)))
+        residual = 0
+        residual_mirror = False
+    else:
+        transpose = None
+        residual = angle
+        residual_mirror = bool(mirror)
+    return GeometryPlan((box_w, box_h), crop, scaled, offset, transpose, residual, residual_mirror)
+
+
+def apply_geometry(
+    image: Image.Image,
+    plan: GeometryPlan,
+    background: Tuple[int, int, int] = (255, 255, 255),
+) -> Image.Image:
+    crop = plan.crop
+    full = crop == (0.0, 0.0, float(image.width), float(image.height))
+    if image.size == plan.scaled_size and full:
+        resized = image.convert("RGB")
+    else:
+        resized = image.resize(
+            plan.scaled_size,
+            Image.LANCZOS,
+            box=None if full else crop,
+            reducing_gap=REDUCING_GAP,
+        ).convert("RGB")
+    if resized.size == plan.canvas_size:
+        out = resized
+    else:
+        out = Image.new("RGB", plan.canvas_size, background)
+        out.paste(resized, plan.offset)
+    if plan.transpose is not None:
+        out = out.transpose(plan.transpose)
+    if plan.residual_angle:
+        # Arbitrary angles cannot be lossless; rotate in place without changing the frame
+        out = out.rotate(plan.residual_angle, resample=Image.BICUBIC, fillcolor=background)
+    if plan.mirror:
+        out = out.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    logger.debug(
+        "apply_geometry: src=%s crop=%s scaled=%s offset=%s transpose=%s residual=%s -> %s",
+        image.size,
+        None if full else tuple(round(c, 1) for c in crop),
+        plan.scaled_size,
+        plan.offset,
+        plan.transpose,
+        plan.residual_angle,
+        out.size,
+    )
+    return out
+
+
 def fit_image(
     image: Image.Image,
     target_width: int,
@@ -28,70 +189,45 @@ def fit_image(
     background: Tuple[int, int, int] = (255, 255, 255),
 ) -> Image.Image:
     logger.debug("fit_image: src=%s target=%sx%s mode=%s", image.size, target_width, target_height, mode)
-    if mode == "stretch":
-        out = image.resize((target_width, target_height), Image.LANCZOS).convert("RGB")
-        logger.debug("fit_image: stretch -> %s", out.size)
-        return out
-
-    src_w, src_h = image.size
-    src_ratio = src_w / src_h
-    dst_ratio = target_width / target_height
-
-    if mode == "fit":
-        if src_ratio > dst_ratio:
-            new_w = target_width
-            new_h = int(new_w / src_ratio)
-        else:
-            new_h = target_height
-            new_w = int(new_h * src_ratio)
-        resized = image.resize((new_w, new_h), Image.LANCZOS).convert("RGB")
-        canvas = Image.new("RGB", (target_width, target_height), background)
-        off_x = (target_width - new_w) // 2
-        off_y = (target_height - new_h) // 2
-        canvas.paste(resized, (off_x, off_y))
-        logger.debug("fit_image: fit -> resized=%s pasted at (%s,%s) -> %s", (new_w, new_h), off_x, off_y, canvas.size)
-        return canvas
-
-    # mode == "fill"
-    if src_ratio > dst_ratio:
-        # source wider than target: crop width
-        new_h = target_height
-        new_w = int(new_h * src_ratio)
-    else:
-        new_w = target_width
-        new_h = int(new_w / src_ratio)
-    resized = image.resize((new_w, new_h), Image.LANCZOS).convert("RGB")
-    left = (new_w - target_width) // 2
-    top = (new_h - target_height) // 2
-    out = resized.crop((left, top, left + target_width, top + target_height))
-    logger.debug("fit_image: fill -> resized=%s crop=(%s,%s,%s,%s) -> %s", (new_w, new_h), left, top, left + target_width, top + target_height, out.size)
-    return out
+    with timed("fit"):
+        plan = plan_geometry(image.size, target_width, target_height, mode)
+        return apply_geometry(image, plan, background)
 
 
 def ensure_orientation(
     image: Image.Image, rotate: int = 0, mirror: bool = False
 ) -> Image.Image:
+    angle = rotate % 360
+    if angle % 90 == 0:
+        method = _TRANSPOSES.get((angle, bool(mirror)))
+        if method is not None:
+            logger.debug("ensure_orientation: rotate=%d mirror=%s via transpose", angle, mirror)
+            with timed("orientation"):
+                return image.transpose(method)
+        return image
     result = image
-    if rotate % 360 != 0:
-        logger.debug("ensure_orientation: rotate=%d", rotate)
+    logger.debug("ensure_orientation: rotate=%d", rotate)
+    with timed("orientation"):
         result = result.rotate(rotate, expand=True, resample=Image.BICUBIC)
-    if mirror:
-        logger.debug("ensure_orientation: mirror=True")
-        result = ImageOps.mirror(result)
+        if mirror:
+            logger.debug("ensure_orientation: mirror=True")
+            result = ImageOps.mirror(result)
     return result
 
 
-def prepare_5in65_image(
+def prepare_5in65_indexed(
     image: Image.Image,
     width: int,
     height: int,
     mode: FitMode = "fit",
-    dither: bool = True,
+    dither: Union[DitherMode, bool] = True,
     rotate: int = 0,
     mirror: bool = False,
+    *,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
 ) -> Image.Image:
     logger.debug(
-        "prepare_5in65_image: in mode=%s size=%s target=%sx%s mode=%s dither=%s rotate=%s mirror=%s",
+        "prepare_5in65_indexed: in mode=%s size=%s target=%sx%s mode=%s dither=%s rotate=%s mirror=%s",
         image.mode,
         image.size,
         width,
@@ -101,15 +237,226 @@ def prepare_5in65_image(
         rotate,
         mirror,
     )
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    image = fit_image(image, width, height, mode)
-    image = ensure_orientation(image, rotate=rotate, mirror=mirror)
-    image = quantize_to_five65f(image, dither=dither)
-    if image.size != (width, height):
-        image = image.resize((width, height), Image.NEAREST)
-        logger.debug("prepare_5in65_image: enforced final size -> %s", image.size)
-    logger.debug("prepare_5in65_image: out mode=%s size=%s", image.mode, image.size)
+    # Decode no more pixels than the (rotated) target needs, and defer RGB
+    # conversion until after the resample shrinks the image
+    src_size = image.size
+    plan = plan_geometry(src_size, width, height, mode, rotate=rotate, mirror=mirror)
+    draft_to_target(image, *plan.canvas_size)
+    if image.size != src_size:
+        # Draft shrank the decode; re-plan the crop against the new source size
+        plan = plan_geometry(image.size, width, height, mode, rotate=rotate, mirror=mirror)
+    # Open is lazy; load here so decode time is not billed to the resample
+    with timed("decode"):
+        image.load()
+    with timed("fit"):
+        # Crop, scale and rotate/mirror happen in this one pass
+        if image.mode not in _RESAMPLE_MODES:
+            image = image.convert("RGB")
+        image = apply_geometry(image, plan)
+    image = quantize_to_indices(image, dither=dither, colors=palette)
+    logger.debug("prepare_5in65_indexed: out mode=%s size=%s", image.mode, image.size)
     return image
 
 
+def prepare_5in65_image(
+    image: Image.Image,
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    dither: Union[DitherMode, bool] = True,
+    rotate: int = 0,
+    mirror: bool = False,
+    *,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> Image.Image:
+    indexed = prepare_5in65_indexed(
+        image, width, height, mode, dither=dither, rotate=rotate, mirror=mirror, palette=palette
+    )
+    return indexed.convert("RGB")
+
+
+def prepare_5in65_buffer(
+    image: Image.Image,
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    dither: Union[DitherMode, bool] = True,
+    rotate: int = 0,
+    mirror: bool = False,
+    *,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> PanelBuffer:
+    indexed = prepare_5in65_indexed(
+        image, width, height, mode, dither=dither, rotate=rotate, mirror=mirror, palette=palette
+    )
+    return PanelBuffer.from_image(indexed, width, height, tuple(palette))
+
+
+def image_cache_key(
+    raw: bytes,
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    dither: Union[DitherMode, bool] = True,
+    rotate: int = 0,
+    mirror: bool = False,
+    *,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> str:
+    """Frame-cache key for ``prepare_5in65_buffer_from_bytes``; also usable as an ETag."""
+    return make_cache_key(
+        raw,
+        width=width,
+        height=height,
+        mode=mode,
+        dither=normalize_dither(dither),
+        rotate=rotate % 360,
+        mirror=bool(mirror),
+        palette=[list(c) for c in palette],
+    )
+
+
+def prepare_5in65_buffer_from_bytes(
+    raw: bytes,
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    dither: Union[DitherMode, bool] = True,
+    rotate: int = 0,
+    mirror: bool = False,
+    cache: Optional[FrameCache] = None,
+    *,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> Tuple[PanelBuffer, bool]:
+    """Decode and prepare ``raw``, consulting ``cache`` first.
+
+    Returns the buffer and whether it was served from the cache.
+    """
+    dither_mode = normalize_dither(dither)
+    key = None
+    if cache is not None:
+        key = image_cache_key(raw, width, height, mode, dither_mode, rotate, mirror, palette=palette)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+    image = open_image_from_bytes(raw)
+    buf = prepare_5in65_buffer(
+        image, width, height, mode, dither=dither_mode, rotate=rotate, mirror=mirror, palette=palette
+    )
+    if cache is not None and key is not None:
+        cache.put(key, buf)
+    return buf, False
+
+
+class BatchResult(NamedTuple):
+    path: str
+    buffer: Optional[PanelBuffer]
+    key: Optional[str]
+    source_sha256: Optional[str]
+    seconds: float
+    stages: Dict[str, float]
+    cached: bool
+    error: Optional[str]
+
+
+# (path, width, height, mode, dither, rotate, mirror, palette, cache key, source
+# SHA-256); the hashes are None unless the parent already computed them for
+# its cache lookup. Plain tuples pickle cheaply.
+_BatchTask = Tuple[
+    str, int, int, str, str, int, bool, Tuple[Tuple[int, int, int], ...], Optional[str], Optional[str]
+]
+
+
+def _prepare_task(task: _BatchTask) -> BatchResult:
+    """Process-pool entry point; reads the file itself so only paths cross the pipe."""
+    path, width, height, mode, dither, rotate, mirror, palette, key, digest = task
+    start = time.perf_counter()
+    try:
+        with collect_stages() as stages:
+            raw = Path(path).read_bytes()
+            buf = prepare_5in65_buffer(
+                open_image_from_bytes(raw), width, height, mode, dither=dither, rotate=rotate, mirror=mirror, palette=palette  # type: ignore[arg-type]
+            )
+        if key is None:
+            key = image_cache_key(raw, width, height, mode, dither, rotate, mirror, palette=palette)  # type: ignore[arg-type]
+        if digest is None:
+            digest = hashlib.sha256(raw).hexdigest()
+    except Exception as exc:
+        return BatchResult(path, None, None, None, time.perf_counter() - start, {}, False, f"{type(exc).__name__}: {exc}")
+    return BatchResult(path, buf, key, digest, time.perf_counter() - start, stages, False, None)
+
+
+def prepare_many(
+    paths: Iterable[Union[str, Path]],
+    width: int,
+    height: int,
+    mode: FitMode = "fit",
+    dither: Union[DitherMode, bool] = True,
+    rotate: int = 0,
+    mirror: bool = False,
+    *,
+    cache: Optional[FrameCache] = None,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> Iterator[BatchResult]:
+    """Prepare many image files across a process pool, yielding results in input order.
+
+    Files already in ``cache`` are not sent to the pool (their results wait
+    for the ones before them); new buffers are stored in ``cache`` as they
+    arrive. A file that fails to decode yields a
+    result with ``error`` set instead of stopping the batch. ``workers=1``
+    runs in this process. ``chunksize`` defaults to about four chunks per
+    worker, which keeps per-task IPC low without leaving workers idle at the
+    end of the run.
+    """
+    dither_mode = normalize_dither(dither)
+    rotate = rotate % 360
+    colors = tuple(tuple(c) for c in palette)
+    tasks: List[_BatchTask] = []
+    # One slot per input: a result known up front (cache hit, unreadable file)
+    # or None for the next result from the pool
+    slots: List[Optional[BatchResult]] = []
+    for path in paths:
+        path = str(path)
+        key = digest = None
+        if cache is not None:
+            try:
+                raw = Path(path).read_bytes()
+            except OSError as exc:
+                slots.append(BatchResult(path, None, None, None, 0.0, {}, False, f"{type(exc).__name__}: {exc}"))
+                continue
+            key = image_cache_key(raw, width, height, mode, dither_mode, rotate, mirror, palette=colors)
+            digest = hashlib.sha256(raw).hexdigest()
+            cached = cache.get(key)
+            if cached is not None:
+                slots.append(BatchResult(path, cached, key, digest, 0.0, {}, True, None))
+                continue
+        slots.append(None)
+        tasks.append((path, width, height, mode, dither_mode, rotate, bool(mirror), colors, key, digest))  # type: ignore[arg-type]
+    if not tasks:
+        yield from slots  # type: ignore[misc]
+        return
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+    if chunksize is None:
+        chunksize = max(1, len(tasks) // (workers * 4))
+    logger.debug("prepare_many: %d files, %d workers, chunksize %d", len(tasks), workers, chunksize)
+    if workers == 1:
+        yield from _in_input_order(slots, map(_prepare_task, tasks), cache)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _in_input_order(slots, pool.map(_prepare_task, tasks, chunksize=chunksize), cache)
+
+
+def _in_input_order(
+    slots: List[Optional[BatchResult]], results: Iterator[BatchResult], cache: Optional[FrameCache]
+) -> Iterator[BatchResult]:
+    for slot in slots:
+        yield slot if slot is not None else _store(next(results), cache)
+
+
+def _store(result: BatchResult, cache: Optional[FrameCache]) -> BatchResult:
+    if cache is not None and result.buffer is not None and result.key is not None:
+        cache.put(result.key, result.buffer)
+    return result
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; spans sub-millisecond packing up to multi-second panel refreshes
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0,
+)
+
+
+_INF_LE = 'le="+Inf"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        key = tuple(str(v) for v in labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(tuple(str(v) for v in labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts, [sum, count])
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = tuple(str(v) for v in labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * len(self.buckets), [0.0, 0.0])
+            counts, totals = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            totals[0] += value
+            totals[1] += 1
+
+    def snapshot(self, *labels: str) -> Dict[str, float]:
+        with self._lock:
+            series = self._series.get(tuple(str(v) for v in labels))
+            if series is None:
+                return {"count": 0, "sum": 0.0}
+            return {"count": series[1][1], "sum": series[1][0]}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, (total, count)) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets, counts):
+                    cumulative += n
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, _INF_LE)} {_number(count)}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(count)}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[object] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(
+    Histogram("epaper_stage_seconds", "Time spent in each frame pipeline stage.", ["stage"])
+)
+JOB_SECONDS = REGISTRY.register(
+    Histogram("epaper_job_seconds", "Display job run time, excluding queueing.", ["display", "kind"])
+)
+JOB_QUEUE_SECONDS = REGISTRY.register(
+    Histogram("epaper_job_queue_seconds", "Time display jobs wait before running.", ["display"])
+)
+JOBS = REGISTRY.register(Counter("epaper_jobs_total", "Display jobs by final status.", ["display", "kind", "status"]))
+FRAMES = REGISTRY.register(
+    Counter("epaper_frames_total", "Frames offered to a panel by outcome.", ["display", "outcome"])
+)
+FRAME_CACHE = REGISTRY.register(Counter("epaper_frame_cache_total", "Prepared-frame cache lookups.", ["result"]))
+
+# Per-thread stage collector so a job can report its own breakdown
+_local = threading.local()
+
+
+def observe(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage)
+    collected: Optional[Dict[str, float]] = getattr(_local, "stages", None)
+    if collected is not None:
+        collected[stage] = collected.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    probe = getattr(_local, "probe", None)
+    if probe is not None:
+        probe.begin(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if probe is not None:
+            probe.end(stage)
+        observe(stage, elapsed)
+
+
+@contextmanager
+def probe_stages(probe: Any) -> Iterator[None]:
+    """Call ``probe.begin(stage)``/``probe.end(stage)`` around every timed stage on this thread.
+
+    Used by the benchmarks to attach memory measurements to stages.
+    """
+    previous = getattr(_local, "probe", None)
+    _local.probe = probe
+    try:
+        yield
+    finally:
+        _local.probe = previous
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Gather every stage observed on this thread inside the block."""
+    previous = getattr(_local, "stages", None)
+    stages: Dict[str, float] = {}
+    _local.stages = stages
+    try:
+        yield stages
+    finally:
+        _local.stages = previous
+
+
+def server_timing(stages: Dict[str, float]) -> str:
+    """``Server-Timing`` header value; durations are in milliseconds."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in stages.items())
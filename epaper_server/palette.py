@@ -1,5 +1,7 @@
-from typing import Iterable, List, Sequence, Tuple
+from functools import lru_cache
+from typing import Iterable, List, Sequence, Tuple, Union
 
+import numpy as np
 from PIL import Image
 
 
@@ -15,6 +17,12 @@ FIVE65F_PALETTE: List[Tuple[int, int, int]] = [
     (255, 165, 0),    # Orange (approx.)
 ]
 
+# Bits kept per channel when indexing the RGB -> palette lookup table.
+# 6 bits gives a 64x64x64 table (256 KiB of uint8), small enough for a Pi Zero.
+LUT_BITS = 6
+
+Palette = Tuple[Tuple[int, int, int], ...]
+
 
 def _flatten_palette(colors: Sequence[Tuple[int, int, int]]) -> List[int]:
     flat: List[int] = []
@@ -23,6 +31,11 @@ def _flatten_palette(colors: Sequence[Tuple[int, int, int]]) -> List[int]:
     return flat
 
 
+def _palette_key(colors: Iterable[Tuple[int, int, int]]) -> Palette:
+    # Normalize to a hashable tuple so per-palette work can be memoized
+    return tuple((int(r), int(g), int(b)) for r, g, b in colors)
+
+
 def build_palette_image(colors: Sequence[Tuple[int, int, int]]) -> Image.Image:
     palette_image = Image.new("P", (1, 1))
     flat = _flatten_palette(colors)
@@ -32,12 +45,106 @@ def build_palette_image(colors: Sequence[Tuple[int, int, int]]) -> Image.Image:
     return palette_image
 
 
-def quantize_to_five65f(image: Image.Image, dither: bool = True) -> Image.Image:
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    palette_img = build_palette_image(FIVE65F_PALETTE)
-    dither_flag = Image.FLOYDSTEINBERG if dither else Image.NONE
-    quantized = image.quantize(palette=palette_img, dither=dither_flag)
-    return quantized.convert("RGB")
+@lru_cache(maxsize=8)
+def _compact_palette_image(colors: Palette) -> Image.Image:
+    # Unpadded palette: quantize can only ever emit indices 0..len(colors)-1
+    palette_image = Image.new("P", (1, 1))
+    palette_image.putpalette(_flatten_palette(colors))
+    return palette_image
+
+
+@lru_cache(maxsize=8)
+def _build_lut(colors: Palette, bits: int) -> np.ndarray:
+    levels = 1 << bits
+    step = 256 // levels
+    # Sample each bucket at its center so rounding is symmetric
+    centers = np.arange(levels, dtype=np.int32) * step + step // 2
+    pal = np.asarray(colors, dtype=np.int32)
+    best = np.zeros((levels, levels, levels), dtype=np.uint8)
+    best_dist = np.full((levels, levels, levels), np.iinfo(np.int32).max, dtype=np.int32)
+    r = centers[:, None, None]
+    g = centers[None, :, None]
+    b = centers[None, None, :]
+    for idx, (pr, pg, pb) in enumerate(pal):
+        dist = (r - pr) ** 2 + (g - pg) ** 2 + (b - pb) ** 2
+        closer = dist < best_dist
+        best[closer] = idx
+        best_dist = np.where(closer, dist, best_dist)
+    lut = best.reshape(-1)
+    lut.flags.writeable = False
+    return lut
+
+
+def build_palette_lut(
+    colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE, bits: int = LUT_BITS
+) -> np.ndarray:
+    """Return the flat RGB -> palette index table for ``colors``.
+
+    The table has ``2 ** (3 * bits)`` entries indexed by
+    ``(r >> s) << 2*bits | (g >> s) << bits | (b >> s)`` with ``s = 8 - bits``.
+    It is built once per palette and memoized.
+    """
+    return _build_lut(_palette_key(colors), bits)
+
+
+def map_to_palette_indices(
+    rgb: np.ndarray,
+    colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+    bits: int = LUT_BITS,
+) -> np.ndarray:
+    """Map an ``(H, W, 3)`` uint8 array to nearest palette indices via the LUT."""
+    lut = build_palette_lut(colors, bits)
+    reduced = rgb >> (8 - bits)
+    # Build the flat table index in place to avoid extra full-frame temporaries
+    flat = reduced[..., 0].astype(np.intp)
+    flat <<= bits
+    flat |= reduced[..., 1]
+    flat <<= bits
+    flat |= reduced[..., 2]
+    return np.take(lut, flat)
+
+
+def nearest_palette_index(
+    color: Tuple[int, int, int], colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE
+) -> int:
+    r, g, b = color
+    distances = [(r - pr) ** 2 + (g - pg) ** 2 + (b - pb) ** 2 for pr, pg, pb in colors]
+    return distances.index(min(distances))
+
+
+def indices_to_image(
+    indices: np.ndarray, colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE
+) -> Image.Image:
+    height, width = indices.shape
+    image = Image.frombytes("P", (width, height), np.ascontiguousarray(indices, dtype=np.uint8).tobytes())
+    image.putpalette(_flatten_palette(colors))
+    return image
+
+
+def quantize_to_indices(
+    image: Image.Image,
+    dither: Union[bool, str] = True,
+    colors: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> Image.Image:
+    """Quantize to a "P" image whose pixel values are panel palette indices.
+
+    ``dither`` is a mode name from ``dither.DITHER_MODES`` or a legacy boolean
+    (True selects Floyd-Steinberg).
+    """
+    from .dither import dither_to_indices, normalize_dither
+    from .metrics import timed
+
+    mode = normalize_dither(dither)
+    with timed("quantize"):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if mode == "floyd-steinberg":
+            # Error diffusion stays in Pillow's C implementation; only the palette is reused
+            palette_img = _compact_palette_image(_palette_key(colors))
+            return image.quantize(palette=palette_img, dither=Image.FLOYDSTEINBERG)
+        indices = dither_to_indices(np.asarray(image), mode, colors)
+        return indices_to_image(indices, colors)
 
 
+def quantize_to_five65f(image: Image.Image, dither: Union[bool, str] = True) -> Image.Image:
+    return quantize_to_indices(image, dither=dither).convert("RGB")
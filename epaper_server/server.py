@@ -1,13 +1,35 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
 
-from flask import Flask, jsonify, render_template_string, request
+from flask import Flask, Response, jsonify, render_template_string, request
+from PIL import Image, UnidentifiedImageError
 
+from .daemon import DisplayDaemon
+from .dither import DITHER_MODES, normalize_dither
 from .display import WaveshareDisplay
-from .image_utils import open_image_from_bytes, prepare_5in65_image
-from .text_utils import render_text_to_image
+from .drivers import content_rotation
+from .frame_cache import FrameCache
+from .frame_file import check_compatible, parse_frame
+from .framebuffer import PanelBuffer
+from .image_utils import image_cache_key, prepare_5in65_buffer_from_bytes
+from .metrics import REGISTRY, collect_stages, server_timing, timed
+from .palette import indices_to_image
+from .text_utils import (
+    DEFAULT_MAX_FONT_SIZE,
+    DEFAULT_MIN_FONT_SIZE,
+    FONT_CACHE,
+    FONT_REGISTRY,
+    load_font_registry_from_env,
+    preload_fonts,
+    render_text_to_buffer_cached,
+    resolve_font,
+    text_cache_key,
+)
+from .worker import DisplayWorker, Job, JobFunc, QueueFull, start_workers
 
 
 INDEX_HTML = """
@@ -29,6 +51,13 @@ INDEX_HTML = """
   </head>
   <body>
     <h1>ePaper Uploader</h1>
+    {% if displays|length > 1 %}
+    <label>Display
+      <select id="display">
+        {% for d in displays %}<option value="{{ d }}">{{ d }}</option>{% endfor %}
+      </select>
+    </label>
+    {% endif %}
     <form id="imgForm" enctype="multipart/form-data">
       <h2>Image</h2>
       <label>File<input type="file" name="file" accept="image/*" required /></label>
@@ -48,13 +77,18 @@ INDEX_HTML = """
       </div>
       <div class="row">
         <div>
-          <label><input type="checkbox" name="dither" checked /> Dither</label>
+          <label>Dither
+            <select name="dither">
+              {% for m in dither_modes %}<option value="{{ m }}"{% if m == "floyd-steinberg" %} selected{% endif %}>{{ m }}</option>{% endfor %}
+            </select>
+          </label>
         </div>
         <div>
           <label><input type="checkbox" name="mirror" /> Mirror</label>
         </div>
       </div>
       <button type="submit">Display Image</button>
+      <button type="button" data-preview="preview/image">Preview</button>
     </form>
 
     <form id="textForm">
@@ -62,7 +96,7 @@ INDEX_HTML = """
       <label>Text<textarea name="text" rows="5" required></textarea></label>
       <div class="row">
         <div>
-          <label>Font Size<input type="number" name="font_size" value="28" /></label>
+          <label>Font Size (number or "auto")<input type="text" name="font_size" value="28" /></label>
         </div>
         <div>
           <label>Align
@@ -86,43 +120,67 @@ INDEX_HTML = """
         </div>
         <div>
           <label><input type="checkbox" name="wrap" checked /> Wrap</label>
+          <label><input type="checkbox" name="antialias" /> Antialias</label>
         </div>
       </div>
       <button type="submit">Display Text</button>
+      <button type="button" data-preview="preview/text">Preview</button>
     </form>
 
+    <img id="preview" alt="" style="max-width: 100%; border: 1px solid #ddd;" hidden />
+
     <form id="clearForm">
       <h2>Clear</h2>
       <button type="submit">Clear Display</button>
     </form>
 
     <script>
-      async function postForm(url, form) {
+      const legacyUrls = {
+        image: '/api/display/image', text: '/api/display/text', clear: '/api/clear',
+        'preview/image': '/api/preview/image', 'preview/text': '/api/preview/text',
+      };
+      function apiUrl(action) {
+        const sel = document.getElementById('display');
+        return sel ? `/api/displays/${encodeURIComponent(sel.value)}/${action}` : legacyUrls[action];
+      }
+      function formRequest(form) {
         const opts = { method: 'POST' };
         if (form.enctype === 'multipart/form-data') {
           opts.body = new FormData(form);
         } else {
           const data = Object.fromEntries(new FormData(form).entries());
-          data.dither = !!data.dither; data.mirror = !!data.mirror; data.wrap = !!data.wrap;
+          data.dither = !!data.dither; data.mirror = !!data.mirror; data.wrap = !!data.wrap; data.antialias = !!data.antialias;
           opts.headers = { 'Content-Type': 'application/json' };
           opts.body = JSON.stringify(data);
         }
-        const res = await fetch(url, opts);
+        return opts;
+      }
+      async function postForm(url, form) {
+        const res = await fetch(url + '?wait=1', formRequest(form));
         return await res.json();
       }
+      document.querySelectorAll('[data-preview]').forEach((btn) => {
+        btn.addEventListener('click', async () => {
+          const res = await fetch(apiUrl(btn.dataset.preview), formRequest(btn.form));
+          if (!res.ok) { alert(JSON.stringify(await res.json())); return; }
+          const img = document.getElementById('preview');
+          img.src = URL.createObjectURL(await res.blob());
+          img.hidden = false;
+        });
+      });
       document.getElementById('imgForm').addEventListener('submit', async (e) => {
         e.preventDefault();
-        const r = await postForm('/api/display/image', e.target);
+        const r = await postForm(apiUrl('image'), e.target);
         alert(JSON.stringify(r));
       });
       document.getElementById('textForm').addEventListener('submit', async (e) => {
         e.preventDefault();
-        const r = await postForm('/api/display/text', e.target);
+        const r = await postForm(apiUrl('text'), e.target);
         alert(JSON.stringify(r));
       });
       document.getElementById('clearForm').addEventListener('submit', async (e) => {
         e.preventDefault();
-        const r = await fetch('/api/clear', { method: 'POST' }).then(r => r.json());
+        const r = await fetch(apiUrl('clear') + '?wait=1', { method: 'POST' }).then(r => r.json());
         alert(JSON.stringify(r));
       });
     </script>
@@ -131,130 +189,413 @@ INDEX_HTML = """
 """
 
 
-def _make_display() -> WaveshareDisplay:
-    display_model = os.environ.get("WAVESHARE_DISPLAY_MODEL", "5in65f")
-    orientation = os.environ.get("EPAPER_ORIENTATION", "landscape")
-    disp = WaveshareDisplay(model=display_model, orientation=orientation)
-    disp.initialize()
-    return disp
+PREVIEW_FORMATS = {"png": "image/png", "webp": "image/webp"}
+
+
+def encode_preview(buf: PanelBuffer, fmt: str = "png") -> bytes:
+    """Encode a prepared frame as a palette PNG or lossless WebP."""
+    image = indices_to_image(buf.to_indices(), buf.palette)
+    out = BytesIO()
+    if fmt == "webp":
+        image.convert("RGB").save(out, format="WEBP", lossless=True, method=0)
+    else:
+        image.save(out, format="PNG", compress_level=1)
+    return out.getvalue()
 
 
 def create_app() -> Flask:
     app = Flask(__name__)
-    display = _make_display()
-    app.logger.info(
-        "Display initialized: model=%s size=%sx%s orientation=%s driver=%s",
-        display.model,
-        display.width,
-        display.height,
-        display.orientation,
-        "simulation" if display.epd is None else "hardware",
-    )
+    workers = start_workers()
+    # The legacy single-display routes drive the first configured panel
+    default_name = next(iter(workers))
+    # Shared across panels; keys include the target size
+    frame_cache = FrameCache.from_env()
+    load_font_registry_from_env()
+    preload_fonts()
+    socket_path = os.environ.get("EPAPER_SOCKET")
+    if socket_path:
+        # Local epaperctl commands run on these same workers instead of opening the panel themselves
+        DisplayDaemon(workers, frame_cache, Path(socket_path)).start()
 
-    @app.get("/")
-    def index() -> str:
-        return render_template_string(INDEX_HTML)
+    def _worker_for(name: Optional[str]) -> Optional[DisplayWorker]:
+        return workers.get(default_name if name is None else name)
 
-    @app.get("/api/status")
-    def status() -> Dict[str, Any]:
-        payload = {
+    def _unknown_display(name: Optional[str]):
+        return jsonify({"ok": False, "error": f"unknown display: {name}"}), 404
+
+    def _display_status(worker: DisplayWorker) -> Dict[str, Any]:
+        display = worker.display
+        return {
+            "name": display.name,
             "model": display.model,
             "width": display.width,
             "height": display.height,
             "orientation": display.orientation,
-            "driver": "simulation" if display.epd is None else "hardware",
+            "driver": (
+                "initializing"
+                if display.power_state == "initializing"
+                else "simulation" if display.epd is None else "hardware"
+            ),
+            "cache": frame_cache.stats(),
+            "frames": {
+                "refreshes": display.refreshes,
+                "skipped": display.skipped,
+                "last_digest": display.last_digest,
+                "skip_threshold": display.skip_threshold,
+            },
+            "worker": worker.stats(),
+            "power": display.power_status(),
+            "history": display.simulator.stats(),
         }
+
+    @app.get("/")
+    def index() -> str:
+        return render_template_string(INDEX_HTML, dither_modes=DITHER_MODES, displays=list(workers))
+
+    @app.get("/api/status", defaults={"name": None})
+    @app.get("/api/displays/<name>/status")
+    def status(name: Optional[str]) -> Dict[str, Any]:
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        payload = _display_status(worker)
+        payload["displays"] = list(workers)
         app.logger.debug("/api/status -> %s", payload)
         return jsonify(payload)
 
-    @app.post("/api/clear")
-    def clear() -> Dict[str, Any]:
-        app.logger.info("/api/clear")
-        display.clear()
-        return jsonify({"ok": True})
+    @app.get("/api/displays")
+    def displays() -> Dict[str, Any]:
+        payload = {
+            "default": default_name,
+            "displays": {
+                name: {
+                    "model": w.display.model,
+                    "width": w.display.width,
+                    "height": w.display.height,
+                    "orientation": w.display.orientation,
+                    "power": w.display.power_state,
+                    "worker": w.stats(),
+                }
+                for name, w in workers.items()
+            },
+        }
+        return jsonify(payload)
+
+    @app.get("/api/frames", defaults={"name": None})
+    @app.get("/api/displays/<name>/frames")
+    def frames(name: Optional[str]) -> Dict[str, Any]:
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        include_failed = _truthy(request.args.get("failed", "0"))
+        return jsonify({"ok": True, "frames": worker.display.simulator.history(include_failed=include_failed)})
+
+    @app.get("/api/frames/<int:back>.png", defaults={"name": None})
+    @app.get("/api/displays/<name>/frames/<int:back>.png")
+    def frame_png(back: int, name: Optional[str]):
+        """Frame ``back`` steps before the latest (0 = current) as PNG."""
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        include_failed = _truthy(request.args.get("failed", "0"))
+        frame = worker.display.simulator.get(back, include_failed=include_failed)
+        if frame is None:
+            return jsonify({"ok": False, "error": f"no frame {back}"}), 404
+        resp = Response(frame.png(), mimetype="image/png")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Frame-Seq"] = str(frame.seq)
+        return resp
+
+    @app.get("/api/fonts")
+    def fonts() -> Dict[str, Any]:
+        payload = {
+            "registered": {name: {"path": path, "index": index} for name, (path, index) in FONT_REGISTRY.items()},
+            "resident": FONT_CACHE.resident(),
+            "cache": FONT_CACHE.stats(),
+        }
+        return jsonify(payload)
+
+    def _truthy(value: Any) -> bool:
+        return str(value).lower() in {"1", "true", "on", "yes"}
+
+    def _submit(worker: DisplayWorker, kind: str, func: JobFunc):
+        """Queue a job; block for the result only when the client asks with ?wait=1."""
+        try:
+            job = worker.submit(kind, func)
+        except QueueFull as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 503
+        if _truthy(request.args.get("wait", "0")):
+            job.wait()
+            ok = job.status == "done"
+            payload = {"ok": ok, **job.result, "job": job.to_dict()}
+            if job.error is not None:
+                payload["error"] = job.error
+            resp = jsonify(payload)
+            resp.status_code = 200 if ok or job.status == "superseded" else 500
+            if job.timings:
+                resp.headers["Server-Timing"] = server_timing(job.timings)
+            return resp
+        return jsonify({"ok": True, "job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"}), 202
+
+    @app.get("/metrics")
+    def metrics() -> Response:
+        return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
 
-    @app.post("/api/display/image")
-    def api_display_image() -> Dict[str, Any]:
-        app.logger.info("/api/display/image")
+    @app.get("/api/jobs/<job_id>")
+    def job_status(job_id: str) -> Dict[str, Any]:
+        for name, worker in workers.items():
+            job = worker.get(job_id)
+            if job is not None:
+                return jsonify({"ok": True, "display": name, **job.to_dict()})
+        return jsonify({"ok": False, "error": "unknown job"}), 404
+
+    @app.post("/api/clear", defaults={"name": None})
+    @app.post("/api/displays/<name>/clear")
+    def clear(name: Optional[str]) -> Dict[str, Any]:
+        app.logger.info("/api/clear display=%s", name or default_name)
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+
+        def run(job: Job, disp: WaveshareDisplay) -> Dict[str, Any]:
+            with job.stage("display"):
+                disp.clear()
+            return {}
+
+        return _submit(worker, "clear", run)
+
+    def _image_params() -> Dict[str, Any]:
+        """Parse the image form shared by display and preview; raises ValueError."""
         file = request.files.get("file")
         if not file:
-            return jsonify({"ok": False, "error": "missing file"}), 400
-        mode = request.form.get("mode", "fit")
-        dither = request.form.get("dither") == "on" or request.form.get("dither") == "true"
-        rotate = int(request.form.get("rotate", "0"))
-        mirror = request.form.get("mirror") == "on" or request.form.get("mirror") == "true"
-        # Apply device orientation automatically (portrait rotates content)
-        orient_rotate = 90 if display.orientation == "portrait" else 0
-        total_rotate = (rotate + orient_rotate) % 360
-
-        raw = file.read()
-        img = open_image_from_bytes(raw)
-        prepped = prepare_5in65_image(
-            img,
-            display.width,
-            display.height,
-            mode=mode,  # type: ignore[arg-type]
-            dither=dither,
-            rotate=total_rotate,
-            mirror=mirror,
-        )
-        app.logger.debug(
-            "display_image params: mode=%s dither=%s rotate=%s mirror=%s orient_rotate=%s -> out=%s",
-            mode,
-            dither,
-            rotate,
-            mirror,
-            orient_rotate,
-            prepped.size,
-        )
-        display.show_image(prepped)
-        return jsonify({"ok": True, "width": display.width, "height": display.height})
-
-    @app.post("/api/display/text")
-    def api_display_text() -> Dict[str, Any]:
-        app.logger.info("/api/display/text")
+            raise ValueError("missing file")
+        return {
+            "raw": file.read(),
+            "mode": request.form.get("mode", "fit"),
+            # An absent field is an unchecked box in older clients: no dithering
+            "dither": normalize_dither(request.form.get("dither", "none")),
+            "rotate": int(request.form.get("rotate", "0")),
+            "mirror": request.form.get("mirror") == "on" or request.form.get("mirror") == "true",
+            "force": request.form.get("force") in {"1", "on", "true"},
+        }
+
+    def _text_params() -> Dict[str, Any]:
+        """Parse the text JSON/form shared by display and preview; raises ValueError."""
         data = request.get_json(silent=True) or request.form
         text = data.get("text", "").strip()
         if not text:
-            return jsonify({"ok": False, "error": "missing text"}), 400
-        font_size = int(data.get("font_size", 28))
-        align = data.get("align", "left")
-        valign = data.get("valign", "top")
-        wrap = str(data.get("wrap", True)).lower() in {"1", "true", "on", "yes"}
-        font_path = data.get("font_path")
-
-        text_img = render_text_to_image(
-            text,
-            display.width,
-            display.height,
-            font_path=font_path,
-            font_size=font_size,
-            align=align,  # type: ignore[arg-type]
-            valign=valign,  # type: ignore[arg-type]
-            wrap=wrap,
-        )
-        # final quantization to panel palette is handled in image prep path
-        from .image_utils import prepare_5in65_image
-
-        orient_rotate = 90 if display.orientation == "portrait" else 0
-        prepped = prepare_5in65_image(
-            text_img,
-            display.width,
-            display.height,
-            rotate=orient_rotate,
-        )
-        app.logger.debug(
-            "display_text params: len=%d font_size=%d align=%s valign=%s wrap=%s orient_rotate=%s -> out=%s",
-            len(text),
-            font_size,
-            align,
-            valign,
-            wrap,
-            orient_rotate,
-            prepped.size,
-        )
-        display.show_image(prepped)
-        return jsonify({"ok": True, "width": display.width, "height": display.height})
+            raise ValueError("missing text")
+        # Prefer a registered font name; raw paths are still accepted
+        font = data.get("font") or data.get("font_path")
+        resolve_font(font)
+        raw_size = str(data.get("font_size", 28)).strip().lower()
+        return {
+            "text": text,
+            "font_size": "auto" if raw_size == "auto" else int(raw_size),
+            "min_font_size": int(data.get("min_font_size", DEFAULT_MIN_FONT_SIZE)),
+            "max_font_size": int(data.get("max_font_size", DEFAULT_MAX_FONT_SIZE)),
+            "align": data.get("align", "left"),
+            "valign": data.get("valign", "top"),
+            "wrap": _truthy(data.get("wrap", True)),
+            "font_path": font,
+            "antialias": _truthy(data.get("antialias", False)),
+            "force": _truthy(data.get("force", False)),
+        }
+
+    def _image_args(disp: WaveshareDisplay, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Apply device orientation automatically (portrait rotates content)
+        return {
+            "mode": params["mode"],
+            "dither": params["dither"],
+            "rotate": content_rotation(disp.orientation, params["rotate"]),
+            "mirror": params["mirror"],
+        }
+
+    def _text_args(disp: WaveshareDisplay, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Draw straight into panel palette indices in the device orientation;
+        # no fit, resample or dither pass is needed for text
+        args = {k: v for k, v in params.items() if k not in {"text", "force"}}
+        args["rotate"] = content_rotation(disp.orientation)
+        return args
+
+    @app.post("/api/display/image", defaults={"name": None})
+    @app.post("/api/displays/<name>/image")
+    def api_display_image(name: Optional[str]) -> Dict[str, Any]:
+        app.logger.info("/api/display/image display=%s", name or default_name)
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        try:
+            params = _image_params()
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+
+        def run(job: Job, disp: WaveshareDisplay) -> Dict[str, Any]:
+            args = _image_args(disp, params)
+            with job.stage("prepare"):
+                prepped, cache_hit = prepare_5in65_buffer_from_bytes(
+                    params["raw"], disp.width, disp.height, cache=frame_cache, palette=disp.spec.palette, **args
+                )
+            app.logger.debug("display_image params: %s cache_hit=%s -> out=%s", args, cache_hit, prepped.size)
+            with job.stage("display"):
+                refreshed = disp.show_image(prepped, force=params["force"])
+            return {
+                "width": disp.width,
+                "height": disp.height,
+                "cached": cache_hit,
+                "refreshed": refreshed,
+                "skip_reason": disp.last_skip_reason,
+            }
+
+        return _submit(worker, "image", run)
+
+    @app.post("/api/display/text", defaults={"name": None})
+    @app.post("/api/displays/<name>/text")
+    def api_display_text(name: Optional[str]) -> Dict[str, Any]:
+        app.logger.info("/api/display/text display=%s", name or default_name)
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        try:
+            params = _text_params()
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+
+        def run(job: Job, disp: WaveshareDisplay) -> Dict[str, Any]:
+            args = _text_args(disp, params)
+            with job.stage("prepare"):
+                prepped, used_size, cache_hit = render_text_to_buffer_cached(
+                    params["text"], disp.width, disp.height, cache=frame_cache, palette=disp.spec.palette, **args
+                )
+            app.logger.debug(
+                "display_text params: len=%d %s -> size=%d cache_hit=%s out=%s",
+                len(params["text"]),
+                args,
+                used_size,
+                cache_hit,
+                prepped.size,
+            )
+            with job.stage("display"):
+                refreshed = disp.show_image(prepped, force=params["force"])
+            return {
+                "width": disp.width,
+                "height": disp.height,
+                "font_size": used_size,
+                "cached": cache_hit,
+                "refreshed": refreshed,
+                "skip_reason": disp.last_skip_reason,
+            }
+
+        return _submit(worker, "text", run)
+
+    @app.post("/api/display/frame", defaults={"name": None})
+    @app.post("/api/displays/<name>/frame")
+    def api_display_frame(name: Optional[str]) -> Dict[str, Any]:
+        """Show a precompiled .epf frame (multipart ``file`` or a raw request body) as-is."""
+        app.logger.info("/api/display/frame display=%s", name or default_name)
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        file = request.files.get("file")
+        blob = file.read() if file else request.get_data(cache=False)
+        try:
+            frame = parse_frame(blob)
+            check_compatible(frame, worker.display.spec)
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+        force = _truthy(request.values.get("force", False))
+
+        def run(job: Job, disp: WaveshareDisplay) -> Dict[str, Any]:
+            with job.stage("display"):
+                refreshed = disp.show_image(frame.buffer, force=force)
+            return {
+                "width": frame.buffer.width,
+                "height": frame.buffer.height,
+                "model": frame.model,
+                "source_sha256": frame.meta.get("source_sha256"),
+                "refreshed": refreshed,
+                "skip_reason": disp.last_skip_reason,
+            }
+
+        return _submit(worker, "frame", run)
+
+    def _preview_response(key: str, render: Callable[[], Tuple[PanelBuffer, Dict[str, str]]]):
+        """Encode a prepared frame, or answer 304 when the client has this ETag.
+
+        The ETag is the frame-cache key (input hash + every parameter), so it
+        is known before any decoding or quantizing happens.
+        """
+        fmt = (request.args.get("format") or request.form.get("format") or "png").lower()
+        if fmt not in PREVIEW_FORMATS:
+            return jsonify({"ok": False, "error": f"unsupported preview format: {fmt}"}), 400
+        etag = f"{key[:40]}-{fmt}"
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            with collect_stages() as stages:
+                try:
+                    buf, headers = render()
+                except ValueError as exc:
+                    return jsonify({"ok": False, "error": str(exc)}), 400
+                with timed("encode"):
+                    body = encode_preview(buf, fmt)
+            resp = Response(body, mimetype=PREVIEW_FORMATS[fmt])
+            resp.headers.update(headers)
+            resp.headers["Server-Timing"] = server_timing(stages)
+        resp.set_etag(etag)
+        # Revalidate every time; the ETag makes that a cheap 304
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    @app.post("/api/preview/image", defaults={"name": None})
+    @app.post("/api/displays/<name>/preview/image")
+    def api_preview_image(name: Optional[str]):
+        """Prepare an image exactly as for display and return it; the panel is not touched."""
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        try:
+            params = _image_params()
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+        disp = worker.display
+        args = _image_args(disp, params)
+
+        def render() -> Tuple[PanelBuffer, Dict[str, str]]:
+            try:
+                buf, hit = prepare_5in65_buffer_from_bytes(
+                    params["raw"], disp.width, disp.height, cache=frame_cache, palette=disp.spec.palette, **args
+                )
+            except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as exc:
+                # A bad upload is a client error, like the other parameters
+                raise ValueError(f"cannot decode image: {exc}") from exc
+            return buf, {"X-Frame-Cache": "hit" if hit else "miss"}
+
+        key = image_cache_key(params["raw"], disp.width, disp.height, palette=disp.spec.palette, **args)
+        return _preview_response(key, render)
+
+    @app.post("/api/preview/text", defaults={"name": None})
+    @app.post("/api/displays/<name>/preview/text")
+    def api_preview_text(name: Optional[str]):
+        """Render text exactly as for display and return it; the panel is not touched."""
+        worker = _worker_for(name)
+        if worker is None:
+            return _unknown_display(name)
+        try:
+            params = _text_params()
+        except ValueError as exc:
+            return jsonify({"ok": False, "error": str(exc)}), 400
+        disp = worker.display
+        args = _text_args(disp, params)
+
+        def render() -> Tuple[PanelBuffer, Dict[str, str]]:
+            buf, used_size, hit = render_text_to_buffer_cached(
+                params["text"], disp.width, disp.height, cache=frame_cache, palette=disp.spec.palette, **args
+            )
+            return buf, {"X-Frame-Cache": "hit" if hit else "miss", "X-Font-Size": str(used_size)}
+
+        key = text_cache_key(params["text"], disp.width, disp.height, palette=disp.spec.palette, **args)
+        return _preview_response(key, render)
 
     return app
 
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from .framebuffer import PanelBuffer
+from .palette import indices_to_image
+
+logger = logging.getLogger(__name__)
+
+
+# zlib level for preview PNGs; palette frames compress well even at level 1
+PNG_COMPRESS_LEVEL = 1
+
+
+class Frame:
+    """One frame as sent to the panel; PNG is encoded on first request and kept.
+
+    ``shown`` is False for a frame whose push failed: it is kept for
+    inspection but never reported as the panel's content.
+    """
+
+    __slots__ = ("seq", "at", "kind", "source", "shown", "_png", "_lock")
+
+    def __init__(self, seq: int, kind: str, source: Union[PanelBuffer, Image.Image], shown: bool = True) -> None:
+        self.seq = seq
+        self.at = time.time()
+        self.kind = kind
+        self.source = source
+        self.shown = shown
+        self._png: Optional[bytes] = None
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.source.size
+
+    def png(self) -> bytes:
+        with self._lock:
+            if self._png is None:
+                if isinstance(self.source, PanelBuffer):
+                    # Palette image straight from the indices; no RGB expansion needed
+                    image = indices_to_image(self.source.to_indices(), self.source.palette)
+                else:
+                    image = self.source
+                out = BytesIO()
+                image.save(out, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+                self._png = out.getvalue()
+            return self._png
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "seq": self.seq,
+            "at": self.at,
+            "kind": self.kind,
+            "size": list(self.size),
+            "shown": self.shown,
+            "encoded": self._png is not None,
+        }
+
+
+class SimulatedPanel:
+    """Bounded history of displayed frames with optional refresh timing.
+
+    Frames are kept as the packed buffers the panel would receive; nothing is
+    encoded or written unless asked for. ``refresh_seconds`` > 0 makes
+    ``refresh`` hold BUSY for that long, like the real controller.
+    """
+
+    def __init__(
+        self,
+        *,
+        history: int = 16,
+        refresh_seconds: float = 0.0,
+        output_path: Optional[Path] = None,
+    ) -> None:
+        self.frames: Deque[Frame] = deque(maxlen=max(1, history))
+        self.refresh_seconds = refresh_seconds
+        self.output_path = output_path
+        self.busy = False
+        self.busy_until: Optional[float] = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, *, model_refresh: float, output_name: str) -> "SimulatedPanel":
+        # EPAPER_SIM_TIMING: 0/unset = instant, 1 = the model's refresh time, else seconds
+        timing = os.environ.get("EPAPER_SIM_TIMING", "0").strip().lower()
+        if timing in {"", "0", "off", "false", "no"}:
+            refresh = 0.0
+        elif timing in {"1", "on", "true", "yes", "model"}:
+            refresh = model_refresh
+        else:
+            refresh = float(timing)
+        out_dir = os.environ.get("EPAPER_SIM_OUTPUT_DIR")
+        return cls(
+            history=int(os.environ.get("EPAPER_SIM_HISTORY", "16")),
+            refresh_seconds=refresh,
+            output_path=Path(out_dir).expanduser() / output_name if out_dir else None,
+        )
+
+    def record(self, kind: str, source: Union[PanelBuffer, Image.Image], *, shown: bool = True) -> Frame:
+        with self._lock:
+            self._seq += 1
+            frame = Frame(self._seq, kind, source, shown)
+            self.frames.append(frame)
+        if shown and self.output_path is not None:
+            self.save(self.output_path)
+        return frame
+
+    def _listed(self, include_failed: bool) -> List[Frame]:
+        # Newest first; caller holds _lock
+        return [f for f in reversed(self.frames) if include_failed or f.shown]
+
+    def refresh(self, kind: str, source: Union[PanelBuffer, Image.Image]) -> Frame:
+        """Record a frame and hold BUSY for the emulated refresh time."""
+        frame = self.record(kind, source)
+        if self.refresh_seconds > 0:
+            self.busy = True
+            self.busy_until = time.time() + self.refresh_seconds
+            try:
+                time.sleep(self.refresh_seconds)
+            finally:
+                self.busy = False
+                self.busy_until = None
+        return frame
+
+    def get(self, back: int = 0, *, include_failed: bool = False) -> Optional[Frame]:
+        """Frame ``back`` steps before the latest (0 = what the panel shows now).
+
+        Failed pushes are skipped unless ``include_failed``, which indexes
+        the same list as ``history(include_failed=True)``.
+        """
+        with self._lock:
+            frames = self._listed(include_failed)
+        if back < 0 or back >= len(frames):
+            return None
+        return frames[back]
+
+    def save(self, path: Path, back: int = 0) -> bool:
+        frame = self.get(back)
+        if frame is None:
+            return False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(frame.png())
+        os.replace(tmp, path)
+        logger.debug("Simulation: wrote frame %d to %s", frame.seq, path)
+        return True
+
+    def history(self, *, include_failed: bool = False) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [f.to_dict() for f in self._listed(include_failed)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "frames": len(self.frames),
+                "max_frames": self.frames.maxlen,
+                "latest_seq": self._seq,
+                "refresh_seconds": self.refresh_seconds,
+                "busy": self.busy,
+            }
@@ -1,70 +1,435 @@
 from __future__ import annotations
 
-from typing import Literal, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Literal, NamedTuple, Optional, Sequence, Tuple, Union
 import logging
+import os
+import threading
+import weakref
 
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 
+from .dither import bayer_matrix, tile_threshold
+from .frame_cache import FrameCache, make_cache_key
+from .framebuffer import PanelBuffer
+from .image_utils import ensure_orientation
+from .metrics import timed
+from .palette import FIVE65F_PALETTE, indices_to_image, nearest_palette_index
+
 logger = logging.getLogger(__name__)
 
 
 HorizontalAlign = Literal["left", "center", "right"]
 VerticalAlign = Literal["top", "middle", "bottom"]
 
+Font = Union[ImageFont.FreeTypeFont, ImageFont.ImageFont]
 
-def _load_font(font_path: str | None, font_size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
-    if font_path:
-        try:
-            font = ImageFont.truetype(font_path, font_size)
-            logger.debug("Loaded font: %s size=%d", font_path, font_size)
+# (path or None for the built-in font, size, face index within a collection)
+FontKey = Tuple[Optional[str], int, int]
+
+
+class FontCache:
+    """Process-wide LRU of parsed font objects keyed by (path, size, index)."""
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self._fonts: "OrderedDict[FontKey, Font]" = OrderedDict()
+        self._failed: Dict[Tuple[str, int], str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: Optional[str], size: int, index: int = 0) -> Font:
+        key: FontKey = (path, size, index)
+        with self._lock:
+            font = self._fonts.get(key)
+            if font is not None:
+                self._fonts.move_to_end(key)
+                self.hits += 1
+                return font
+            self.misses += 1
+        font, loaded = self._open(path, size, index)
+        if not loaded:
+            # Not cached: a repaired or newly installed font file is picked up next time
             return font
-        except Exception:
-            pass
-    logger.debug("Using default font size=%d", font_size)
-    return ImageFont.load_default()
-
-
-def _measure_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont) -> Tuple[int, int]:
-    bbox = draw.textbbox((0, 0), text, font=font)
-    return bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-
-def _wrap_text(draw: ImageDraw.ImageDraw, text: str, font: ImageFont.ImageFont, max_width: int) -> list[str]:
-    words = text.replace("\r", "").split()
-    lines: list[str] = []
-    current: list[str] = []
-    for word in words:
-        trial = (" ".join(current + [word])).strip()
-        w, _ = _measure_text(draw, trial, font)
-        if current and w > max_width:
-            lines.append(" ".join(current))
+        with self._lock:
+            self._fonts[key] = font
+            self._fonts.move_to_end(key)
+            while len(self._fonts) > self.max_entries:
+                self._fonts.popitem(last=False)
+        return font
+
+    def _open(self, path: Optional[str], size: int, index: int) -> Tuple[Font, bool]:
+        """The font and whether it is the one asked for (False: default font fallback)."""
+        if path:
+            try:
+                font = ImageFont.truetype(path, size, index=index)
+            except Exception as exc:
+                with self._lock:
+                    first = (path, index) not in self._failed
+                    self._failed[(path, index)] = str(exc)
+                # Auto-fit loads many sizes; warn once per file rather than per size
+                logger.log(
+                    logging.WARNING if first else logging.DEBUG,
+                    "Font %s could not be loaded (%s); using default font",
+                    path,
+                    exc,
+                )
+                return ImageFont.load_default(size), False
+            with self._lock:
+                self._failed.pop((path, index), None)
+            logger.debug("Loaded font: %s size=%d index=%d", path, size, index)
+            return font, True
+        logger.debug("Using default font size=%d", size)
+        # Pillow's bundled default font is scalable when FreeType is available
+        return ImageFont.load_default(size), True
+
+    def falls_back(self, path: Optional[str], index: int = 0) -> bool:
+        """True while ``path`` cannot be loaded and the default font stands in."""
+        with self._lock:
+            return (path, index) in self._failed
+
+    def resident(self) -> List[Dict[str, object]]:
+        with self._lock:
+            return [
+                {"path": path, "size": size, "index": index}
+                for path, size, index in self._fonts.keys()
+            ]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._fonts),
+                "max_entries": self.max_entries,
+                "failed": [{"path": p, "index": i, "error": e} for (p, i), e in self._failed.items()],
+            }
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        logger.warning("Ignoring invalid %s=%r; using %d", name, raw, default)
+        return default
+
+
+FONT_CACHE = FontCache(_env_int("EPAPER_FONT_CACHE_SIZE", 32))
+
+# File suffixes that mark an unregistered font name as a path
+FONT_SUFFIXES = (".ttf", ".otf", ".ttc", ".otc", ".pfa", ".pfb", ".woff", ".woff2")
+
+# name -> (path, face index)
+FONT_REGISTRY: Dict[str, Tuple[str, int]] = {}
+
+
+def register_font(name: str, path: str, index: int = 0) -> None:
+    FONT_REGISTRY[name] = (path, index)
+    logger.debug("Registered font %s -> %s#%d", name, path, index)
+
+
+def load_font_registry_from_env() -> None:
+    """Register fonts from ``EPAPER_FONTS`` ("name=path[#index];name=path...")."""
+    spec = os.environ.get("EPAPER_FONTS", "")
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        name, sep, target = entry.partition("=")
+        if not sep or not name or not target:
+            logger.warning("Ignoring malformed EPAPER_FONTS entry: %r", entry)
+            continue
+        path, _, index = target.partition("#")
+        if index and not index.strip().isdigit():
+            logger.warning("Ignoring malformed EPAPER_FONTS entry: %r", entry)
+            continue
+        register_font(name.strip(), path.strip(), int(index) if index else 0)
+
+
+def resolve_font(font: Optional[str]) -> Tuple[Optional[str], int]:
+    """Map a registered font name (or a font file path) to (path, face index).
+
+    Anything with a directory part or a font file suffix is a path. A bare
+    name that is not registered raises ValueError instead of silently
+    rendering in the default font.
+    """
+    if not font:
+        return None, 0
+    if font in FONT_REGISTRY:
+        return FONT_REGISTRY[font]
+    if "/" in font or os.sep in font or font.lower().endswith(FONT_SUFFIXES) or os.path.exists(font):
+        return font, 0
+    known = ", ".join(sorted(FONT_REGISTRY)) or "none"
+    raise ValueError(f"unknown font: {font!r} (registered: {known})")
+
+
+def preload_fonts(spec: Optional[str] = None) -> List[Dict[str, object]]:
+    """Warm the font cache from ``EPAPER_FONT_PRELOAD`` ("name@size,name@size")."""
+    spec = spec if spec is not None else os.environ.get("EPAPER_FONT_PRELOAD", "")
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, size = entry.rpartition("@")
+        if not sep or not size.isdigit():
+            logger.warning("Ignoring malformed EPAPER_FONT_PRELOAD entry: %r", entry)
+            continue
+        try:
+            path, index = resolve_font(name)
+        except ValueError as exc:
+            logger.warning("Ignoring EPAPER_FONT_PRELOAD entry %r: %s", entry, exc)
+            continue
+        FONT_CACHE.get(path, int(size), index)
+    resident = FONT_CACHE.resident()
+    logger.info("Preloaded fonts: %s", resident)
+    return resident
+
+
+def _load_font(font_path: str | None, font_size: int) -> Font:
+    path, index = resolve_font(font_path)
+    return FONT_CACHE.get(path, font_size, index)
+
+
+class LineMetrics(NamedTuple):
+    text: str
+    width: float
+
+
+class TextLayout(NamedTuple):
+    lines: List[LineMetrics]
+    line_height: int
+    # Number of words that had to be split at character boundaries
+    broken_words: int
+
+    @property
+    def width(self) -> float:
+        return max((line.width for line in self.lines), default=0.0)
+
+    def total_height(self, line_spacing: float = 1.0) -> int:
+        return max(1, int(self.line_height * line_spacing)) * len(self.lines)
+
+
+# Per-font memo of advance widths; entries go away with the font object
+_ADVANCES: "weakref.WeakKeyDictionary[Font, Dict[str, float]]" = weakref.WeakKeyDictionary()
+# Distinct strings remembered per font. Fonts stay resident in a long-running
+# server, and clocks or dashboards keep producing new tokens, so a full memo
+# is dropped and refilled rather than allowed to grow
+MAX_ADVANCES_PER_FONT = 4096
+
+
+def _advance(font: Font, text: str) -> float:
+    try:
+        cache = _ADVANCES[font]
+    except KeyError:
+        cache = _ADVANCES.setdefault(font, {})
+    width = cache.get(text)
+    if width is None:
+        width = float(font.getlength(text))
+        if len(cache) >= MAX_ADVANCES_PER_FONT:
+            cache.clear()
+        cache[text] = width
+    return width
+
+
+def _line_height(font: Font) -> int:
+    if isinstance(font, ImageFont.FreeTypeFont):
+        ascent, descent = font.getmetrics()
+        return ascent + descent
+    bbox = font.getbbox("Ag")
+    return int(bbox[3] - bbox[1])
+
+
+def _break_word(font: Font, word: str, max_width: float) -> List[LineMetrics]:
+    pieces: List[LineMetrics] = []
+    start = 0
+    width = 0.0
+    for idx, char in enumerate(word):
+        advance = _advance(font, char)
+        if idx > start and width + advance > max_width:
+            pieces.append(LineMetrics(word[start:idx], width))
+            start, width = idx, 0.0
+        width += advance
+    pieces.append(LineMetrics(word[start:], width))
+    return pieces
+
+
+def layout_text(text: str, font: Font, max_width: int, wrap: bool = True) -> TextLayout:
+    """Break ``text`` into lines no wider than ``max_width``.
+
+    Each distinct word and the space are measured once per font; line widths
+    are accumulated rather than re-measured, so layout is linear in the text.
+    Without ``wrap`` lines are split only at explicit newlines.
+    """
+    line_height = _line_height(font)
+    if not wrap:
+        lines = [LineMetrics(line, _advance(font, line)) for line in text.splitlines()]
+        return TextLayout(lines or [LineMetrics("", 0.0)], line_height, 0)
+
+    space = _advance(font, " ")
+    lines: List[LineMetrics] = []
+    current: List[str] = []
+    current_width = 0.0
+    broken = 0
+    for word in text.replace("\r", "").split():
+        word_width = _advance(font, word)
+        if word_width > max_width:
+            # Overlong word: flush, then split at character boundaries
+            if current:
+                lines.append(LineMetrics(" ".join(current), current_width))
+            pieces = _break_word(font, word, max_width)
+            broken += 1
+            lines.extend(pieces[:-1])
+            current = [pieces[-1].text]
+            current_width = pieces[-1].width
+            continue
+        trial = current_width + space + word_width if current else word_width
+        if current and trial > max_width:
+            lines.append(LineMetrics(" ".join(current), current_width))
             current = [word]
+            current_width = word_width
         else:
             current.append(word)
+            current_width = trial
     if current:
-        lines.append(" ".join(current))
+        lines.append(LineMetrics(" ".join(current), current_width))
     if not lines:
-        lines = [""]
-    logger.debug("wrap_text: max_width=%d -> %d lines", max_width, len(lines))
-    return lines
+        lines = [LineMetrics("", 0.0)]
+    logger.debug("layout_text: max_width=%d -> %d lines (%d broken words)", max_width, len(lines), broken)
+    return TextLayout(lines, line_height, broken)
 
 
-def render_text_to_image(
+FontSize = Union[int, Literal["auto"]]
+
+DEFAULT_MIN_FONT_SIZE = 8
+DEFAULT_MAX_FONT_SIZE = 160
+
+
+def _draw_layout(
+    draw: ImageDraw.ImageDraw,
+    layout: TextLayout,
+    font: Font,
+    width: int,
+    height: int,
+    align: HorizontalAlign,
+    valign: VerticalAlign,
+    line_spacing: float,
+    fill: Union[int, Tuple[int, int, int]],
+) -> None:
+    effective_line_height = max(1, int(layout.line_height * line_spacing))
+    total_height = layout.total_height(line_spacing)
+
+    if valign == "top":
+        y = 0
+    elif valign == "middle":
+        y = (height - total_height) // 2
+    else:
+        y = max(0, height - total_height)
+
+    for line in layout.lines:
+        w = int(round(line.width))
+        if align == "left":
+            x = 0
+        elif align == "center":
+            x = (width - w) // 2
+        else:
+            x = max(0, width - w)
+        draw.text((x, y), line.text, font=font, fill=fill)
+        y += effective_line_height
+
+
+class RenderedText(NamedTuple):
+    image: Image.Image
+    font_size: int
+    layout: TextLayout
+
+
+def _fits(layout: TextLayout, width: int, height: int, line_spacing: float) -> bool:
+    return (
+        layout.broken_words == 0
+        and layout.width <= width
+        and layout.total_height(line_spacing) <= height
+    )
+
+
+def fit_font_size(
+    text: str,
+    width: int,
+    height: int,
+    *,
+    font_path: str | None = None,
+    wrap: bool = True,
+    line_spacing: float = 1.0,
+    min_size: int = DEFAULT_MIN_FONT_SIZE,
+    max_size: int = DEFAULT_MAX_FONT_SIZE,
+) -> Tuple[int, TextLayout]:
+    """Binary-search the largest font size whose layout fits ``width`` x ``height``.
+
+    Falls back to ``min_size`` when nothing fits. Fonts and their word
+    advances are cached per size, so each probe is a single layout pass.
+    """
+    min_size = max(1, int(min_size))
+    max_size = max(min_size, int(max_size))
+    lo, hi = min_size, max_size
+    best: Optional[Tuple[int, TextLayout]] = None
+    probes = 0
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        layout = layout_text(text, _load_font(font_path, mid), width, wrap=wrap)
+        probes += 1
+        if _fits(layout, width, height, line_spacing):
+            best = (mid, layout)
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    if best is None:
+        best = (min_size, layout_text(text, _load_font(font_path, min_size), width, wrap=wrap))
+    logger.debug("fit_font_size: range=%d..%d -> %d after %d probes", min_size, max_size, best[0], probes)
+    return best
+
+
+def _size_and_layout(
+    text: str,
+    width: int,
+    height: int,
+    font_path: str | None,
+    font_size: FontSize,
+    min_font_size: int,
+    max_font_size: int,
+    wrap: bool,
+    line_spacing: float,
+) -> Tuple[int, TextLayout]:
+    if font_size == "auto":
+        return fit_font_size(
+            text,
+            width,
+            height,
+            font_path=font_path,
+            wrap=wrap,
+            line_spacing=line_spacing,
+            min_size=min_font_size,
+            max_size=max_font_size,
+        )
+    size = int(font_size)
+    return size, layout_text(text, _load_font(font_path, size), width, wrap=wrap)
+
+
+def render_text(
     text: str,
     width: int,
     height: int,
     *,
     font_path: str | None = None,
-    font_size: int = 28,
+    font_size: FontSize = 28,
+    min_font_size: int = DEFAULT_MIN_FONT_SIZE,
+    max_font_size: int = DEFAULT_MAX_FONT_SIZE,
     align: HorizontalAlign = "left",
     valign: VerticalAlign = "top",
     wrap: bool = True,
     line_spacing: float = 1.0,
     text_color: Tuple[int, int, int] = (0, 0, 0),
     background: Tuple[int, int, int] = (255, 255, 255),
-) -> Image.Image:
+) -> RenderedText:
     logger.debug(
-        "render_text_to_image: size=%sx%s font_size=%d align=%s valign=%s wrap=%s",
+        "render_text: size=%sx%s font_size=%s align=%s valign=%s wrap=%s",
         width,
         height,
         font_size,
@@ -72,46 +437,159 @@ def render_text_to_image(
         valign,
         wrap,
     )
+    size, layout = _size_and_layout(
+        text, width, height, font_path, font_size, min_font_size, max_font_size, wrap, line_spacing
+    )
+    font = _load_font(font_path, size)
     image = Image.new("RGB", (width, height), background)
-    draw = ImageDraw.Draw(image)
-    font = _load_font(font_path, font_size)
+    _draw_layout(ImageDraw.Draw(image), layout, font, width, height, align, valign, line_spacing, text_color)
 
-    if wrap:
-        lines = _wrap_text(draw, text, font, width)
-    else:
-        lines = text.splitlines() or [""]
+    logger.debug("render_text: rendered %d lines at size %d", len(layout.lines), size)
+    return RenderedText(image, size, layout)
 
-    # Measure total height
-    line_heights: list[int] = []
-    for line in lines:
-        _, h = _measure_text(draw, line, font)
-        line_heights.append(h)
-    if not line_heights:
-        line_heights = [font_size]
 
-    base_line_height = max(line_heights)
-    effective_line_height = max(1, int(base_line_height * line_spacing))
-    total_height = effective_line_height * len(lines)
+def render_text_to_image(
+    text: str,
+    width: int,
+    height: int,
+    *,
+    font_path: str | None = None,
+    font_size: FontSize = 28,
+    align: HorizontalAlign = "left",
+    valign: VerticalAlign = "top",
+    wrap: bool = True,
+    line_spacing: float = 1.0,
+    text_color: Tuple[int, int, int] = (0, 0, 0),
+    background: Tuple[int, int, int] = (255, 255, 255),
+    min_font_size: int = DEFAULT_MIN_FONT_SIZE,
+    max_font_size: int = DEFAULT_MAX_FONT_SIZE,
+) -> Image.Image:
+    return render_text(
+        text,
+        width,
+        height,
+        font_path=font_path,
+        font_size=font_size,
+        min_font_size=min_font_size,
+        max_font_size=max_font_size,
+        align=align,
+        valign=valign,
+        wrap=wrap,
+        line_spacing=line_spacing,
+        text_color=text_color,
+        background=background,
+    ).image
 
-    if valign == "top":
-        y = 0
-    elif valign == "middle":
-        y = (height - total_height) // 2
-    else:
-        y = max(0, height - total_height)
 
-    for idx, line in enumerate(lines):
-        w, _ = _measure_text(draw, line, font)
-        if align == "left":
-            x = 0
-        elif align == "center":
-            x = (width - w) // 2
+def render_text_to_buffer(
+    text: str,
+    width: int,
+    height: int,
+    *,
+    font_path: str | None = None,
+    font_size: FontSize = 28,
+    min_font_size: int = DEFAULT_MIN_FONT_SIZE,
+    max_font_size: int = DEFAULT_MAX_FONT_SIZE,
+    align: HorizontalAlign = "left",
+    valign: VerticalAlign = "top",
+    wrap: bool = True,
+    line_spacing: float = 1.0,
+    text_color: Tuple[int, int, int] = (0, 0, 0),
+    background: Tuple[int, int, int] = (255, 255, 255),
+    rotate: int = 0,
+    mirror: bool = False,
+    antialias: bool = False,
+    palette: Sequence[Tuple[int, int, int]] = FIVE65F_PALETTE,
+) -> Tuple[PanelBuffer, int]:
+    """Render straight to panel palette indices and pack them.
+
+    Glyphs are drawn into a palette image using only the nearest panel colors
+    for ``text_color`` and ``background``, so no fit, resample or dither pass
+    is needed. Without ``antialias`` glyph edges are thresholded; with it the
+    edge coverage is ordered-dithered between the two colors. ``rotate`` must
+    be a multiple of 90 degrees and is applied as a lossless transpose.
+
+    Returns the buffer and the font size used.
+    """
+    angle = rotate % 360
+    if angle % 90:
+        raise ValueError(f"text rotation must be a multiple of 90 degrees, got {rotate}")
+    box_w, box_h = (height, width) if angle % 180 == 90 else (width, height)
+    with timed("layout"):
+        size, layout = _size_and_layout(
+            text, box_w, box_h, font_path, font_size, min_font_size, max_font_size, wrap, line_spacing
+        )
+        font = _load_font(font_path, size)
+    text_index = nearest_palette_index(text_color, palette)
+    background_index = nearest_palette_index(background, palette)
+
+    with timed("draw"):
+        if antialias:
+            coverage = Image.new("L", (box_w, box_h), 0)
+            _draw_layout(ImageDraw.Draw(coverage), layout, font, box_w, box_h, align, valign, line_spacing, 255)
+            levels = np.asarray(coverage, dtype=np.float32) / 255.0
+            threshold = tile_threshold(bayer_matrix(4), box_h, box_w)
+            indices = np.where(levels > threshold, text_index, background_index).astype(np.uint8)
+            canvas = indices_to_image(indices, palette)
         else:
-            x = max(0, width - w)
-        draw.text((x, y), line, font=font, fill=text_color)
-        y += effective_line_height
+            canvas = indices_to_image(np.full((box_h, box_w), background_index, dtype=np.uint8), palette)
+            draw = ImageDraw.Draw(canvas)
+            draw.fontmode = "1"
+            _draw_layout(draw, layout, font, box_w, box_h, align, valign, line_spacing, text_index)
+
+    canvas = ensure_orientation(canvas, rotate=angle, mirror=mirror)
+    logger.debug(
+        "render_text_to_buffer: %d lines at size %d rotate=%d antialias=%s",
+        len(layout.lines),
+        size,
+        angle,
+        antialias,
+    )
+    return PanelBuffer.from_image(canvas, width, height, tuple(palette)), size
+
+
+def text_cache_key(text: str, width: int, height: int, **params: object) -> str:
+    """Frame-cache key for ``render_text_to_buffer(text, width, height, **params)``.
+
+    Registered font names are resolved so re-pointing a name changes the key.
+    """
+    font = params.pop("font_path", None)
+    path, index = resolve_font(font)  # type: ignore[arg-type]
+    return make_cache_key(
+        text.encode("utf-8"),
+        kind="text",
+        width=width,
+        height=height,
+        font=[path, index],
+        **params,
+    )
 
-    logger.debug("render_text_to_image: rendered %d lines", len(lines))
-    return image
 
+def render_text_to_buffer_cached(
+    text: str,
+    width: int,
+    height: int,
+    *,
+    cache: Optional[FrameCache] = None,
+    **params: object,
+) -> Tuple[PanelBuffer, int, bool]:
+    """``render_text_to_buffer`` through the frame cache.
 
+    Returns the buffer, the font size used and whether it was a cache hit.
+    """
+    if cache is None:
+        buf, size = render_text_to_buffer(text, width, height, **params)  # type: ignore[arg-type]
+        return buf, size, False
+    key = text_cache_key(text, width, height, **params)
+    entry = cache.get_entry(key)
+    if entry is not None and "font_size" in entry[1]:
+        return entry[0], int(entry[1]["font_size"]), True
+    buf, size = render_text_to_buffer(text, width, height, **params)  # type: ignore[arg-type]
+    path, index = resolve_font(params.get("font_path"))  # type: ignore[arg-type]
+    if FONT_CACHE.falls_back(path, index):
+        # Keyed by the requested font; storing it would keep serving the default
+        # font after the font file is fixed, across restarts for the disk tier
+        logger.debug("Not caching text frame rendered with fallback font for %s", path)
+        return buf, size, False
+    cache.put(key, buf, {"font_size": size})
+    return buf, size, False
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Sequence, Union
+
+from .drivers import PanelModel
+from .metrics import observe
+
+logger = logging.getLogger(__name__)
+
+
+Bytes = Union[bytes, bytearray, memoryview]
+
+# Largest single transfer spidev accepts unless the module's bufsiz is raised
+DEFAULT_CHUNK_SIZE = 4096
+
+# Pause after power-off, matching the vendor driver
+POWER_OFF_SETTLE = 0.5
+
+BUSY_TIMEOUT = 60.0
+
+
+def spidev_bufsiz(default: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Kernel-side spidev transfer limit (``/sys/module/spidev/parameters/bufsiz``)."""
+    try:
+        return int(Path("/sys/module/spidev/parameters/bufsiz").read_text().strip())
+    except (OSError, ValueError):
+        return default
+
+
+class FakeSpiDevice:
+    """In-memory stand-in for ``spidev.SpiDev`` that records every transfer.
+
+    With ``simulate_timing`` each call sleeps for the time the bytes would
+    take on the wire at ``max_speed_hz``, plus ``call_overhead`` seconds.
+    """
+
+    def __init__(self, *, max_speed_hz: int = 4_000_000, simulate_timing: bool = False, call_overhead: float = 0.0) -> None:
+        self.max_speed_hz = max_speed_hz
+        self.simulate_timing = simulate_timing
+        self.call_overhead = call_overhead
+        self.calls = 0
+        self.bytes_written = 0
+        self.written = bytearray()
+
+    def _transfer(self, data: Sequence[int]) -> None:
+        self.calls += 1
+        self.bytes_written += len(data)
+        self.written.extend(data)
+        if self.simulate_timing:
+            time.sleep(self.call_overhead + len(data) * 8 / self.max_speed_hz)
+
+    def writebytes(self, data: List[int]) -> None:
+        if len(data) > DEFAULT_CHUNK_SIZE:
+            raise OverflowError("writebytes is limited to 4096 bytes per call")
+        self._transfer(data)
+
+    def writebytes2(self, data: Bytes) -> None:
+        self._transfer(bytes(data))
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.bytes_written = 0
+        self.written = bytearray()
+
+
+class SharedBus:
+    """One driver ``epdconfig`` (SPI handle plus GPIO lines) shared by every panel using it.
+
+    ``lock`` serializes hardware phases: ``EPD.*`` calls and bulk uploads
+    from different panels must not interleave DC/CS toggles and transfers.
+    ``install`` reference-counts the module's ``module_init``/``module_exit``
+    so one panel going to sleep does not close the bus under another.
+    """
+
+    def __init__(self, config: Any = None) -> None:
+        self.config = config
+        self.lock = threading.RLock()
+        self.users = 0
+        self._module_init: Optional[Callable[..., Any]] = None
+        self._module_exit: Optional[Callable[..., Any]] = None
+
+    def install(self) -> None:
+        config = self.config
+        if config is None or self._module_init is not None:
+            return
+        init = getattr(config, "module_init", None)
+        exit_ = getattr(config, "module_exit", None)
+        if init is None or exit_ is None:
+            return
+        self._module_init, self._module_exit = init, exit_
+        config.module_init = self.module_init
+        config.module_exit = self.module_exit
+
+    def module_init(self, *args: Any, **kwargs: Any) -> Any:
+        assert self._module_init is not None
+        with self.lock:
+            if self.users == 0:
+                result = self._module_init(*args, **kwargs)
+                if result not in (None, 0):
+                    return result
+            self.users += 1
+            logger.debug("SharedBus: module_init, %d user(s)", self.users)
+            return 0
+
+    def module_exit(self, *args: Any, **kwargs: Any) -> None:
+        assert self._module_exit is not None
+        with self.lock:
+            if self.users == 0:
+                return
+            self.users -= 1
+            logger.debug("SharedBus: module_exit, %d user(s) left", self.users)
+            if self.users == 0:
+                self._module_exit(*args, **kwargs)
+
+
+_BUSES: Dict[int, SharedBus] = {}
+_BUSES_LOCK = threading.Lock()
+
+
+def shared_bus(config: Any) -> SharedBus:
+    """The ``SharedBus`` for an ``epdconfig`` module (None: drivers without one)."""
+    with _BUSES_LOCK:
+        bus = _BUSES.get(id(config))
+        if bus is None:
+            bus = _BUSES[id(config)] = SharedBus(config)
+            bus.install()
+        return bus
+
+
+class SpiTransport:
+    """Command/data writer that sends frame data in large SPI transfers.
+
+    The vendor ``epdconfig`` path issues one ``spi_writebyte`` per byte with
+    a DC/CS toggle around each. Here DC and CS are set once per command or
+    data phase and the payload goes out in ``chunk_size`` transfers.
+    """
+
+    def __init__(
+        self,
+        spi: Any,
+        digital_write: Callable[[int, int], None],
+        digital_read: Callable[[int], int],
+        *,
+        dc_pin: int,
+        busy_pin: int,
+        cs_pin: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        delay_ms: Callable[[float], None] = lambda ms: time.sleep(ms / 1000.0),
+        lock: Optional[ContextManager[Any]] = None,
+    ) -> None:
+        self.spi = spi
+        self.digital_write = digital_write
+        self.digital_read = digital_read
+        self.dc_pin = dc_pin
+        self.busy_pin = busy_pin
+        self.cs_pin = cs_pin
+        self.chunk_size = chunk_size or spidev_bufsiz()
+        self.delay_ms = delay_ms
+        # Held for a whole upload; shared with the driver calls of other panels on the bus
+        self.lock = lock if lock is not None else nullcontext()
+        self._bulk = hasattr(spi, "writebytes2")
+        self.transfers = 0
+        self.bytes_sent = 0
+
+    @classmethod
+    def from_driver(
+        cls, epd: Any, module: Any, *, chunk_size: Optional[int] = None, lock: Optional[ContextManager[Any]] = None
+    ) -> Optional["SpiTransport"]:
+        """Build a transport sharing the driver's SPI handle and pin numbers.
+
+        Returns None when the driver's ``epdconfig`` does not expose the
+        pieces needed (older vendor layouts, simulation stubs).
+        """
+        config = getattr(module, "epdconfig", None)
+        spi = getattr(config, "SPI", None)
+        write = getattr(config, "digital_write", None)
+        read = getattr(config, "digital_read", None)
+        dc_pin = getattr(epd, "dc_pin", None)
+        busy_pin = getattr(epd, "busy_pin", None)
+        if spi is None or write is None or read is None or dc_pin is None or busy_pin is None:
+            return None
+        return cls(
+            spi,
+            write,
+            read,
+            dc_pin=dc_pin,
+            busy_pin=busy_pin,
+            cs_pin=getattr(epd, "cs_pin", None),
+            chunk_size=chunk_size,
+            delay_ms=getattr(config, "delay_ms", None) or (lambda ms: time.sleep(ms / 1000.0)),
+            lock=lock,
+        )
+
+    # --- primitives
+    def _select(self, level: int) -> None:
+        if self.cs_pin is not None:
+            self.digital_write(self.cs_pin, level)
+
+    def _write(self, payload: Bytes) -> None:
+        view = memoryview(payload)
+        step = self.chunk_size
+        for start in range(0, len(view), step):
+            chunk = view[start:start + step]
+            if self._bulk:
+                self.spi.writebytes2(chunk)
+            else:
+                self.spi.writebytes(list(chunk))
+            self.transfers += 1
+        self.bytes_sent += len(view)
+
+    def command(self, cmd: int, *data: int) -> None:
+        self.digital_write(self.dc_pin, 0)
+        self._select(0)
+        self._write(bytes((cmd,)))
+        self._select(1)
+        if data:
+            self.data(bytes(data))
+
+    def data(self, payload: Bytes) -> None:
+        self.digital_write(self.dc_pin, 1)
+        self._select(0)
+        self._write(payload)
+        self._select(1)
+
+    def wait_busy(self, level: int, timeout: float = BUSY_TIMEOUT) -> None:
+        """Block while the BUSY line reads ``level``."""
+        deadline = time.monotonic() + timeout
+        while self.digital_read(self.busy_pin) == level:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"panel BUSY stuck at {level} for {timeout:.0f}s")
+            self.delay_ms(1)
+
+    # --- frame upload
+    def upload_frame(self, spec: PanelModel, data: Bytes) -> Dict[str, float]:
+        """Write a packed frame and run the refresh; returns per-phase seconds.
+
+        Follows the vendor sequence for the ACeP 5.65"/4.01" controllers:
+        resolution, frame write, power on, refresh, power off.
+        """
+        expected = (spec.width + spec.width % 2) * spec.height // 2
+        if len(data) != expected:
+            raise ValueError(f"frame is {len(data)} bytes, {spec.name} expects {expected}")
+        timings: Dict[str, float] = {}
+        with self.lock:
+            start = time.perf_counter()
+            self.command(0x61, spec.width >> 8, spec.width & 0xFF, spec.height >> 8, spec.height & 0xFF)
+            self.command(spec.frame_command)
+            self.data(data)
+            timings["spi"] = time.perf_counter() - start
+            start = time.perf_counter()
+            self.command(0x04)  # power on
+            self.wait_busy(0)
+            self.command(0x12)  # display refresh
+            self.wait_busy(0)
+            self.command(0x02)  # power off
+            self.wait_busy(1)
+            self.delay_ms(POWER_OFF_SETTLE * 1000)
+            timings["refresh"] = time.perf_counter() - start
+        observe("spi", timings["spi"])
+        observe("refresh", timings["refresh"])
+        logger.debug(
+            "SpiTransport: %d bytes in %.4fs (%d transfers of <=%d), refresh %.2fs",
+            len(data),
+            timings["spi"],
+            self.transfers,
+            self.chunk_size,
+            timings["refresh"],
+        )
+        return timings
+
+
+def transfer_benchmark(nbytes: int = 134_400, *, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, float]:
+    """Compare per-byte (vendor style) and bulk writes against a FakeSpiDevice.
+
+    Measures host-side overhead only; the default size is one 600x448 frame.
+    """
+    payload = bytes(range(256)) * (nbytes // 256) + bytes(nbytes % 256)
+    pins: Dict[int, int] = {}
+
+    def write(pin: int, value: int) -> None:
+        pins[pin] = value
+
+    spi = FakeSpiDevice()
+    start = time.perf_counter()
+    for byte in payload:
+        write(25, 1)
+        write(8, 0)
+        spi.writebytes([byte])
+        write(8, 1)
+    per_byte = time.perf_counter() - start
+
+    spi.reset()
+    transport = SpiTransport(spi, write, lambda pin: 1, dc_pin=25, busy_pin=24, cs_pin=8, chunk_size=chunk_size)
+    start = time.perf_counter()
+    transport.data(payload)
+    bulk = time.perf_counter() - start
+    return {
+        "bytes": float(nbytes),
+        "per_byte_seconds": per_byte,
+        "bulk_seconds": bulk,
+        "bulk_transfers": float(spi.calls),
+        "speedup": per_byte / bulk if bulk else float("inf"),
+    }
+
+
+if __name__ == "__main__":
+    for key, value in transfer_benchmark().items():
+        print(f"{key}: {value:.6g}")
@@ -0,0 +1,236 @@
+"""Watch a file or directory and report debounced batches of changed files.
+
+Linux inotify is used through ctypes when libc provides it; elsewhere (or
+with ``poll=True``) the directory is rescanned every ``interval`` seconds
+and files are compared by mtime and size. A file given directly is watched
+through its directory, so editors and renderers that replace the file by
+rename are still seen.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import logging
+import os
+import select
+import struct
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".epf"})
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# wd, mask, cookie, len; followed by ``len`` bytes of NUL-padded name
+_EVENT = struct.Struct("iIII")
+
+# A steady stream of writes still produces an update this often (in debounce periods)
+MAX_DEBOUNCE_PERIODS = 10
+
+
+class Inotify:
+    """Minimal ctypes binding for inotify; raises OSError where unavailable."""
+
+    def __init__(self) -> None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+            self._add_watch = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except (AttributeError, OSError, TypeError) as exc:
+            raise OSError(errno.ENOSYS, "inotify is not available") from exc
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        fd = init(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+
+    def add_watch(self, path: Path, mask: int) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def read(self, timeout: Optional[float]) -> List[Tuple[int, int, str]]:
+        """Events as ``(wd, mask, name)``; empty when ``timeout`` expires."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FileWatcher:
+    """Yield batches of changed files under ``path``, debounced.
+
+    A batch is emitted once no further change has arrived for ``debounce``
+    seconds (or after ``MAX_DEBOUNCE_PERIODS`` periods of continuous
+    writes), newest file first.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        debounce: float = 0.5,
+        interval: float = 1.0,
+        poll: bool = False,
+        suffixes: Iterable[str] = IMAGE_SUFFIXES,
+    ) -> None:
+        self.path = path
+        self.debounce = debounce
+        self.interval = interval
+        self.suffixes = frozenset(s.lower() for s in suffixes)
+        if path.is_dir():
+            self.directory = path
+            self.matches: Callable[[Path], bool] = lambda p: p.suffix.lower() in self.suffixes
+        else:
+            self.directory = path.parent
+            self.matches = lambda p: p.name == path.name
+        self._inotify: Optional[Inotify] = None
+        if not poll:
+            try:
+                self._inotify = Inotify()
+                self._inotify.add_watch(
+                    self.directory, IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+                )
+            except OSError as exc:
+                logger.info("inotify unavailable (%s); polling every %.1fs", exc, interval)
+                self.close()
+        self._snapshot = self._scan() if self._inotify is None else {}
+
+    @property
+    def backend(self) -> str:
+        return "inotify" if self._inotify is not None else "poll"
+
+    def files(self) -> List[Path]:
+        """Current matching files, newest first."""
+        return _newest_first(self._list())
+
+    def changes(self) -> Iterator[List[Path]]:
+        while True:
+            pending = self._wait(None)
+            if not pending:
+                continue
+            first = time.monotonic()
+            deadline = first + self.debounce
+            cap = first + self.debounce * MAX_DEBOUNCE_PERIODS
+            while True:
+                remaining = min(deadline, cap) - time.monotonic()
+                if remaining <= 0:
+                    break
+                more = self._wait(remaining)
+                if more:
+                    pending |= more
+                    deadline = time.monotonic() + self.debounce
+            logger.debug("FileWatcher: %d changed file(s)", len(pending))
+            yield _newest_first(p for p in pending if p.exists())
+
+    def close(self) -> None:
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    # --- internals
+    def _list(self) -> List[Path]:
+        try:
+            return [p for p in self.directory.iterdir() if self.matches(p) and p.is_file()]
+        except OSError as exc:
+            logger.warning("FileWatcher: cannot list %s: %s", self.directory, exc)
+            return []
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for p in self._list():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            snapshot[p] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _wait(self, timeout: Optional[float]) -> Set[Path]:
+        """Changed files seen within ``timeout`` seconds (None waits for the first)."""
+        if self._inotify is None:
+            return self._poll(timeout)
+        changed: Set[Path] = set()
+        for _wd, mask, name in self._inotify.read(timeout):
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped; treat every candidate as changed
+                changed.update(self._list())
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                raise FileNotFoundError(f"watched directory went away: {self.directory}")
+            elif name:
+                p = self.directory / name
+                if self.matches(p):
+                    changed.add(p)
+        return changed
+
+    def _poll(self, timeout: Optional[float]) -> Set[Path]:
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.interval if end is None else min(self.interval, max(0.0, end - time.monotonic()))
+            time.sleep(wait)
+            current = self._scan()
+            changed = {p for p, sig in current.items() if self._snapshot.get(p) != sig}
+            self._snapshot = current
+            if changed or (end is not None and time.monotonic() >= end):
+                return changed
+
+
+def _newest_first(paths: Iterable[Path]) -> List[Path]:
+    def mtime(p: Path) -> float:
+        try:
+            return p.stat().st_mtime
+        except OSError:
+            return 0.0
+
+    return sorted(paths, key=mtime, reverse=True)
+
+
+class ContentTracker:
+    """Remembers the SHA-256 of each file's content when it was last pushed."""
+
+    def __init__(self) -> None:
+        self._digests: Dict[Path, str] = {}
+
+    def changed(self, path: Path, data: bytes) -> bool:
+        digest = hashlib.sha256(data).hexdigest()
+        if self._digests.get(path) == digest:
+            return False
+        self._digests[path] = digest
+        return True
+
+    def forget(self, path: Path) -> None:
+        self._digests.pop(path, None)
@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Sequence
+
+from .display import WaveshareDisplay
+from .drivers import DisplayConfig, load_display_configs
+from .metrics import JOB_QUEUE_SECONDS, JOB_SECONDS, JOBS, collect_stages
+
+logger = logging.getLogger(__name__)
+
+
+JobFunc = Callable[["Job", WaveshareDisplay], Dict[str, Any]]
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    """A unit of display work plus its status and per-stage timings."""
+
+    def __init__(self, kind: str, func: JobFunc, *, coalesce: bool = True) -> None:
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.func = func
+        self.coalesce = coalesce
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.timings: Dict[str, float] = {}
+        self.result: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.superseded_by: Optional[str] = None
+        self._done = threading.Event()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 6)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def _finish(self, status: str) -> None:
+        self.status = status
+        self.finished = time.time()
+        self._done.set()
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "timings": dict(self.timings),
+        }
+        if self.result:
+            payload["result"] = self.result
+        if self.error is not None:
+            payload["error"] = self.error
+        if self.superseded_by is not None:
+            payload["superseded_by"] = self.superseded_by
+        return payload
+
+
+class DisplayWorker:
+    """Single thread that owns a WaveshareDisplay and drains a job queue.
+
+    Submitting a coalescing job drops every queued (not yet running)
+    coalescing job, so only the newest frame is prepared and drawn.
+    """
+
+    def __init__(
+        self,
+        display: WaveshareDisplay,
+        *,
+        max_pending: int = 8,
+        history: int = 256,
+        idle_sleep: Optional[float] = None,
+        name: str = "display-worker",
+    ) -> None:
+        self.display = display
+        # Seconds without work before the panel is put to sleep; 0 disables
+        if idle_sleep is None:
+            idle_sleep = float(os.environ.get("EPAPER_IDLE_SLEEP", "60"))
+        self.idle_sleep = idle_sleep
+        self.max_pending = max_pending
+        self.history = history
+        self.name = name
+        self._queue: Deque[Job] = deque()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self.current: Optional[Job] = None
+        self.completed = 0
+        self.failed = 0
+        self.superseded = 0
+
+    # --- lifecycle
+    def start(self) -> "DisplayWorker":
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    # --- submission
+    def submit(self, kind: str, func: JobFunc, *, coalesce: bool = True) -> Job:
+        job = Job(kind, func, coalesce=coalesce)
+        with self._cond:
+            if coalesce:
+                kept: Deque[Job] = deque()
+                for queued in self._queue:
+                    if queued.coalesce:
+                        queued.superseded_by = job.id
+                        queued._finish("superseded")
+                        self.superseded += 1
+                        JOBS.inc(self.display.name, queued.kind, "superseded")
+                        logger.debug("Job %s (%s) superseded by %s", queued.id, queued.kind, job.id)
+                    else:
+                        kept.append(queued)
+                self._queue = kept
+            if len(self._queue) >= self.max_pending:
+                raise QueueFull(f"display queue is full ({self.max_pending} pending jobs)")
+            self._queue.append(job)
+            self._remember(job)
+            self._cond.notify()
+        logger.debug("Job %s (%s) queued; pending=%d", job.id, kind, len(self._queue))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._queue),
+                "max_pending": self.max_pending,
+                "running": self.current.id if self.current is not None else None,
+                "completed": self.completed,
+                "failed": self.failed,
+                "superseded": self.superseded,
+            }
+
+    # --- internals
+    def _remember(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.history:
+            self._jobs.popitem(last=False)
+
+    def _run(self) -> None:
+        while True:
+            idle = False
+            with self._cond:
+                while not self._queue and not self._stopping:
+                    # Not just "ready": a wake begun for a job whose frame was then
+                    # skipped may still be in progress, and must be slept again
+                    awake = self.display.power_state != "asleep"
+                    timeout = self.idle_sleep if self.idle_sleep > 0 and awake else None
+                    if not self._cond.wait(timeout) and not self._queue:
+                        idle = True
+                        break
+                if not idle:
+                    if self._stopping and not self._queue:
+                        return
+                    job = self._queue.popleft()
+                    self.current = job
+            if idle:
+                logger.debug("Display idle for %.1fs; sleeping panel", self.idle_sleep)
+                self.display.sleep()
+                continue
+            # Re-init the controller in the background while the frame is prepared
+            self.display.begin_wake()
+            self._execute(job)
+            with self._cond:
+                self.current = None
+
+    def _execute(self, job: Job) -> None:
+        job.started = time.time()
+        job.status = "running"
+        job.timings["queued"] = round(job.started - job.created, 6)
+        JOB_QUEUE_SECONDS.observe(job.started - job.created, self.display.name)
+        start = time.perf_counter()
+        # Pipeline stages (decode, fit, quantize, pack, spi, refresh...) observed on this thread
+        with collect_stages() as stages:
+            try:
+                job.result = job.func(job, self.display) or {}
+                error: Optional[Exception] = None
+            except Exception as exc:
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                error = exc
+        for name, seconds in stages.items():
+            job.timings.setdefault(name, round(seconds, 6))
+        elapsed = time.perf_counter() - start
+        job.timings["total"] = round(elapsed, 6)
+        JOB_SECONDS.observe(elapsed, self.display.name, job.kind)
+        if error is not None:
+            job.error = str(error)
+            with self._cond:
+                self.failed += 1
+            JOBS.inc(self.display.name, job.kind, "failed")
+            job._finish("failed")
+            return
+        with self._cond:
+            self.completed += 1
+        JOBS.inc(self.display.name, job.kind, "done")
+        job._finish("done")
+        logger.debug("Job %s (%s) done in %.3fs", job.id, job.kind, job.timings["total"])
+
+
+def start_workers(
+    configs: Optional[Sequence[DisplayConfig]] = None, *, max_pending: Optional[int] = None
+) -> "OrderedDict[str, DisplayWorker]":
+    """Create every configured display and start one worker per panel.
+
+    Each worker thread is the only code that touches its display, so panels
+    prepare and refresh independently. Controller init finishes in the
+    background; a worker waits for it before its first frame.
+    """
+    if max_pending is None:
+        max_pending = int(os.environ.get("EPAPER_QUEUE_SIZE", "8"))
+    workers: "OrderedDict[str, DisplayWorker]" = OrderedDict()
+    for config in configs if configs is not None else load_display_configs():
+        disp = WaveshareDisplay(
+            model=config.model,
+            orientation=config.orientation,
+            name=config.name,
+            pins=config.pins,
+        )
+        disp.begin_initialize()
+        workers[config.name] = DisplayWorker(disp, max_pending=max_pending, name=f"display-worker-{config.name}").start()
+        logger.info(
+            "Display configured: name=%s model=%s size=%sx%s orientation=%s power=%s",
+            config.name,
+            disp.model,
+            disp.width,
+            disp.height,
+            disp.orientation,
+            disp.power_state,
+        )
+    return workers
@@ -0,0 +1,118 @@
+"""Drive the Flask app against the fake Waveshare driver and report latency/throughput.
+
+Runs entirely in-process (Flask test client, one thread per concurrent
+client), so it works on any CI runner without a Pi.
+
+    python scripts/loadtest_fake_panel.py --requests 200 --concurrency 8 --time-scale 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+FAKES = ROOT / "epaper_server" / "fakes"
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--kind", choices=["text", "image", "mixed"], default="mixed")
+    parser.add_argument("--time-scale", type=float, default=0.01, help="multiplier for emulated panel delays")
+    parser.add_argument("--no-wait", action="store_true", help="do not block on ?wait=1; measures queueing only")
+    args = parser.parse_args(argv)
+
+    # Must be set before the driver and app are imported
+    os.environ["WAVESHARE_LIB_PATH"] = str(FAKES)
+    os.environ["EPAPER_FAKE_TIME_SCALE"] = str(args.time_scale)
+    os.environ.setdefault("EPAPER_STATE_DIR", "")
+    os.environ.setdefault("EPAPER_CACHE_DIR", "")
+    os.environ.setdefault("EPAPER_QUEUE_SIZE", str(max(8, args.concurrency * 2)))
+    sys.path.insert(0, str(ROOT))
+
+    from PIL import Image
+
+    from epaper_server.server import create_app
+
+    app = create_app()
+    images = []
+    for i in range(8):
+        buf = io.BytesIO()
+        Image.new("RGB", (800, 600), ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256)).save(buf, "PNG")
+        images.append(buf.getvalue())
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+    suffix = "" if args.no_wait else "?wait=1"
+
+    def client() -> None:
+        c = app.test_client()
+        for n in counter:
+            kind = args.kind if args.kind != "mixed" else ("text" if n % 2 else "image")
+            start = time.perf_counter()
+            if kind == "text":
+                resp = c.post(f"/api/display/text{suffix}", json={"text": f"load test frame {n}", "font_size": "auto"})
+            else:
+                data = {"file": (io.BytesIO(images[n % len(images)]), "frame.png"), "dither": "bayer"}
+                resp = c.post(f"/api/display/image{suffix}", data=data)
+            elapsed = time.perf_counter() - start
+            body: Dict[str, Any] = resp.get_json(silent=True) or {}
+            status = body.get("job", {}).get("status") or body.get("status") or str(resp.status_code)
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    status = app.test_client().get("/api/status").get_json()
+    import waveshare_epd.epdconfig as epdconfig  # the fake, via WAVESHARE_LIB_PATH
+
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(args.requests / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 2),
+            "p95": round(_percentile(latencies, 95) * 1000, 2),
+            "max": round(max(latencies, default=0.0) * 1000, 2),
+            "mean": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        },
+        "statuses": statuses,
+        "driver": status["driver"],
+        "worker": status["worker"],
+        "frames": status["frames"],
+        "controller": epdconfig.controller.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
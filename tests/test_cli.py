@@ -0,0 +1,53 @@
+"""Local (no daemon) display commands against the fake driver."""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from epaper_server import cli
+
+FAKES = Path(cli.__file__).resolve().parent / "fakes"
+
+
+@pytest.fixture
+def fake_driver(tmp_path, monkeypatch):
+    monkeypatch.setenv("WAVESHARE_LIB_PATH", str(FAKES))
+    monkeypatch.setenv("EPAPER_FAKE_TIME_SCALE", "0")
+    monkeypatch.setenv("EPAPER_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("EPAPER_CACHE_DIR", "")
+    monkeypatch.setenv("EPAPER_SOCKET", "")
+    monkeypatch.delenv("EPAPER_SIM_OUTPUT_DIR", raising=False)
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    before = set(sys.modules)
+    displays = []
+    make_display = cli._make_display
+
+    def recording(args):
+        disp = make_display(args)
+        displays.append(disp)
+        return disp
+
+    monkeypatch.setattr(cli, "_make_display", recording)
+    yield displays
+    # Later tests expect simulation mode, not a cached fake driver
+    for name in set(sys.modules) - before:
+        if name.split(".")[0] in {"waveshare_epd", "epdconfig", "epd5in65f"}:
+            del sys.modules[name]
+
+
+def test_repeated_image_leaves_panel_asleep(fake_driver, tmp_path, monkeypatch):
+    path = tmp_path / "in.png"
+    Image.new("RGB", (64, 48), (30, 30, 200)).save(path)
+    assert cli.main(["image", str(path), "--dither", "none"]) == 0
+    # Slow the reset down so the skipped frame returns while EPD.init is still running
+    monkeypatch.setattr(sys.modules["waveshare_epd.epdconfig"], "TIME_SCALE", 0.5)
+    assert cli.main(["image", str(path), "--dither", "none"]) == 0
+    first, second = fake_driver
+    assert first.epd is not None
+    assert (first.refreshes, second.refreshes, second.skipped) == (1, 0, 1)
+    for disp in fake_driver:
+        assert disp.power_state == "asleep"
+        assert disp._power_thread is None
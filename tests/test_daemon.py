@@ -0,0 +1,206 @@
+"""Round trips through the daemon protocol: ``daemon.converse`` on one end of a
+socketpair, ``DisplayDaemon._handle`` on the other, against a simulated panel."""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+from epaper_server import daemon
+from epaper_server.display import WaveshareDisplay
+from epaper_server.frame_cache import FrameCache
+from epaper_server.image_utils import prepare_5in65_buffer_from_bytes
+from epaper_server.text_utils import render_text_to_buffer
+from epaper_server.worker import DisplayWorker
+
+
+@pytest.fixture(params=["landscape"])
+def server(request, tmp_path, monkeypatch):
+    # No driver on the path: the display runs in simulation mode
+    monkeypatch.delenv("WAVESHARE_LIB_PATH", raising=False)
+    monkeypatch.delenv("EPAPER_SIM_OUTPUT_DIR", raising=False)
+    disp = WaveshareDisplay(orientation=request.param, state_dir=tmp_path / "state")
+    disp.begin_initialize()
+    worker = DisplayWorker(disp, idle_sleep=0).start()
+    yield daemon.DisplayDaemon({"default": worker}, FrameCache(), tmp_path / "epaper.sock")
+    worker.stop(timeout=5)
+
+
+def round_trip(server, argv, capsys, *, handler=None):
+    client, peer = socket.socketpair()
+    thread = threading.Thread(target=handler or server._handle, args=(peer,))
+    thread.start()
+    try:
+        with client:
+            code = daemon.converse(client, argv)
+    finally:
+        thread.join(timeout=10)
+        peer.close()
+    out = capsys.readouterr()
+    return code, out.out, out.err
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "in.png"
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(path)
+    return path
+
+
+def test_image_is_streamed_and_shown(server, image_path, capsys):
+    code, _, err = round_trip(server, ["image", str(image_path), "--mode", "fill", "--dither", "none"], capsys)
+    assert (code, err) == (0, "")
+    frame = server.workers["default"].display.simulator.get()
+    assert frame is not None and frame.kind == "image"
+    assert frame.size == (600, 448)
+
+
+@pytest.mark.parametrize("server", ["portrait"], indirect=True)
+def test_portrait_frames_match_the_http_api(server, image_path, capsys):
+    disp = server.workers["default"].display
+    code, _, err = round_trip(server, ["image", str(image_path), "--dither", "none", "--rotate", "180"], capsys)
+    assert (code, err) == (0, "")
+    # The HTTP API adds 90 degrees for portrait panels on top of the requested rotation
+    expected, _ = prepare_5in65_buffer_from_bytes(image_path.read_bytes(), disp.width, disp.height, dither="none", rotate=270)
+    assert bytes(disp.simulator.get().source.data) == bytes(expected.data)
+
+    code, _, err = round_trip(server, ["text", "hello"], capsys)
+    assert (code, err) == (0, "")
+    expected, _ = render_text_to_buffer("hello", disp.width, disp.height, font_size=28, wrap=True, rotate=90)
+    assert bytes(disp.simulator.get().source.data) == bytes(expected.data)
+
+
+def test_text_and_preview_relative_to_client_cwd(server, tmp_path, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code, out, err = round_trip(server, ["--preview", "out.png", "text", "hello"], capsys)
+    assert (code, err) == (0, "")
+    assert "preview written to" in out
+    assert (tmp_path / "out.png").exists()
+
+
+def test_parse_error_exit_code(server, capsys):
+    code, out, err = round_trip(server, ["image", "x.png", "--mode", "sideways"], capsys)
+    assert code == 2
+    assert out == ""
+    assert "invalid choice: 'sideways'" in err
+
+
+def test_help_is_returned_on_stdout(server, capsys):
+    code, out, _ = round_trip(server, ["clear", "--help"], capsys)
+    assert code == 0
+    assert "usage: epaperctl clear" in out
+
+
+def test_missing_file(server, tmp_path, capsys):
+    missing = tmp_path / "missing.png"
+    code, _, err = round_trip(server, ["image", str(missing)], capsys)
+    assert code == 2
+    assert f"image not found: {missing}" in err
+
+
+def test_incompatible_frame_file(server, tmp_path, capsys):
+    bogus = tmp_path / "bogus.epf"
+    bogus.write_bytes(b"not a frame")
+    code, _, err = round_trip(server, ["show", str(bogus)], capsys)
+    assert code == 2
+    assert "not a frame file" in err
+
+
+def test_client_only_sends_its_own_file(tmp_path, capsys):
+    secret = tmp_path / "secret"
+    secret.write_bytes(b"private")
+    received = []
+
+    def hostile(sock):
+        daemon.recv_message(sock)
+        daemon.send_message(sock, {"read": str(secret)})
+        try:
+            received.append(daemon.recv_message(sock))
+        except (OSError, ValueError):
+            pass
+
+    for argv in (["text", "hi"], ["image", "ok.png"]):
+        with pytest.raises(ValueError, match="does not read"):
+            round_trip(None, argv, capsys, handler=hostile)
+    assert received == []
+
+
+@pytest.mark.parametrize("reply", [{"ok": True}, {"exit": "0"}, {"exit": 0, "stdout": 5}, {"read": None}])
+def test_malformed_reply_is_a_protocol_error(reply, capsys):
+    def daemon_side(sock):
+        daemon.recv_message(sock)
+        daemon.send_message(sock, reply)
+
+    with pytest.raises(ValueError, match="malformed message"):
+        round_trip(None, ["image", "a.png"], capsys, handler=daemon_side)
+    assert capsys.readouterr() == ("", "")
+
+
+def test_malformed_request_is_dropped(server, image_path):
+    client, peer = socket.socketpair()
+    thread = threading.Thread(target=server._handle, args=(peer,))
+    thread.start()
+    with client:
+        daemon.send_message(client, {"op": "cli", "argv": ["image", str(image_path)], "cwd": "/"})
+        assert daemon.recv_message(client) == {"read": str(image_path)}
+        # No "size": the daemon gives up on the request instead of crashing
+        daemon.send_message(client, {"bytes": 3})
+        thread.join(timeout=10)
+        assert not thread.is_alive()
+        # As the socket server does once the handler returns
+        peer.close()
+        with pytest.raises(ConnectionError):
+            daemon.recv_message(client)
+
+
+@pytest.mark.parametrize(
+    "argv, expected",
+    [
+        (["image", "a.png"], "a.png"),
+        (["--display", "k", "image", "--mode", "fit", "a.png", "--force", "1"], "a.png"),
+        (["image", "--rotate", "-90", "--mode=fill", "a.png"], "a.png"),
+        (["image", "--", "-a.png"], "-a.png"),
+        (["show", "f.epf"], "f.epf"),
+        (["text", "a.png"], None),
+        (["clear"], None),
+    ],
+)
+def test_file_argument(argv, expected):
+    assert daemon.file_argument(argv) == expected
+
+
+def test_untrusted_socket_is_ignored(tmp_path):
+    path = tmp_path / "shared.sock"
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(str(path))
+    listener.listen(1)
+    try:
+        os.chmod(path, 0o666)
+        with pytest.raises(PermissionError, match="other users"):
+            daemon.check_socket(path)
+        assert daemon.forward(["clear"], path) is None
+        assert daemon.ping(path) is False
+        os.chmod(path, 0o600)
+        daemon.check_socket(path)
+    finally:
+        listener.close()
+    plain = tmp_path / "plain"
+    plain.write_bytes(b"")
+    with pytest.raises(PermissionError, match="not a socket"):
+        daemon.check_socket(plain)
+
+
+def test_daemon_socket_over_unix_path(server, tmp_path, capsys):
+    server.start()
+    try:
+        assert daemon.ping(server.path)
+        assert daemon.forward(["clear"], server.path) == 0
+        assert daemon.forward(["compile", "x.png"], server.path) is None
+    finally:
+        server.shutdown()
+        server._thread.join(timeout=5)
+    assert not Path(server.path).exists()
@@ -0,0 +1,56 @@
+"""Power lifecycle of a simulated panel."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from epaper_server.display import DisplayError, WaveshareDisplay
+from epaper_server.framebuffer import PanelBuffer
+
+
+@pytest.fixture
+def disp(tmp_path, monkeypatch):
+    # No driver on the path: the display runs in simulation mode
+    monkeypatch.delenv("WAVESHARE_LIB_PATH", raising=False)
+    monkeypatch.delenv("EPAPER_SIM_OUTPUT_DIR", raising=False)
+    disp = WaveshareDisplay(state_dir=tmp_path / "state")
+    disp.initialize()
+    return disp
+
+
+def _wake_in_background(disp):
+    disp.begin_wake()
+    thread = disp._power_thread
+    assert thread is not None
+    thread.join(timeout=5)
+    return thread
+
+
+def test_skipped_frame_does_not_block_later_wakes(disp):
+    buf = PanelBuffer(disp.width, disp.height, bytearray(b"\x11" * (disp.width * disp.height // 2)))
+    assert disp.show_image(buf)
+    for _ in range(2):
+        disp.sleep()
+        assert disp.power_state == "asleep"
+        _wake_in_background(disp)
+        # Identical frame: show_image returns before wait_ready
+        assert not disp.show_image(buf)
+        assert disp.power_state == "ready"
+        assert disp._power_thread is None
+
+
+def test_driver_failure_is_not_a_skip(disp):
+    buf = PanelBuffer(disp.width, disp.height, bytearray(b"\x11" * (disp.width * disp.height // 2)))
+    assert disp.show_image(buf)
+    assert not disp.show_image(buf)
+    assert disp.last_skip_reason == "unchanged"
+
+    def broken(data):
+        raise OSError("SPI transfer failed")
+
+    disp.epd = SimpleNamespace(display=broken)
+    with pytest.raises(DisplayError, match="SPI transfer failed"):
+        disp.show_image(buf, force=True)
+    assert disp.last_skip_reason is None
+    assert disp.last_digest is None
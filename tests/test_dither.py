@@ -0,0 +1,32 @@
+"""Array-based dithering strategies."""
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from epaper_server.dither import atkinson_indices
+from epaper_server.palette import FIVE65F_PALETTE, map_to_palette_indices
+
+
+def atkinson_reference(rgb: np.ndarray) -> np.ndarray:
+    """Textbook pixel-by-pixel Atkinson diffusion."""
+    height, width = rgb.shape[:2]
+    work = rgb.astype(np.float64)
+    pal = np.asarray(FIVE65F_PALETTE, dtype=np.float64)
+    out = np.empty((height, width), dtype=np.uint8)
+    for y in range(height):
+        for x in range(width):
+            px = np.clip(work[y, x], 0, 255).astype(np.uint8)
+            idx = int(map_to_palette_indices(px.reshape(1, 1, 3))[0, 0])
+            out[y, x] = idx
+            e = (work[y, x] - pal[idx]) * 0.125
+            for dy, dx in ((0, 1), (0, 2), (1, -1), (1, 0), (1, 1), (2, 0)):
+                if 0 <= y + dy < height and 0 <= x + dx < width:
+                    work[y + dy, x + dx] += e
+    return out
+
+
+@pytest.mark.parametrize("shape", [(23, 31), (1, 9), (9, 1), (2, 2)])
+def test_atkinson_matches_serial_diffusion(shape):
+    rgb = np.random.default_rng(7).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    assert np.array_equal(atkinson_indices(rgb), atkinson_reference(rgb))
@@ -0,0 +1,36 @@
+"""Disk tier of the frame cache."""
+from __future__ import annotations
+
+import logging
+import threading
+
+from epaper_server.frame_cache import FrameCache
+from epaper_server.framebuffer import PanelBuffer
+
+
+def test_concurrent_writers_of_one_key(tmp_path, caplog):
+    caches = [FrameCache(max_entries=0, directory=tmp_path) for _ in range(8)]
+    buf = PanelBuffer(64, 48, bytearray(b"\x23" * (64 * 48 // 2)))
+    start = threading.Barrier(len(caches))
+
+    def write(cache):
+        start.wait()
+        for _ in range(50):
+            cache.put("same", buf, {"n": 1})
+
+    threads = [threading.Thread(target=write, args=(c,)) for c in caches]
+    with caplog.at_level(logging.WARNING, logger="epaper_server.frame_cache"):
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    assert caplog.records == []
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["same.bin"]
+    assert bytes(FrameCache(directory=tmp_path).get("same").data) == bytes(buf.data)
+
+
+def test_unknown_disk_format_is_a_miss(tmp_path):
+    (tmp_path / "old.bin").write_bytes(b"EPC1" + b"\x08\x00\x08\x00" + b"\x11" * 32)
+    cache = FrameCache(directory=tmp_path)
+    assert cache.get("old") is None
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,28 @@
+"""HTTP API against simulated panels."""
+from __future__ import annotations
+
+from io import BytesIO
+
+import pytest
+
+from epaper_server.server import create_app
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # No driver on the path: the displays run in simulation mode
+    monkeypatch.delenv("WAVESHARE_LIB_PATH", raising=False)
+    monkeypatch.delenv("EPAPER_SIM_OUTPUT_DIR", raising=False)
+    monkeypatch.delenv("EPAPER_DISPLAYS", raising=False)
+    monkeypatch.setenv("EPAPER_STATE_DIR", str(tmp_path / "state"))
+    monkeypatch.setenv("EPAPER_CACHE_DIR", "")
+    monkeypatch.setenv("EPAPER_SOCKET", "")
+    return create_app().test_client()
+
+
+def test_preview_rejects_undecodable_upload(client):
+    resp = client.post("/api/preview/image", data={"file": (BytesIO(b"not an image"), "x.png")})
+    assert resp.status_code == 400
+    body = resp.get_json()
+    assert body["ok"] is False
+    assert body["error"].startswith("cannot decode image")
@@ -0,0 +1,23 @@
+"""Frame history of the simulated panel."""
+from __future__ import annotations
+
+from PIL import Image
+
+from epaper_server.simulation import SimulatedPanel
+
+
+def test_failed_frame_is_never_current(tmp_path):
+    out = tmp_path / "last.png"
+    panel = SimulatedPanel(output_path=out)
+    shown = panel.record("image", Image.new("RGB", (8, 8), "red"))
+    written = out.read_bytes()
+    failed = panel.record("image", Image.new("RGB", (8, 8), "blue"), shown=False)
+
+    assert panel.get() is shown
+    assert panel.get(1) is None
+    assert [f["seq"] for f in panel.history()] == [shown.seq]
+    assert panel.get(include_failed=True) is failed
+    assert [(f["seq"], f["shown"]) for f in panel.history(include_failed=True)] == [(failed.seq, False), (shown.seq, True)]
+    # The preview file still shows the last frame the panel accepted
+    assert out.read_bytes() == written
+    assert panel.save(tmp_path / "preview.png") and (tmp_path / "preview.png").read_bytes() == shown.png()
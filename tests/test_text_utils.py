@@ -0,0 +1,32 @@
+"""Text rendering through the font and frame caches."""
+from __future__ import annotations
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from epaper_server.frame_cache import FrameCache
+from epaper_server.text_utils import render_text_to_buffer_cached
+
+SYSTEM_FONT = Path("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+
+
+@pytest.mark.skipif(not SYSTEM_FONT.exists(), reason="needs a TrueType font")
+def test_fallback_font_frames_are_not_cached(tmp_path):
+    font = tmp_path / "late.ttf"
+    cache = FrameCache(directory=tmp_path / "cache")
+    args = ("hello", 600, 448)
+    params = {"font_path": str(font), "font_size": 40}
+
+    fallback, _, hit = render_text_to_buffer_cached(*args, cache=cache, **params)
+    assert not hit
+    assert render_text_to_buffer_cached(*args, cache=cache, **params)[2] is False
+    assert list((tmp_path / "cache").iterdir()) == []
+
+    # Once the font file is in place it is used, and that frame is cached
+    shutil.copy(SYSTEM_FONT, font)
+    buf, _, hit = render_text_to_buffer_cached(*args, cache=cache, **params)
+    assert not hit
+    assert bytes(buf.data) != bytes(fallback.data)
+    assert render_text_to_buffer_cached(*args, cache=cache, **params)[2] is True